@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Compare embedding backend throughput and vector agreement on sample_docs."""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from config.settings import get_settings
+from utils.document_processor import DocumentProcessor
+from utils.embeddings import create_embeddings, EMBEDDING_BACKENDS
+
+DEFAULT_DOCS_DIR = Path(__file__).parent.parent.parent / "sample_docs"
+
+
+def load_chunks(docs_dir: Path, chunk_size: int, chunk_overlap: int):
+    """Extract and chunk every PDF in the docs directory."""
+    processor = DocumentProcessor(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    chunks = []
+    for pdf_path in sorted(docs_dir.glob("*.pdf")):
+        chunks.extend(processor.process_pdf(pdf_path.read_bytes()))
+    return chunks
+
+
+def cosine_agreement(reference, vectors):
+    """Mean cosine similarity between matching rows of two normalized embedding lists."""
+    total = 0.0
+    for a, b in zip(reference, vectors):
+        total += sum(x * y for x, y in zip(a, b))
+    return total / max(len(reference), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs-dir", type=Path, default=DEFAULT_DOCS_DIR)
+    parser.add_argument("--backends", nargs="+", default=list(EMBEDDING_BACKENDS))
+    parser.add_argument("--repeat", type=int, default=3, help="Timed passes per backend")
+    parser.add_argument("--output", type=Path, help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    settings = get_settings()
+    chunks = load_chunks(args.docs_dir, settings.chunk_size, settings.chunk_overlap)
+    print(f"📄 {len(chunks)} chunks from {args.docs_dir}")
+
+    results = []
+    reference = None
+    for backend in args.backends:
+        try:
+            load_start = time.time()
+            embeddings = create_embeddings(settings, backend=backend)
+            load_time = time.time() - load_start
+        except Exception as e:
+            print(f"❌ {backend}: {e}")
+            results.append({"backend": backend, "error": str(e)})
+            continue
+
+        # Warm-up pass so lazy session setup is not timed
+        embeddings.embed_documents(chunks[:settings.embedding_encode_batch_size])
+
+        timings = []
+        for _ in range(args.repeat):
+            start = time.time()
+            vectors = embeddings.embed_documents(chunks)
+            timings.append(time.time() - start)
+        best = min(timings)
+
+        if reference is None:
+            reference = vectors
+        result = {
+            "backend": backend,
+            "load_seconds": round(load_time, 3),
+            "embed_seconds": round(best, 3),
+            "chunks_per_second": round(len(chunks) / best, 1) if best else None,
+            "cosine_vs_first_backend": round(cosine_agreement(reference, vectors), 5),
+        }
+        results.append(result)
+        print(f"✅ {backend}: {result['chunks_per_second']} chunks/s, load {result['load_seconds']}s, "
+              f"cosine vs {args.backends[0]} {result['cosine_vs_first_backend']}")
+
+    report = {
+        "embedding_model": settings.embedding_model,
+        "batch_size": settings.embedding_encode_batch_size,
+        "threads": settings.embedding_threads,
+        "chunks": len(chunks),
+        "results": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"📊 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""Local Ollama stand-in that streams canned tokens at a configurable speed.
+
+Speaks enough of the Ollama HTTP API for ChatOllama (`/api/chat`, streaming
+and non-streaming) so the API can be load-tested without a model server:
+
+    python benchmarks/fake_ollama.py --port 11435 --tokens-per-second 30 --first-token-delay-ms 300
+    OLLAMA_BASE_URL=http://localhost:11435 python src/api/main.py
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timezone
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+
+ANSWER = (
+    "Based on the provided context, the policy number is POL-123456 and the claimed amount "
+    "of Rs. 45,000 for hospitalization is covered under the policy, subject to the sub-limits "
+    "and exclusions listed in the policy schedule. "
+)
+
+
+class FakeOllama:
+    """Generates timed token streams; `parallel` caps concurrent generations like OLLAMA_NUM_PARALLEL."""
+
+    def __init__(self, tokens_per_second: float, first_token_delay_ms: float, response_tokens: int,
+                 jitter: float, parallel: int):
+        self.token_interval = 1.0 / tokens_per_second if tokens_per_second > 0 else 0.0
+        self.first_token_delay = first_token_delay_ms / 1000.0
+        self.response_tokens = response_tokens
+        self.jitter = jitter
+        self.parallel = parallel
+        self._slots = asyncio.Semaphore(parallel) if parallel > 0 else None
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.tokens = ANSWER.split(" ")
+
+    def _delay(self, base: float) -> float:
+        return max(0.0, base * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    async def generate(self):
+        """Yield (token, stats) pairs; stats is None until the final item."""
+        self.waiting += 1
+        queued_at = time.perf_counter()
+        if self._slots is not None:
+            await self._slots.acquire()
+        self.waiting -= 1
+        self.active += 1
+        try:
+            start = time.perf_counter()
+            await asyncio.sleep(self._delay(self.first_token_delay))
+            prompt_done = time.perf_counter()
+            for i in range(self.response_tokens):
+                if i:
+                    await asyncio.sleep(self._delay(self.token_interval))
+                token = self.tokens[i % len(self.tokens)]
+                yield (token if i == 0 else " " + token), None
+            end = time.perf_counter()
+            self.completed += 1
+            yield "", {
+                "total_duration": int((end - queued_at) * 1e9),
+                "load_duration": int((start - queued_at) * 1e9),
+                "prompt_eval_count": 1,
+                "prompt_eval_duration": int((prompt_done - start) * 1e9),
+                "eval_count": self.response_tokens,
+                "eval_duration": int((end - prompt_done) * 1e9),
+            }
+        finally:
+            self.active -= 1
+            if self._slots is not None:
+                self._slots.release()
+
+
+def create_app(fake: FakeOllama) -> FastAPI:
+    app = FastAPI(title="Fake Ollama")
+
+    def now() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    def message_chunk(model: str, content: str, chat: bool) -> dict:
+        if chat:
+            return {"model": model, "created_at": now(), "message": {"role": "assistant", "content": content}, "done": False}
+        return {"model": model, "created_at": now(), "response": content, "done": False}
+
+    def final_chunk(model: str, stats: dict, chat: bool, content: str = "") -> dict:
+        chunk = message_chunk(model, content, chat)
+        chunk.update(done=True, done_reason="stop", **stats)
+        return chunk
+
+    async def respond(request: Request, chat: bool):
+        body = await request.json()
+        model = body.get("model", "fake")
+        if body.get("stream", True):
+            async def ndjson():
+                async for token, stats in fake.generate():
+                    chunk = final_chunk(model, stats, chat) if stats else message_chunk(model, token, chat)
+                    yield json.dumps(chunk) + "\n"
+            return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+        parts = []
+        async for token, stats in fake.generate():
+            if stats:
+                return JSONResponse(final_chunk(model, stats, chat, "".join(parts)))
+            parts.append(token)
+
+    @app.get("/")
+    async def root():
+        return PlainTextResponse("Ollama is running")
+
+    @app.get("/api/version")
+    async def version():
+        return {"version": "0.0.0-fake"}
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": "fake:latest", "model": "fake:latest", "modified_at": now(), "size": 0}]}
+
+    @app.post("/api/show")
+    async def show(request: Request):
+        body = await request.json()
+        return {"modelfile": "", "parameters": "", "template": "", "details": {"family": "fake"}, "model": body.get("model")}
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        return await respond(request, chat=True)
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        return await respond(request, chat=False)
+
+    @app.get("/fake/stats")
+    async def stats():
+        return {"active": fake.active, "waiting": fake.waiting, "completed": fake.completed, "parallel": fake.parallel}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--tokens-per-second", type=float, default=30.0)
+    parser.add_argument("--first-token-delay-ms", type=float, default=300.0,
+                        help="Delay before the first token, standing in for prompt evaluation")
+    parser.add_argument("--response-tokens", type=int, default=64)
+    parser.add_argument("--jitter", type=float, default=0.1, help="Relative random variation of every delay")
+    parser.add_argument("--parallel", type=int, default=4,
+                        help="Concurrent generations before requests queue (0 = unlimited)")
+    args = parser.parse_args()
+
+    fake = FakeOllama(args.tokens_per_second, args.first_token_delay_ms, args.response_tokens,
+                      args.jitter, args.parallel)
+    print(f"🤖 Fake Ollama on http://{args.host}:{args.port}: {args.tokens_per_second} tokens/s, "
+          f"first token after {args.first_token_delay_ms:.0f}ms, {args.parallel or 'unlimited'} parallel")
+    uvicorn.run(create_app(fake), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
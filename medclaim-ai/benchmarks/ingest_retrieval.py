@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""Benchmark ingestion and retrieval over sample_docs with a stub LLM (no Ollama needed)."""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+DEFAULT_DOCS_DIR = Path(__file__).parent.parent.parent / "sample_docs"
+
+DEFAULT_QUERIES = [
+    "What is the policy number?",
+    "Who is the policy holder?",
+    "What is the total claim amount?",
+    "What is the diagnosis?",
+    "What is the date of admission?",
+    "Which treatments are excluded from coverage?",
+    "What is the sum insured?",
+    "Who is the treating doctor?",
+]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def latency_summary(seconds):
+    """Summarize a list of latencies in milliseconds."""
+    ms = [s * 1000.0 for s in seconds]
+    return {
+        "count": len(ms),
+        "mean_ms": round(statistics.mean(ms), 2) if ms else None,
+        "p50_ms": round(percentile(ms, 50), 2) if ms else None,
+        "p95_ms": round(percentile(ms, 95), 2) if ms else None,
+        "p99_ms": round(percentile(ms, 99), 2) if ms else None,
+    }
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    """Peak resident set size in MB (ru_maxrss is KB on Linux, bytes on macOS)."""
+    rss = resource.getrusage(who).ru_maxrss
+    return round(rss / (1024 * 1024) if platform.system() == "Darwin" else rss / 1024, 1)
+
+
+def git_revision():
+    """Current commit, so results from different commits can be compared."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=Path(__file__).parent
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def replicate_docs(docs_dir: Path, copies: int):
+    """Load every PDF and make `copies` byte-distinct replicas of each.
+
+    Replicas differ only in their PDF metadata, so extraction and embedding do
+    the same work while content-hash deduplication does not short-circuit them.
+    """
+    import fitz  # PyMuPDF
+
+    files = []
+    for pdf_path in sorted(docs_dir.glob("*.pdf")):
+        file_bytes = pdf_path.read_bytes()
+        for copy in range(copies):
+            if copy == 0:
+                files.append((file_bytes, pdf_path.name))
+                continue
+            with fitz.open(stream=file_bytes, filetype="pdf") as doc:
+                doc.set_metadata({**(doc.metadata or {}), "subject": f"benchmark copy {copy}"})
+                files.append((doc.tobytes(), f"{pdf_path.stem}_copy{copy}.pdf"))
+    return files
+
+
+def stage_totals():
+    """Read per-stage counts and total seconds from the in-process metrics registry."""
+    from prometheus_client import REGISTRY
+
+    totals = {}
+    for metric in REGISTRY.collect():
+        if metric.name != "medclaim_stage_duration_seconds":
+            continue
+        for sample in metric.samples:
+            stage = sample.labels.get("stage")
+            if sample.name.endswith("_count"):
+                totals.setdefault(stage, {})["count"] = int(sample.value)
+            elif sample.name.endswith("_sum"):
+                totals.setdefault(stage, {})["seconds"] = round(sample.value, 3)
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs-dir", type=Path, default=DEFAULT_DOCS_DIR)
+    parser.add_argument("--copies", type=int, default=1, help="Replicas of each PDF to ingest")
+    parser.add_argument("--mode", choices=["stream", "bulk"], default="stream",
+                        help="Ingest files one by one (ingest_pdf) or as one packet (ingest_pdfs)")
+    parser.add_argument("--query-rounds", type=int, default=10, help="Passes over the query set")
+    parser.add_argument("--queries-file", type=Path, help="Questions to run, one per line")
+    parser.add_argument("--embedding-cache", action="store_true",
+                        help="Keep the embedding cache on (off by default so replicas are really embedded)")
+    parser.add_argument("--set", dest="overrides", action="append", default=[], metavar="NAME=VALUE",
+                        help="Override a setting, e.g. --set chunk_size=800 --set top_k=4")
+    parser.add_argument("--workdir", type=Path, help="Directory for the benchmark index (default: temporary)")
+    parser.add_argument("--output", type=Path, help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    workdir = args.workdir or Path(tempfile.mkdtemp(prefix="medclaim-bench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+
+    # Settings are read from the environment, so point all persistent state at the workdir
+    os.environ["CHROMA_PERSIST_DIR"] = str(workdir / "chroma_db")
+    os.environ["EMBEDDING_CACHE_PATH"] = str(workdir / "embedding_cache.sqlite3")
+    os.environ["DOCLING_CACHE_DIR"] = str(workdir / "docling_cache")
+    os.environ["EMBEDDING_CACHE_ENABLED"] = "true" if args.embedding_cache else "false"
+    os.environ["ANSWER_CACHE_SIZE"] = "0"
+    for override in args.overrides:
+        name, _, value = override.partition("=")
+        os.environ[name.strip().upper()] = value.strip()
+
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from config.settings import get_settings
+    from services.rag_service import MedClaimRAGService
+    from utils.document_processor import shutdown_process_pool
+
+    settings = get_settings()
+    queries = DEFAULT_QUERIES
+    if args.queries_file:
+        queries = [line.strip() for line in args.queries_file.read_text().splitlines() if line.strip()]
+
+    files = replicate_docs(args.docs_dir, args.copies)
+    input_mb = sum(len(file_bytes) for file_bytes, _ in files) / (1024 * 1024)
+    print(f"📄 {len(files)} PDFs ({input_mb:.1f} MB) from {args.docs_dir}, index in {workdir}")
+
+    init_start = time.time()
+    service = MedClaimRAGService()
+    # Stub LLM so the benchmark measures everything except model speed
+    service.llm = FakeListChatModel(responses=["Stub answer."])
+    service._setup_qa_chain()
+    init_time = time.time() - init_start
+    print(f"⚙️  Service initialized in {init_time:.2f}s")
+
+    ingest_start = time.time()
+    if args.mode == "bulk":
+        results = service.ingest_pdfs(files)["files"]
+    else:
+        results = [service.ingest_pdf(file_bytes, filename) for file_bytes, filename in files]
+    ingest_time = time.time() - ingest_start
+    failed = [result["filename"] for result in results if result["status"] != "success"]
+    stages = stage_totals()
+
+    pages = stages.get("extraction", {}).get("count", 0)
+    chunks = sum(result["chunks_added"] for result in results)
+    batches = stages.get("embedding", {}).get("count", 0)
+    ingestion = {
+        "files": len(files),
+        "failed": failed,
+        "seconds": round(ingest_time, 3),
+        "pages": pages,
+        "chunks_embedded": chunks,
+        "embed_batches": batches,
+        "pages_per_second": round(pages / ingest_time, 2) if ingest_time else None,
+        "chunks_per_second": round(chunks / ingest_time, 2) if ingest_time else None,
+        "embed_batches_per_second": round(batches / ingest_time, 2) if ingest_time else None,
+    }
+    print(f"📥 Ingested {pages} pages, {chunks} chunks in {ingest_time:.2f}s "
+          f"({ingestion['pages_per_second']} pages/s, {ingestion['chunks_per_second']} chunks/s, "
+          f"{ingestion['embed_batches_per_second']} batches/s)")
+
+    # Warm-up so lazy model and session setup is not counted in the percentiles
+    retriever = service._get_cached_retriever(None)
+    retriever.invoke(queries[0])
+
+    retrieval_times = []
+    query_times = []
+    for _ in range(args.query_rounds):
+        for question in queries:
+            start = time.perf_counter()
+            retriever.invoke(question)
+            retrieval_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            service.query(question)
+            query_times.append(time.perf_counter() - start)
+    retrieval = latency_summary(retrieval_times)
+    end_to_end = latency_summary(query_times)
+    print(f"🔎 Retrieval p50 {retrieval['p50_ms']}ms, p95 {retrieval['p95_ms']}ms, p99 {retrieval['p99_ms']}ms")
+    print(f"💬 Query (stub LLM) p50 {end_to_end['p50_ms']}ms, p95 {end_to_end['p95_ms']}ms, p99 {end_to_end['p99_ms']}ms")
+
+    # RUSAGE_CHILDREN only covers children that have exited and been waited for,
+    # and reports the largest of them
+    shutdown_process_pool()
+    memory = {
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_rss_children_mb": peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+    print(f"🧠 Peak RSS {memory['peak_rss_mb']} MB (largest extraction worker {memory['peak_rss_children_mb']} MB)")
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "mode": args.mode,
+        "copies": args.copies,
+        "settings": {
+            "embedding_model": settings.embedding_model,
+            "embedding_backend": settings.embedding_backend,
+            "embedding_cache_enabled": settings.embedding_cache_enabled,
+            "chunk_size": settings.chunk_size,
+            "chunk_overlap": settings.chunk_overlap,
+            "top_k": settings.top_k,
+            "embed_batch_size": settings.embed_batch_size,
+            "hybrid_retrieval": settings.hybrid_retrieval,
+            "rerank_enabled": settings.rerank_enabled,
+            "extraction_workers": settings.extraction_workers,
+        },
+        "init_seconds": round(init_time, 3),
+        "ingestion": ingestion,
+        "retrieval": retrieval,
+        "query_stub_llm": end_to_end,
+        "stages": stage_totals(),
+        "memory": memory,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"📊 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""Drive the MedClaim API at a target request rate and report throughput and latency percentiles.
+
+Requests arrive open-loop (Poisson by default), so a slow server shows up as
+rising latency and in-flight requests rather than a lower send rate. Pair it
+with benchmarks/fake_ollama.py to separate API and retrieval capacity from
+model speed:
+
+    python benchmarks/load_generator.py --rps 20 --duration 60 --upload-ratio 0.1 --output load.json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+
+sys.path.append(str(Path(__file__).parent))
+
+from ingest_retrieval import DEFAULT_DOCS_DIR, DEFAULT_QUERIES, latency_summary
+
+
+def unique_pdf(file_bytes: bytes) -> bytes:
+    """Return a byte-distinct copy of a PDF so uploads are not skipped as duplicates."""
+    import fitz  # PyMuPDF
+
+    with fitz.open(stream=file_bytes, filetype="pdf") as doc:
+        doc.set_metadata({**(doc.metadata or {}), "subject": f"load test {uuid.uuid4().hex}"})
+        return doc.tobytes()
+
+
+class LoadStats:
+    """Per-kind request outcomes and latencies."""
+
+    def __init__(self):
+        self.latencies = {}
+        self.first_event = {}
+        self.outcomes = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def record(self, kind: str, outcome: str, latency: float = None, first_event: float = None):
+        self.outcomes.setdefault(kind, {}).setdefault(outcome, 0)
+        self.outcomes[kind][outcome] += 1
+        if outcome == "ok" and latency is not None:
+            self.latencies.setdefault(kind, []).append(latency)
+        if first_event is not None:
+            self.first_event.setdefault(kind, []).append(first_event)
+
+
+async def send_query(client: httpx.AsyncClient, args, stats: LoadStats):
+    question = random.choice(args.queries)
+    if args.unique_queries:
+        # Defeats the answer cache so every request reaches retrieval and the LLM
+        question = f"{question} [{uuid.uuid4().hex[:8]}]"
+    payload = {"question": question}
+    kind = "query_stream" if args.stream else "query"
+    start = time.perf_counter()
+    try:
+        if args.stream:
+            first_event = None
+            async with client.stream("POST", "/query/stream", json=payload) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    stats.record(kind, str(response.status_code))
+                    return
+                async for line in response.aiter_lines():
+                    if line.startswith("event: token") and first_event is None:
+                        first_event = time.perf_counter() - start
+                    if line.startswith("event: error"):
+                        stats.record(kind, "error")
+                        return
+            stats.record(kind, "ok", time.perf_counter() - start, first_event)
+        else:
+            response = await client.post("/query", json=payload)
+            if response.status_code != 200:
+                stats.record(kind, str(response.status_code))
+                return
+            status = response.json().get("status")
+            stats.record(kind, "ok" if status == "success" else str(status), time.perf_counter() - start)
+    except (httpx.HTTPError, ValueError, AttributeError) as e:
+        # ValueError covers a body that is not JSON, AttributeError one that is not an object
+        stats.record(kind, type(e).__name__)
+
+
+async def send_upload(client: httpx.AsyncClient, args, stats: LoadStats):
+    filename, file_bytes = random.choice(args.pdfs)
+    file_bytes = await asyncio.to_thread(unique_pdf, file_bytes)
+    start = time.perf_counter()
+    try:
+        response = await client.post("/upload", files={"file": (filename, file_bytes, "application/pdf")})
+        if response.status_code != 202:
+            stats.record("upload", str(response.status_code))
+            return
+        stats.record("upload", "ok", time.perf_counter() - start)
+        if args.wait_jobs:
+            await wait_job(client, response, start, stats)
+    except httpx.HTTPError as e:
+        stats.record("upload", type(e).__name__)
+
+
+async def wait_job(client: httpx.AsyncClient, upload_response: httpx.Response, start: float, stats: LoadStats):
+    """Poll an upload's job until it finishes; errors and malformed responses count as failed jobs."""
+    try:
+        job_id = upload_response.json()["job_id"]
+        while True:
+            await asyncio.sleep(0.5)
+            response = await client.get(f"/jobs/{job_id}")
+            if response.status_code != 200:
+                stats.record("ingest_job", str(response.status_code))
+                return
+            status = response.json()["status"]
+            if status in ("succeeded", "failed"):
+                stats.record("ingest_job", "ok" if status == "succeeded" else "failed", time.perf_counter() - start)
+                return
+    except (httpx.HTTPError, ValueError, KeyError, TypeError) as e:
+        # ValueError covers a body that is not JSON, KeyError and TypeError one without the expected fields
+        stats.record("ingest_job", type(e).__name__)
+
+
+async def run(args) -> dict:
+    stats = LoadStats()
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    timeout = httpx.Timeout(args.timeout)
+    tasks = []
+
+    async def tracked(coro):
+        stats.in_flight += 1
+        stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+        try:
+            await coro
+        finally:
+            stats.in_flight -= 1
+
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=timeout) as client:
+        start = time.perf_counter()
+        next_send = start
+        interval = 1.0 / args.rps
+        sent = 0
+        while next_send - start < args.duration:
+            delay = next_send - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if random.random() < args.upload_ratio:
+                tasks.append(asyncio.create_task(tracked(send_upload(client, args, stats))))
+            else:
+                tasks.append(asyncio.create_task(tracked(send_query(client, args, stats))))
+            sent += 1
+            next_send += random.expovariate(args.rps) if args.arrival == "poisson" else interval
+        send_time = time.perf_counter() - start
+        await asyncio.gather(*tasks)
+        total_time = time.perf_counter() - start
+
+    results = {}
+    for kind, outcomes in stats.outcomes.items():
+        ok = outcomes.get("ok", 0)
+        results[kind] = {
+            "outcomes": outcomes,
+            "throughput_rps": round(ok / total_time, 2) if total_time else None,
+            "latency": latency_summary(stats.latencies.get(kind, [])),
+        }
+        if kind in stats.first_event:
+            results[kind]["first_token"] = latency_summary(stats.first_event[kind])
+    return {
+        "target_rps": args.rps,
+        "offered_rps": round(sent / send_time, 2) if send_time else None,
+        "requests_sent": sent,
+        "duration_seconds": round(total_time, 2),
+        "max_in_flight": stats.max_in_flight,
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--rps", type=float, default=10.0, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to keep sending")
+    parser.add_argument("--arrival", choices=["poisson", "constant"], default="poisson")
+    parser.add_argument("--upload-ratio", type=float, default=0.0, help="Fraction of requests that are uploads")
+    parser.add_argument("--stream", action="store_true", help="Use /query/stream and record time to first token")
+    parser.add_argument("--unique-queries", action="store_true", help="Make every question unique to bypass the answer cache")
+    parser.add_argument("--wait-jobs", action="store_true", help="Poll upload jobs and record time to completion")
+    parser.add_argument("--docs-dir", type=Path, default=DEFAULT_DOCS_DIR)
+    parser.add_argument("--queries-file", type=Path, help="Questions to send, one per line")
+    parser.add_argument("--max-connections", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, help="Seed for reproducible arrivals and request mix")
+    parser.add_argument("--output", type=Path, help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    args.queries = DEFAULT_QUERIES
+    if args.queries_file:
+        args.queries = [line.strip() for line in args.queries_file.read_text().splitlines() if line.strip()]
+    args.pdfs = [(path.name, path.read_bytes()) for path in sorted(args.docs_dir.glob("*.pdf"))]
+    if args.upload_ratio > 0 and not args.pdfs:
+        parser.error(f"No PDFs found in {args.docs_dir} for uploads")
+
+    print(f"🚀 {args.rps} rps for {args.duration:.0f}s against {args.url} "
+          f"({args.upload_ratio:.0%} uploads, {'streaming' if args.stream else 'blocking'} queries)")
+    report = asyncio.run(run(args))
+
+    print(f"📨 Sent {report['requests_sent']} requests at {report['offered_rps']} rps, "
+          f"max {report['max_in_flight']} in flight")
+    for kind, result in report["results"].items():
+        latency = result["latency"]
+        print(f"   {kind}: {result['outcomes']}, {result['throughput_rps']} ok/s, "
+              f"p50 {latency['p50_ms']}ms, p95 {latency['p95_ms']}ms, p99 {latency['p99_ms']}ms")
+        if "first_token" in result:
+            first = result["first_token"]
+            print(f"   {kind} first token: p50 {first['p50_ms']}ms, p95 {first['p95_ms']}ms, p99 {first['p99_ms']}ms")
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"📊 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
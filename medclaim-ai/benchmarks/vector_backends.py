@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""Compare vector backends on synthetic embeddings: insert time, query latency, recall and memory.
+
+Each backend is filled with the same clustered, L2-normalized vectors spread
+over `--files` filenames, then queried unfiltered and filtered to a few files
+from a separate read-only process, so the reported query RSS is what an extra
+API worker would cost. Recall@k is measured against exact search in NumPy.
+
+    python benchmarks/vector_backends.py --rows 200000 --backends chroma mmap --output backends.json
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+sys.path.append(str(Path(__file__).parent))
+
+from ingest_retrieval import latency_summary, peak_rss_mb, git_revision
+
+
+def synthetic_corpus(rows: int, dim: int, files: int, seed: int):
+    """Clustered unit vectors with a filename per row, plus query vectors near the clusters."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, rows // 200), dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), rows)] + 0.5 * rng.standard_normal((rows, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    filenames = np.array([f"doc_{i % files:05d}.pdf" for i in range(rows)])
+    return vectors, filenames
+
+
+def query_vectors(vectors: np.ndarray, count: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed + 1)
+    queries = vectors[rng.integers(0, len(vectors), count)] + 0.3 * rng.standard_normal((count, vectors.shape[1])).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def faiss_available() -> bool:
+    try:
+        import faiss  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def current_rss_mb() -> float:
+    """Current resident set size in MB (Linux only; 0 elsewhere)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / (1024 * 1024)
+    except OSError:
+        return 0.0
+
+
+def make_settings(workdir: Path, read_only: bool = False, ann: bool = True, ann_min_rows: int = 50000,
+                  partitions: bool = False):
+    from config.settings import Settings
+
+    return Settings(
+        chroma_persist_dir=str(workdir / "chroma_db"),
+        mmap_index_dir=str(workdir / "mmap_index"),
+        mmap_read_only=read_only,
+        mmap_ann_enabled=ann,
+        mmap_ann_min_rows=ann_min_rows,
+        vector_partitions=partitions,
+        partition_index_dir=str(workdir / "partitions"),
+        hnsw_space="cosine",
+    )
+
+
+def build(args):
+    from utils.vector_backends import create_vector_backend
+
+    vectors, filenames = synthetic_corpus(args.rows, args.dim, args.files, args.seed)
+    # Build the ANN graph once after inserting, in the foreground, instead of in the background mid-insert
+    settings = make_settings(args.workdir, ann=False, partitions=args.partitions)
+    backend = create_vector_backend(settings, None, args.backend)
+    start = time.perf_counter()
+    for offset in range(0, args.rows, args.batch_size):
+        end = min(offset + args.batch_size, args.rows)
+        backend.upsert(
+            [f"chunk-{i}" for i in range(offset, end)],
+            vectors[offset:end].tolist(),
+            [f"text {i}" for i in range(offset, end)],
+            [{"filename": filenames[i], "chunk_index": i} for i in range(offset, end)]
+        )
+    insert_time = time.perf_counter() - start
+    ann_time = None
+    if args.backend == "mmap" and not args.exact and args.rows >= args.ann_min_rows and faiss_available():
+        ann_start = time.perf_counter()
+        getattr(backend, "inner", backend).build_ann()
+        ann_time = round(time.perf_counter() - ann_start, 2)
+    return {
+        "insert_seconds": round(insert_time, 2),
+        "insert_rows_per_second": round(args.rows / insert_time, 1),
+        "ann_build_seconds": ann_time,
+        "build_peak_rss_mb": peak_rss_mb(),
+        "backend_stats": backend.get_stats(),
+    }
+
+
+def query(args):
+    """Run in a fresh process: open the built index read-only and time searches."""
+    from utils.vector_backends import create_vector_backend
+
+    settings = make_settings(args.workdir, read_only=True, ann=not args.exact, ann_min_rows=args.ann_min_rows,
+                             partitions=args.partitions)
+    # Open before generating the ground-truth corpus so the RSS delta is the backend's alone
+    rss_before_open = current_rss_mb()
+    backend = create_vector_backend(settings, None, args.backend)
+    backend.search(np.ones(args.dim, dtype=np.float32).tolist(), 1)
+    rss_after_open = current_rss_mb()
+
+    vectors, filenames = synthetic_corpus(args.rows, args.dim, args.files, args.seed)
+    queries = query_vectors(vectors, args.queries, args.seed)
+    rng = np.random.default_rng(args.seed + 2)
+    all_files = np.unique(filenames)
+
+    results = {}
+    for mode in ("unfiltered", "filtered"):
+        latencies, recalls = [], []
+        for q in queries:
+            scope = None
+            candidates = np.arange(args.rows)
+            if mode == "filtered":
+                scope = list(rng.choice(all_files, size=min(args.filter_files, len(all_files)), replace=False))
+                candidates = np.flatnonzero(np.isin(filenames, scope))
+            start = time.perf_counter()
+            hits = backend.search(q.tolist(), args.k, scope)
+            latencies.append(time.perf_counter() - start)
+            scores = vectors[candidates] @ q
+            truth = {f"chunk-{i}" for i in candidates[np.argsort(-scores)[:args.k]]}
+            found = {doc.id for doc, _ in hits}
+            recalls.append(len(truth & found) / len(truth) if truth else 1.0)
+        results[mode] = {
+            "latency": latency_summary(latencies),
+            f"recall_at_{args.k}": round(float(np.mean(recalls)), 4),
+        }
+    results["open_and_first_search_rss_mb"] = round(rss_after_open - rss_before_open, 1)
+    results["query_peak_rss_mb"] = peak_rss_mb()
+    return results
+
+
+def worker_args(args, phase: str, backend: str, workdir: Path) -> list:
+    return [
+        sys.executable, __file__, "--phase", phase, "--backend", backend, "--workdir", str(workdir),
+        "--rows", str(args.rows), "--dim", str(args.dim), "--files", str(args.files),
+        "--queries", str(args.queries), "--k", str(args.k), "--filter-files", str(args.filter_files),
+        "--batch-size", str(args.batch_size), "--ann-min-rows", str(args.ann_min_rows), "--seed", str(args.seed),
+    ] + (["--exact"] if args.exact else []) + (["--partitions"] if args.partitions else [])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["chroma", "mmap"])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384, help="384 matches bge-small-en-v1.5")
+    parser.add_argument("--files", type=int, default=2000, help="Distinct filenames the rows are spread over")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--filter-files", type=int, default=10, help="Files per filtered query")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per upsert")
+    parser.add_argument("--ann-min-rows", type=int, default=50000, help="mmap: build a FAISS index from this many rows")
+    parser.add_argument("--exact", action="store_true", help="mmap: disable the ANN index")
+    parser.add_argument("--partitions", action="store_true", help="Add per-document partitions for filtered queries")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", type=Path, help="Directory for the indexes (default: a temp dir)")
+    parser.add_argument("--output", type=Path, help="Write results as JSON to this file")
+    parser.add_argument("--phase", choices=["build", "query"], help=argparse.SUPPRESS)
+    parser.add_argument("--backend", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.phase:
+        # Build and query run in separate processes so each one's peak RSS is its own
+        print(json.dumps(build(args) if args.phase == "build" else query(args)))
+        return
+
+    root = args.workdir or Path(tempfile.mkdtemp(prefix="medclaim-vector-bench-"))
+    report = {
+        "git_revision": git_revision(),
+        "rows": args.rows,
+        "dim": args.dim,
+        "files": args.files,
+        "k": args.k,
+        "filter_files": args.filter_files,
+        "partitions": args.partitions,
+        "backends": {},
+    }
+    for backend in args.backends:
+        workdir = root / backend
+        workdir.mkdir(parents=True, exist_ok=True)
+        print(f"🏗️  {backend}: inserting {args.rows} x {args.dim} vectors")
+        built = json.loads(subprocess.run(worker_args(args, "build", backend, workdir), capture_output=True, text=True, check=True).stdout.splitlines()[-1])
+        print(f"   {built['insert_rows_per_second']} rows/s, peak RSS {built['build_peak_rss_mb']} MB")
+        print(f"🔎 {backend}: {args.queries} unfiltered and filtered queries from a read-only process")
+        queried = json.loads(subprocess.run(worker_args(args, "query", backend, workdir), capture_output=True, text=True, check=True).stdout.splitlines()[-1])
+        for mode in ("unfiltered", "filtered"):
+            result = queried[mode]
+            print(f"   {mode}: p50 {result['latency']['p50_ms']}ms, p95 {result['latency']['p95_ms']}ms, "
+                  f"recall@{args.k} {result[f'recall_at_{args.k}']}")
+        print(f"   opening the index and a first search added {queried['open_and_first_search_rss_mb']} MB RSS")
+        report["backends"][backend] = {"build": built, "query": queried}
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"📊 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
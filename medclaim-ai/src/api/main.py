@@ -1,19 +1,29 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse, Response
+from starlette.background import BackgroundTask
+from starlette.concurrency import iterate_in_threadpool
+from starlette.routing import Match
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, REGISTRY, generate_latest, multiprocess
 from pydantic import BaseModel
 from typing import List, Optional
 import sys
 from pathlib import Path
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
+import json
 import logging
+import os
+import threading
 import time
 
 # Add src to path for imports
 sys.path.append(str(Path(__file__).parent.parent))
 
-from services.rag_service import MedClaimRAGService
+from services.ingest_queue import IngestJobQueue
 from config.settings import get_settings
+from utils.concurrency import ConcurrencyLimiter, OverloadedError
+from utils.metrics import EXECUTOR_QUEUE_WAIT, IN_FLIGHT_REQUESTS, REQUEST_DURATION
 
 # Configure logging
 logging.basicConfig(
@@ -44,18 +54,116 @@ app.add_middleware(
 
 # Global service instance and thread pool
 rag_service = None
+ingest_queue = None
+# Per-component readiness, filled in by the background loader
+readiness = {"status": "starting", "components": {}}
+started_at = time.time()
 settings = get_settings()
-executor = ThreadPoolExecutor(max_workers=4)
+executor = ThreadPoolExecutor(max_workers=settings.executor_workers)
+query_limiter = ConcurrencyLimiter(
+    "query",
+    max_concurrency=settings.query_concurrency,
+    max_waiting=settings.query_max_waiting,
+    wait_timeout=settings.query_wait_timeout
+)
+
+async def run_in_executor(func, *args):
+    """Run blocking work on the shared executor, recording how long it queued for a thread."""
+    submitted = time.perf_counter()
+    
+    def timed():
+        EXECUTOR_QUEUE_WAIT.labels("api").observe(time.perf_counter() - submitted)
+        return func(*args)
+    
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(executor, timed)
+
+def _endpoint_label(request: Request) -> str:
+    """Label requests by route template so /jobs/{job_id} is one series."""
+    for route in app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Track in-flight requests and latency per endpoint.
+    
+    For streaming responses the latency covers time to the response headers.
+    """
+    endpoint = _endpoint_label(request)
+    start_time = time.perf_counter()
+    status = 500
+    IN_FLIGHT_REQUESTS.labels(endpoint).inc()
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        IN_FLIGHT_REQUESTS.labels(endpoint).dec()
+        REQUEST_DURATION.labels(endpoint, request.method, str(status)).observe(time.perf_counter() - start_time)
+
+def load_components():
+    """Import and build the RAG service, start ingestion workers, then warm up.
+    
+    Runs on a background thread so the server accepts connections (and answers
+    /health) immediately; /ready reports progress.
+    """
+    global rag_service, ingest_queue
+    components = readiness["components"]
+    component = "rag_service"
+    try:
+        start_time = time.time()
+        # Imported here because langchain, chromadb and the embedding model are slow to load
+        from services.rag_service import MedClaimRAGService
+        
+        service = MedClaimRAGService()
+        init_time = time.time() - start_time
+        components["rag_service"] = {"ready": True, "seconds": round(init_time, 2)}
+        logger.info(f"RAG service initialized in {init_time:.2f} seconds")
+        
+        component = "ingest_queue"
+        queue = IngestJobQueue(
+            service,
+            db_path=settings.ingest_queue_db,
+            upload_dir=settings.upload_dir,
+            workers=settings.ingest_workers,
+            lease_seconds=settings.ingest_lease_seconds,
+            max_attempts=settings.ingest_max_attempts
+        )
+        queue.start()
+        components["ingest_queue"] = {"ready": True}
+        rag_service, ingest_queue = service, queue
+    except Exception as e:
+        logger.error(f"Failed to initialize {component}: {str(e)}")
+        components[component] = {"ready": False, "error": str(e)}
+        readiness["status"] = "failed"
+        return
+    
+    if settings.warmup_enabled:
+        readiness["status"] = "warming_up"
+        components.update(rag_service.warm_up())
+    readiness["status"] = "ready"
+    total_time = time.time() - started_at
+    logger.info(f"MedClaim AI API ready in {total_time:.2f} seconds")
+
+def require_service():
+    """Reject requests that arrive before the RAG service has loaded."""
+    if rag_service is None:
+        raise HTTPException(status_code=503, detail="Service is starting", headers={"Retry-After": "5"})
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize the RAG service on startup."""
-    global rag_service
+    """Load the RAG service and ingestion workers in the background."""
     logger.info("Starting MedClaim AI API...")
-    start_time = time.time()
-    rag_service = MedClaimRAGService()
-    init_time = time.time() - start_time
-    logger.info(f"RAG service initialized in {init_time:.2f} seconds")
+    threading.Thread(target=load_components, name="component-loader", daemon=True).start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Let ingestion workers finish their current job and stop."""
+    if ingest_queue is not None:
+        ingest_queue.stop()
 
 # Request/Response models
 class QueryRequest(BaseModel):
@@ -66,22 +174,66 @@ class QueryResponse(BaseModel):
     answer: str
     sources: List[dict]
     status: str
+    cached: bool = False
+
+class BatchQueryRequest(BaseModel):
+    questions: List[str]
+    filter_filenames: Optional[List[str]] = None
+
+class BatchQueryAnswer(BaseModel):
+    question: str
+    answer: str
+    sources: List[dict]
+    status: str
+    cached: bool = False
+
+class BatchQueryResponse(BaseModel):
+    results: List[BatchQueryAnswer]
+    status: str
+    question_count: int
+    generated_count: int
+    retrieved_chunks: int
+    distinct_chunks: int
+    processing_time: float
 
-class UploadResponse(BaseModel):
+class UploadJobResponse(BaseModel):
+    job_id: str
     filename: str
     status: str
-    chunks_added: int
     message: str
 
+class JobStatusResponse(BaseModel):
+    job_id: str
+    filename: str
+    status: str
+    queue_position: Optional[int] = None
+    progress: dict
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    attempts: int
+    created_at: float
+    updated_at: float
+
 # API endpoints
 @app.get("/health")
 async def health_check():
-    """Health check endpoint."""
+    """Liveness check; does not wait for models to load."""
     return {"status": "healthy", "service": "MedClaim AI Validator"}
 
-@app.post("/upload", response_model=UploadResponse)
+@app.get("/ready")
+async def readiness_check():
+    """Readiness check: 200 once the service is loaded and warmed up, 503 before."""
+    body = {
+        "status": readiness["status"],
+        "components": readiness["components"],
+        "uptime_seconds": round(time.time() - started_at, 2)
+    }
+    return JSONResponse(body, status_code=200 if readiness["status"] == "ready" else 503)
+
+@app.post("/upload", response_model=UploadJobResponse, status_code=202)
 async def upload_document(file: UploadFile = File(...)):
-    """Upload and process a PDF document asynchronously."""
+    """Persist a PDF and queue it for background ingestion; poll /jobs/{job_id} for progress."""
+    require_service()
     logger.info(f"Received upload request for file: {file.filename}")
     
     if not file.filename.lower().endswith('.pdf'):
@@ -89,31 +241,69 @@ async def upload_document(file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
     
     try:
-        start_time = time.time()
         logger.info(f"Reading file bytes for {file.filename}")
         file_bytes = await file.read()
         logger.info(f"File read completed, size: {len(file_bytes)} bytes")
+        if len(file_bytes) > settings.max_file_size_mb * 1024 * 1024:
+            raise HTTPException(status_code=413, detail=f"File exceeds {settings.max_file_size_mb} MB limit")
         
-        # Run PDF processing in thread pool to avoid blocking
-        logger.info(f"Starting PDF processing for {file.filename}")
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(
-            executor,
-            rag_service.ingest_pdf,
-            file_bytes,
-            file.filename
+        job_id = await run_in_executor(ingest_queue.enqueue, file_bytes, file.filename)
+        return UploadJobResponse(
+            job_id=job_id,
+            filename=file.filename,
+            status="queued",
+            message=f"{file.filename} queued for ingestion"
         )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error queuing file {file.filename}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
+
+@app.post("/upload/batch")
+async def upload_documents_batch(files: List[UploadFile] = File(...)):
+    """Upload and ingest a packet of PDFs together, returning per-file results and throughput."""
+    require_service()
+    logger.info(f"Received batch upload of {len(files)} files")
+    
+    invalid = [file.filename for file in files if not file.filename.lower().endswith('.pdf')]
+    if invalid:
+        logger.warning(f"Invalid file types in batch: {invalid}")
+        raise HTTPException(status_code=400, detail=f"Only PDF files are supported: {', '.join(invalid)}")
+    
+    try:
+        start_time = time.time()
+        packet = []
+        for file in files:
+            file_bytes = await file.read()
+            if len(file_bytes) > settings.max_file_size_mb * 1024 * 1024:
+                raise HTTPException(status_code=413, detail=f"{file.filename} exceeds {settings.max_file_size_mb} MB limit")
+            packet.append((file_bytes, file.filename))
+        
+        result = await run_in_executor(rag_service.ingest_pdfs, packet)
         
         processing_time = time.time() - start_time
-        logger.info(f"Upload processing completed for {file.filename} in {processing_time:.2f} seconds")
-        return UploadResponse(**result)
+        logger.info(f"Batch upload of {len(files)} files completed in {processing_time:.2f} seconds")
+        return result
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error processing file {file.filename}: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
+        logger.error(f"Error processing batch upload: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing files: {str(e)}")
+
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job_status(job_id: str):
+    """Get the status and per-stage progress of an ingestion job."""
+    require_service()
+    job = ingest_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return JobStatusResponse(**job)
 
 @app.post("/query", response_model=QueryResponse)
 async def query_documents(request: QueryRequest):
     """Query the processed documents asynchronously."""
+    require_service()
     logger.info(f"Received query: {request.question[:100]}...")
     if request.filter_filenames:
         logger.info(f"Query filters: {request.filter_filenames}")
@@ -122,34 +312,116 @@ async def query_documents(request: QueryRequest):
         start_time = time.time()
         logger.info("Starting query processing")
         
-        # Run query in thread pool to avoid blocking
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(
-            executor, 
-            rag_service.query, 
-            request.question, 
-            request.filter_filenames
-        )
+        # Native async path: the event loop waits on Ollama instead of an executor thread
+        async with query_limiter.slot():
+            result = await rag_service.aquery(request.question, request.filter_filenames)
         
         query_time = time.time() - start_time
         logger.info(f"Query processing completed in {query_time:.2f} seconds")
         logger.info(f"Answer length: {len(result.get('answer', ''))} chars, Sources: {len(result.get('sources', []))}")
         
         return QueryResponse(**result)
+    except OverloadedError as e:
+        logger.warning(f"Rejecting query: {str(e)}")
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         logger.error(f"Error processing query: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
 
+@app.post("/query/batch", response_model=BatchQueryResponse)
+async def batch_query_documents(request: BatchQueryRequest):
+    """Answer a checklist of questions against the same documents in one request."""
+    require_service()
+    logger.info(f"Received batch of {len(request.questions)} questions")
+    if request.filter_filenames:
+        logger.info(f"Batch query filters: {request.filter_filenames}")
+    
+    if not request.questions:
+        raise HTTPException(status_code=400, detail="At least one question is required")
+    if len(request.questions) > settings.batch_query_max_questions:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.batch_query_max_questions} questions are allowed per batch"
+        )
+    
+    try:
+        start_time = time.time()
+        # One slot per batch; the batch bounds its own concurrent generations
+        async with query_limiter.slot():
+            result = await rag_service.aquery_batch(request.questions, request.filter_filenames)
+        
+        query_time = time.time() - start_time
+        logger.info(f"Batch query of {len(request.questions)} questions completed in {query_time:.2f} seconds")
+        return BatchQueryResponse(**result)
+    except OverloadedError as e:
+        logger.warning(f"Rejecting batch query: {str(e)}")
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        logger.error(f"Error processing batch query: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing batch query: {str(e)}")
+
+@app.post("/query/stream")
+async def stream_query_documents(request: QueryRequest):
+    """Query the processed documents, streaming sources and answer tokens as Server-Sent Events."""
+    require_service()
+    logger.info(f"Received streaming query: {request.question[:100]}...")
+    if request.filter_filenames:
+        logger.info(f"Query filters: {request.filter_filenames}")
+    
+    try:
+        await query_limiter.acquire()
+    except OverloadedError as e:
+        logger.warning(f"Rejecting streaming query: {str(e)}")
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    
+    released = False
+    
+    def release_slot():
+        # Called when the stream ends and again as a background task once the response is done;
+        # the background task covers responses whose body generator never started
+        nonlocal released
+        if not released:
+            released = True
+            query_limiter.release()
+    
+    async def event_stream():
+        # The sync generator is advanced in worker threads, so the event loop stays free
+        try:
+            events = rag_service.stream_query(request.question, request.filter_filenames)
+            async for event in iterate_in_threadpool(events):
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            release_slot()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(release_slot)
+    )
+
 @app.get("/stats")
 async def get_stats():
     """Get system statistics asynchronously."""
+    require_service()
     try:
-        loop = asyncio.get_event_loop()
-        stats = await loop.run_in_executor(executor, rag_service.get_document_stats)
+        stats = await run_in_executor(rag_service.get_document_stats)
+        stats["query_limiter"] = query_limiter.get_stats()
+        stats["ingest_jobs"] = ingest_queue.get_stats()
         return stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting stats: {str(e)}")
 
+@app.get("/metrics")
+async def get_metrics():
+    """Expose latency histograms, counters and gauges in Prometheus text format."""
+    registry = REGISTRY
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        # Aggregate across uvicorn worker processes
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
 if __name__ == "__main__":
     import uvicorn
     logger.info("Starting uvicorn server...")
@@ -1,5 +1,6 @@
 from functools import lru_cache
-from pydantic import Field
+from pydantic import Field, model_validator
+import os
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -18,18 +19,108 @@ class Settings(BaseSettings):
     streaming: bool = Field(default=True)
     # Embedding Configuration
     embedding_model: str = Field(default="BAAI/bge-small-en-v1.5")
+    embedding_backend: str = Field(default="huggingface")  # huggingface, onnx or fastembed
+    embedding_onnx_file: str = Field(default="")  # e.g. onnx/model_qint8_avx512_vnni.onnx for int8
+    embedding_encode_batch_size: int = Field(default=32)
+    embedding_threads: int = Field(default=4)
+    embedding_cache_enabled: bool = Field(default=True)
+    embedding_cache_path: str = Field(default="data/processed/embedding_cache.sqlite3")
+    embedding_cache_max_entries: int = Field(default=100000)
+    query_batching_enabled: bool = Field(default=True)
+    query_batch_window_ms: float = Field(default=5.0)
+    query_batch_max_size: int = Field(default=32)
+    embedding_server_socket: str = Field(default="")  # e.g. /tmp/medclaim-embeddings.sock to share one model across workers
+    embedding_server_autostart: bool = Field(default=True)
     
     # Vector Database
+    vector_backend: str = Field(default="chroma")  # chroma or mmap
     chroma_persist_dir: str = Field(default="data/chroma_db")
     collection_name: str = Field(default="medclaim-docs")
+    manifest_filename: str = Field(default="ingest_manifest.json")
+    vector_write_flush_ms: float = Field(default=50.0)
+    vector_write_max_batch: int = Field(default=1000)
+    # HNSW parameters are applied when the collection is created
+    hnsw_space: str = Field(default="l2")
+    hnsw_m: int = Field(default=16)
+    hnsw_construction_ef: int = Field(default=100)
+    hnsw_search_ef: int = Field(default=64)
+    hnsw_batch_size: int = Field(default=1000)
+    hnsw_sync_threshold: int = Field(default=5000)
+    # Memory-mapped backend; defaults to chroma_persist_dir/mmap_index so it is reset with the manifest
+    mmap_index_dir: str = Field(default="")
+    mmap_read_only: bool = Field(default=False)  # set in every process except the one that ingests; also covers partitions
+    mmap_ann_enabled: bool = Field(default=True)  # needs faiss-cpu; exact search otherwise
+    mmap_ann_min_rows: int = Field(default=50000)
+    # Per-document partitions answer filename-filtered searches without a global filtered ANN search
+    vector_partitions: bool = Field(default=False)
+    partition_index_dir: str = Field(default="")  # defaults to chroma_persist_dir/partitions
+    partition_cache_size: int = Field(default=256)  # partitions kept in memory per process
     
     # Retrieval Settings
     top_k: int = Field(default=2)
     chunk_size: int = Field(default=500)
     chunk_overlap: int = Field(default=100)
+    hybrid_retrieval: bool = Field(default=True)
+    hybrid_fetch_k: int = Field(default=10)
+    rrf_k: int = Field(default=60)
+    lexical_index_filename: str = Field(default="lexical_index.sqlite3")
+    retriever_cache_size: int = Field(default=256)
+    rerank_enabled: bool = Field(default=False)
+    reranker_model: str = Field(default="cross-encoder/ms-marco-MiniLM-L-6-v2")
+    rerank_candidates: int = Field(default=20)
+    rerank_batch_size: int = Field(default=16)
+    rerank_budget_ms: float = Field(default=300.0)
+    # Context packing: fill a token budget from context_candidates chunks instead of a fixed top_k.
+    # Off until benchmarked: it embeds every candidate sentence on each query
+    context_packing: bool = Field(default=False)
+    context_candidates: int = Field(default=8)
+    context_max_tokens: int = Field(default=1024)  # further capped by num_ctx - max_tokens - prompt
+    context_chars_per_token: float = Field(default=4.0)
+    context_relevance_margin: float = Field(default=0.15)
+    context_trim_sentences: bool = Field(default=True)
+    context_sentence_margin: float = Field(default=0.1)
+    context_min_new_fraction: float = Field(default=0.3)
+    context_sentence_cache_size: int = Field(default=4096)  # sentence vectors kept in memory per process
+    
+    # Answer Cache
+    answer_cache_size: int = Field(default=512)
+    answer_cache_similarity_threshold: float = Field(default=0.0)  # e.g. 0.95; 0 disables semantic hits
+    # Invalidation counters shared by all API worker processes, beside the manifest
+    answer_cache_generations_filename: str = Field(default="answer_generations.sqlite3")
+    
+    # Document Processing
+    extraction_workers: int = Field(default=4)
+    parallel_extraction_min_pages: int = Field(default=50)
+    min_page_chars: int = Field(default=50)
+    docling_cache_dir: str = Field(default="data/processed/docling_cache")
+    docling_cache_max_entries: int = Field(default=10000)  # least recently used pages are pruned beyond this
+    ingest_queue_pages: int = Field(default=16)
+    embed_batch_size: int = Field(default=64)
+    bulk_embed_batch_size: int = Field(default=512)
     
     # API Settings
     max_file_size_mb: int = Field(default=100)
+    executor_workers: int = Field(default=4)
+    query_concurrency: int = Field(default=16)
+    query_max_waiting: int = Field(default=64)
+    query_wait_timeout: float = Field(default=10.0)
+    batch_query_max_questions: int = Field(default=50)
+    batch_query_parallelism: int = Field(default=4)  # concurrent generations per batch; match OLLAMA_NUM_PARALLEL
+    upload_dir: str = Field(default="data/uploads")
+    ingest_queue_db: str = Field(default="data/uploads/ingest_jobs.sqlite3")
+    ingest_workers: int = Field(default=2)
+    ingest_lease_seconds: float = Field(default=60.0)  # a running job is reclaimed if not renewed for this long
+    ingest_max_attempts: int = Field(default=3)
+    warmup_enabled: bool = Field(default=True)
+    warmup_llm: bool = Field(default=True)
+
+    @model_validator(mode="after")
+    def _default_index_dirs(self) -> "Settings":
+        if not self.mmap_index_dir:
+            self.mmap_index_dir = os.path.join(self.chroma_persist_dir, "mmap_index")
+        if not self.partition_index_dir:
+            self.partition_index_dir = os.path.join(self.chroma_persist_dir, "partitions")
+        return self
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -0,0 +1,304 @@
+from typing import Dict, Any, Optional, List, Set
+from pathlib import Path
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from utils.metrics import EXECUTOR_QUEUE_WAIT
+
+
+class IngestJobQueue:
+    """Durable background ingestion queue backed by SQLite.
+
+    Uploaded bytes are written to `upload_dir` and a job row is queued; a pool of
+    worker threads drains the queue through `MedClaimRAGService.ingest_pdf` and
+    records per-stage progress. Several processes can share one queue database:
+    a job is claimed in a single write transaction together with a lease, which
+    its worker renews while the job runs. Jobs whose lease expired because
+    their process crashed or restarted are claimed again, since their files are
+    still on disk, and fail once they have been attempted `max_attempts` times.
+    Jobs for the same filename run one at a time, oldest first, so a
+    re-upload never races the ingest it replaces.
+    """
+
+    # Minimum seconds between progress writes for the same job
+    PROGRESS_INTERVAL = 0.5
+    # Seconds a worker waits before polling again after a database error
+    ERROR_BACKOFF = 1.0
+
+    def __init__(
+        self,
+        rag_service,
+        db_path: str,
+        upload_dir: str,
+        workers: int = 2,
+        lease_seconds: float = 60.0,
+        max_attempts: int = 3,
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.rag_service = rag_service
+        self.upload_dir = Path(upload_dir)
+        self.upload_dir.mkdir(parents=True, exist_ok=True)
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._running: Set[str] = set()
+        self._threads: List[threading.Thread] = []
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        self._lock = threading.Lock()
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                filename TEXT NOT NULL,
+                path TEXT NOT NULL,
+                status TEXT NOT NULL,
+                progress TEXT NOT NULL DEFAULT '{}',
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                owner TEXT,
+                lease_expires REAL
+            )
+            """
+        )
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, definition in (("owner", "TEXT"), ("lease_expires", "REAL")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+        self._conn.commit()
+
+    def start(self):
+        """Start the worker threads and the lease heartbeat."""
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"ingest-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat, name="ingest-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        self.logger.info(f"Started {self.workers} ingestion workers")
+
+    def stop(self):
+        """Ask workers to exit after their current job."""
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify_all()
+
+    def enqueue(self, file_bytes: bytes, filename: str) -> str:
+        """Persist the upload and queue an ingestion job, returning its ID."""
+        job_id = uuid.uuid4().hex
+        path = self.upload_dir / f"{job_id}.pdf"
+        path.write_bytes(file_bytes)
+
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, filename, path, status, created_at, updated_at) VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, filename, str(path), now, now)
+            )
+            self._conn.commit()
+        with self._wakeup:
+            self._wakeup.notify()
+        self.logger.info(f"Queued ingestion job {job_id} for {filename}")
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get the status, progress and result of a job."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            position = None
+            if row is not None and row["status"] == "queued":
+                position = self._conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created_at < ?", (row["created_at"],)
+                ).fetchone()[0]
+        if row is None:
+            return None
+        return {
+            "job_id": row["id"],
+            "filename": row["filename"],
+            "status": row["status"],
+            "queue_position": position,
+            "progress": json.loads(row["progress"]),
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "attempts": row["attempts"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+    def get_stats(self) -> Dict[str, int]:
+        """Count jobs by status."""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def _claim_next(self) -> Optional[sqlite3.Row]:
+        """Claim the oldest queued or abandoned job for this process.
+
+        BEGIN IMMEDIATE takes the database write lock before reading, so two
+        processes can never claim the same job. A job is skipped while another
+        job for the same filename holds a live lease.
+        """
+        with self._lock:
+            now = time.time()
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                abandoned = "status = 'running' AND (lease_expires IS NULL OR lease_expires < ?)"
+                exhausted = self._conn.execute(
+                    f"SELECT id, path FROM jobs WHERE {abandoned} AND attempts >= ?", (now, self.max_attempts)
+                ).fetchall()
+                if exhausted:
+                    self._conn.executemany(
+                        "UPDATE jobs SET status = 'failed', owner = NULL, lease_expires = NULL, updated_at = ?, "
+                        "error = 'Gave up after ' || attempts || ' attempts; the worker running it stopped responding' "
+                        "WHERE id = ?",
+                        [(now, job["id"]) for job in exhausted]
+                    )
+                row = self._conn.execute(
+                    f"SELECT * FROM jobs j WHERE (j.status = 'queued' OR ({abandoned})) "
+                    "AND NOT EXISTS (SELECT 1 FROM jobs r WHERE r.filename = j.filename AND r.id != j.id "
+                    "AND r.status = 'running' AND r.lease_expires >= ?) "
+                    "ORDER BY created_at LIMIT 1",
+                    (now, now)
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', attempts = attempts + 1, owner = ?, lease_expires = ?, "
+                        "updated_at = ? WHERE id = ?",
+                        (self._owner, now + self.lease_seconds, now, row["id"])
+                    )
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+            if row is not None:
+                self._running.add(row["id"])
+        if exhausted:
+            self.logger.warning(f"Failed {len(exhausted)} ingestion jobs that were abandoned {self.max_attempts} times")
+            for job in exhausted:
+                Path(job["path"]).unlink(missing_ok=True)
+        if row is not None and row["status"] == "running":
+            self.logger.warning(f"Reclaimed ingestion job {row['id']} after its lease expired")
+        return row
+
+    def _heartbeat(self):
+        """Extend the leases of the jobs this process is running."""
+        while True:
+            with self._wakeup:
+                if self._stopping and not self._running:
+                    return
+            try:
+                with self._lock:
+                    if self._running:
+                        job_ids = list(self._running)
+                        self._conn.execute(
+                            f"UPDATE jobs SET lease_expires = ? WHERE owner = ? AND status = 'running' "
+                            f"AND id IN ({','.join('?' * len(job_ids))})",
+                            (time.time() + self.lease_seconds, self._owner, *job_ids)
+                        )
+                        self._conn.commit()
+            except sqlite3.Error as e:
+                # Retried on the next beat, well before the lease runs out
+                self.logger.error(f"Failed to renew ingestion job leases: {str(e)}")
+            time.sleep(self.lease_seconds / 3)
+
+    def _update(self, job_id: str, **fields) -> bool:
+        """Update a job this process still owns; False if its lease was lost to another worker."""
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            updated = self._conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ? AND owner = ?", (*fields.values(), job_id, self._owner)
+            ).rowcount
+            self._conn.commit()
+        return bool(updated)
+
+    def _finish(self, job_id: str, **fields) -> bool:
+        """Record a job's outcome and release its lease; False if another worker reclaimed it."""
+        with self._lock:
+            self._running.discard(job_id)
+        finished = self._update(job_id, owner=None, lease_expires=None, **fields)
+        if not finished:
+            self.logger.warning(f"Ingestion job {job_id} was reclaimed by another worker; not recording its outcome")
+        # Queued jobs for the same filename can run now
+        with self._wakeup:
+            self._wakeup.notify_all()
+        return finished
+
+    def _worker(self):
+        while True:
+            with self._wakeup:
+                if self._stopping:
+                    return
+            try:
+                job = self._claim_next()
+                if job is not None:
+                    self._run(job)
+                    continue
+                timeout = 5.0
+            except Exception as e:
+                # e.g. "database is locked" while another process holds the write lock
+                self.logger.error(f"Ingestion worker error: {str(e)}")
+                timeout = self.ERROR_BACKOFF
+            with self._wakeup:
+                if not self._stopping:
+                    self._wakeup.wait(timeout=timeout)
+
+    def _run(self, job: sqlite3.Row):
+        job_id, filename, path = job["id"], job["filename"], Path(job["path"])
+        self.logger.info(f"Running ingestion job {job_id} for {filename}")
+        start_time = time.time()
+        EXECUTOR_QUEUE_WAIT.labels("ingest_jobs").observe(max(start_time - job["created_at"], 0.0))
+        last_write = {"time": 0.0, "stage": None}
+        latest = {}
+
+        def on_progress(progress: Dict[str, Any]):
+            # Throttle writes, but always record stage changes
+            latest.update(progress)
+            now = time.time()
+            if progress["stage"] != last_write["stage"] or now - last_write["time"] >= self.PROGRESS_INTERVAL:
+                last_write.update(time=now, stage=progress["stage"])
+                try:
+                    self._update(job_id, progress=json.dumps(progress))
+                except sqlite3.Error as e:
+                    # Progress is informational; the final write records the latest stage
+                    self.logger.warning(f"Failed to record progress of ingestion job {job_id}: {str(e)}")
+
+        reclaimed = False
+        try:
+            try:
+                file_bytes = path.read_bytes()
+                result = self.rag_service.ingest_pdf(file_bytes, filename, progress_callback=on_progress)
+            except Exception as e:
+                self.logger.error(f"Ingestion job {job_id} failed: {str(e)}")
+                reclaimed = not self._finish(job_id, status="failed", progress=json.dumps(latest), error=str(e))
+                return
+
+            status = "succeeded" if result["status"] == "success" else "failed"
+            reclaimed = not self._finish(
+                job_id,
+                status=status,
+                progress=json.dumps(latest),
+                result=json.dumps(result),
+                error=None if status == "succeeded" else result.get("message")
+            )
+            job_time = time.time() - start_time
+            self.logger.info(f"Ingestion job {job_id} {status} in {job_time:.2f} seconds")
+        finally:
+            # The worker that reclaimed the job still needs the upload
+            if not reclaimed:
+                path.unlink(missing_ok=True)
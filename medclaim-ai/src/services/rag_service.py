@@ -1,15 +1,28 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, Callable, Tuple
 from langchain_ollama import ChatOllama
-from langchain.chains import RetrievalQA
+from langchain.chains.question_answering import load_qa_chain
 from langchain.prompts import PromptTemplate
+from langchain_core.documents import Document
 from config.settings import get_settings
 from utils.document_processor import DocumentProcessor
 from utils.vector_store import VectorStoreManager
+from utils.ingest_manifest import IngestManifest
+from utils.pipeline import bounded_prefetch
+from utils.answer_cache import AnswerCache
+from utils.reranker import BudgetedReranker, RerankingRetriever
+from utils.context_packer import ContextPacker
+from utils.metrics import STAGE_DURATION, observe_stage, record_cache
 import asyncio
+from collections import OrderedDict
 from functools import lru_cache
 import logging
+import os
+import threading
 import time
 
+# Bump whenever the prompt template changes so cached answers are not reused
+PROMPT_VERSION = "1"
+
 
 class MedClaimRAGService:
     """RAG service for medical claim document processing and querying."""
@@ -25,7 +38,12 @@ class MedClaimRAGService:
         
         self.document_processor = DocumentProcessor(
             chunk_size=self.settings.chunk_size,
-            chunk_overlap=self.settings.chunk_overlap
+            chunk_overlap=self.settings.chunk_overlap,
+            extraction_workers=self.settings.extraction_workers,
+            parallel_min_pages=self.settings.parallel_extraction_min_pages,
+            min_page_chars=self.settings.min_page_chars,
+            fallback_cache_dir=self.settings.docling_cache_dir,
+            fallback_cache_max_entries=self.settings.docling_cache_max_entries
         )
         self.logger.info(f"Document processor initialized with chunk_size={self.settings.chunk_size}")
         
@@ -34,6 +52,11 @@ class MedClaimRAGService:
         vector_time = time.time() - vector_start
         self.logger.info(f"Vector store initialized in {vector_time:.2f} seconds")
         
+        # Manifest lives beside the vector store so both are reset together
+        self.manifest = IngestManifest(
+            os.path.join(self.settings.chroma_persist_dir, self.settings.manifest_filename)
+        )
+        
         # Initialize LLM with optimized settings
         llm_start = time.time()
         self.logger.info(f"Initializing LLM: {self.settings.ollama_model}")
@@ -68,9 +91,40 @@ Question: {question}
 Answer concisely with specific details (policy numbers, amounts, codes) if available:"""
         )
         
-        # Initialize QA chain and cache for filtered chains
+        self.answer_cache = AnswerCache(
+            max_entries=self.settings.answer_cache_size,
+            similarity_threshold=self.settings.answer_cache_similarity_threshold,
+            embed_query=self.vector_store.embeddings.embed_query,
+            generation_path=os.path.join(
+                self.settings.chroma_persist_dir, self.settings.answer_cache_generations_filename
+            )
+        )
+        
+        self.reranker = None
+        if self.settings.rerank_enabled:
+            self.reranker = BudgetedReranker(
+                self.settings.reranker_model,
+                batch_size=self.settings.rerank_batch_size,
+                budget_ms=self.settings.rerank_budget_ms
+            )
+        
+        self.context_packer = None
+        if self.settings.context_packing:
+            self.context_packer = ContextPacker(
+                self.vector_store.base_embeddings,
+                chars_per_token=self.settings.context_chars_per_token,
+                relevance_margin=self.settings.context_relevance_margin,
+                trim_sentences=self.settings.context_trim_sentences,
+                sentence_margin=self.settings.context_sentence_margin,
+                min_new_fraction=self.settings.context_min_new_fraction,
+                query_embeddings=self.vector_store.embeddings,
+                sentence_cache_size=self.settings.context_sentence_cache_size
+            )
+        
+        # Initialize the shared QA chain and LRU cache of per-filter retrievers
         self.qa_chain = None
-        self._filtered_chains_cache = {}
+        self._retriever_cache = OrderedDict()
+        self._retriever_cache_lock = threading.Lock()
         qa_start = time.time()
         self._setup_qa_chain()
         qa_time = time.time() - qa_start
@@ -80,32 +134,103 @@ Answer concisely with specific details (policy numbers, amounts, codes) if avail
         self.logger.info(f"MedClaimRAGService fully initialized in {total_time:.2f} seconds")
     
     def _setup_qa_chain(self):
-        """Setup the QA chain with retriever."""
+        """Setup the "stuff" QA chain shared by all queries.
+        
+        The chain takes retrieved documents as input, so the filename filter is
+        applied per call by the retriever rather than baked into the chain.
+        """
         self.logger.info("Setting up QA chain...")
-        retriever = self.vector_store.get_retriever()
-        self.qa_chain = RetrievalQA.from_chain_type(
+        self.qa_chain = load_qa_chain(
             llm=self.llm,
             chain_type="stuff",
-            retriever=retriever,
-            return_source_documents=True,
-            chain_type_kwargs={"prompt": self.prompt_template}
+            prompt=self.prompt_template
         )
         self.logger.info("QA chain setup completed")
     
-    def ingest_pdf(self, file_bytes: bytes, filename: str) -> Dict[str, Any]:
-        """Process and ingest a PDF document."""
+    def warm_up(self) -> Dict[str, Dict[str, Any]]:
+        """Exercise each component once so the first real request does not pay for lazy loading.
+        
+        Returns per-component {"ready", "seconds"} or {"ready": False, "error"}.
+        Failures are logged and reported rather than raised.
+        """
+        components = {}
+        
+        def run(name: str, func: Callable[[], Any]):
+            start = time.time()
+            try:
+                func()
+                components[name] = {"ready": True, "seconds": round(time.time() - start, 2)}
+                self.logger.info(f"Warmed up {name} in {components[name]['seconds']:.2f} seconds")
+            except Exception as e:
+                self.logger.warning(f"Warm-up of {name} failed: {str(e)}")
+                components[name] = {"ready": False, "error": str(e)}
+        
+        run("embeddings", self.vector_store.warm_up)
+        if self.reranker:
+            run("reranker", lambda: self.reranker.rerank(
+                "warm up", [Document(page_content="warm up"), Document(page_content="warm up")], 1
+            ))
+        if self.settings.warmup_llm:
+            # One-token generation loads the model into Ollama with the same num_ctx as real queries
+            run("llm", lambda: self.llm.model_copy(update={"num_predict": 1}).invoke("Hi"))
+        return components
+    
+    def ingest_pdf(
+        self,
+        file_bytes: bytes,
+        filename: str,
+        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Dict[str, Any]:
+        """Process and ingest a PDF document.
+        
+        Files whose content is already indexed are skipped, and files already indexed
+        under another name reuse the stored embeddings instead of being re-extracted.
+        `progress_callback`, if given, receives the current stage and the pages
+        extracted / chunks embedded so far as ingestion advances.
+        """
         self.logger.info(f"Starting PDF ingestion for {filename}")
         start_time = time.time()
+        progress = {"stage": "hashing", "pages_extracted": 0, "chunks_total": 0, "chunks_embedded": 0}
+        
+        def report(**updates):
+            progress.update(updates)
+            if progress_callback:
+                progress_callback(dict(progress))
+        
+        def counted_pages():
+            for page in self.document_processor.iter_pages(file_bytes):
+                report(pages_extracted=progress["pages_extracted"] + 1)
+                yield page
         
         try:
-            # Extract and chunk text
-            self.logger.info(f"Processing PDF content for {filename}")
-            chunk_start = time.time()
-            chunks = self.document_processor.process_pdf(file_bytes)
-            chunk_time = time.time() - chunk_start
-            self.logger.info(f"PDF chunking completed in {chunk_time:.2f} seconds, {len(chunks) if chunks else 0} chunks created")
-            
-            if not chunks:
+            report()
+            content_hash = self.manifest.content_hash(file_bytes)
+            reused = self._reuse_indexed(content_hash, filename)
+            if reused is not None:
+                total_time = time.time() - start_time
+                self.logger.info(f"{reused['message']} ({total_time:.2f} seconds)")
+                return reused
+            
+            # Stream pages -> chunks -> embedding batches; extraction runs ahead in a bounded queue
+            self.logger.info(f"Streaming PDF content for {filename} into the vector store")
+            vector_start = time.time()
+            report(stage="extracting")
+            pages = bounded_prefetch(counted_pages(), maxsize=self.settings.ingest_queue_pages)
+            stats = self.vector_store.add_document_stream(
+                self.document_processor.iter_chunks(pages),
+                filename,
+                batch_size=self.settings.embed_batch_size,
+                progress_callback=lambda batch_stats: report(
+                    stage="embedding",
+                    chunks_total=batch_stats["chunks_total"],
+                    chunks_embedded=batch_stats["chunks_embedded"]
+                )
+            )
+            report(stage="done", chunks_total=stats["chunks_total"], chunks_embedded=stats["chunks_embedded"])
+            vector_time = time.time() - vector_start
+            self.logger.info(f"Streaming ingestion completed in {vector_time:.2f} seconds, {stats['chunks_total']} chunks created")
+            
+            if not stats["chunks_total"]:
                 self.logger.warning(f"No text extracted from {filename}")
                 return {
                     "filename": filename,
@@ -113,21 +238,10 @@ Answer concisely with specific details (policy numbers, amounts, codes) if avail
                     "message": "No text could be extracted from the PDF",
                     "chunks_added": 0
                 }
+            chunks_embedded = stats["chunks_embedded"]
+            self.manifest.record(filename, content_hash, stats["chunks_total"])
             
-            # Add to vector store
-            self.logger.info(f"Adding {len(chunks)} chunks to vector store for {filename}")
-            vector_start = time.time()
-            chunks_added = self.vector_store.add_documents(chunks, filename)
-            vector_time = time.time() - vector_start
-            self.logger.info(f"Vector store update completed in {vector_time:.2f} seconds")
-            
-            # Refresh QA chain and clear filtered chain cache
-            self.logger.info("Refreshing QA chain after document ingestion")
-            refresh_start = time.time()
-            self._setup_qa_chain()
-            self._filtered_chains_cache.clear()
-            refresh_time = time.time() - refresh_start
-            self.logger.info(f"QA chain refresh completed in {refresh_time:.2f} seconds")
+            self._on_document_changed(filename)
             
             total_time = time.time() - start_time
             self.logger.info(f"PDF ingestion for {filename} completed in {total_time:.2f} seconds")
@@ -135,8 +249,8 @@ Answer concisely with specific details (policy numbers, amounts, codes) if avail
             return {
                 "filename": filename,
                 "status": "success",
-                "chunks_added": chunks_added,
-                "message": f"Successfully processed {filename}"
+                "chunks_added": chunks_embedded,
+                "message": f"Successfully processed {filename} ({chunks_embedded} of {stats['chunks_total']} chunks embedded)"
             }
             
         except Exception as e:
@@ -148,27 +262,181 @@ Answer concisely with specific details (policy numbers, amounts, codes) if avail
                 "chunks_added": 0
             }
     
-    def _get_filtered_qa_chain(self, filter_filenames: List[str]):
-        """Get or create cached QA chain for specific filename filters."""
-        cache_key = tuple(sorted(filter_filenames))
-        
-        if cache_key not in self._filtered_chains_cache:
-            self.logger.info(f"Creating new filtered QA chain for files: {filter_filenames}")
-            chain_start = time.time()
-            retriever = self.vector_store.get_filtered_retriever(filter_filenames)
-            self._filtered_chains_cache[cache_key] = RetrievalQA.from_chain_type(
-                llm=self.llm,
-                chain_type="stuff",
-                retriever=retriever,
-                return_source_documents=True,
-                chain_type_kwargs={"prompt": self.prompt_template}
-            )
-            chain_time = time.time() - chain_start
-            self.logger.info(f"Filtered QA chain created in {chain_time:.2f} seconds")
-        else:
-            self.logger.info(f"Using cached filtered QA chain for files: {filter_filenames}")
+    def _reuse_indexed(self, content_hash: str, filename: str) -> Optional[Dict[str, Any]]:
+        """Return a result without extraction if this content is already indexed.
+        
+        Identical content under the same filename is skipped; content indexed under
+        another filename is copied with its stored embeddings. Returns None when
+        the file has to be processed.
+        """
+        if self.manifest.is_indexed(filename, content_hash) and self.vector_store.get_document_ids(filename):
+            return {
+                "filename": filename,
+                "status": "success",
+                "chunks_added": 0,
+                "message": f"{filename} is already indexed"
+            }
         
-        return self._filtered_chains_cache[cache_key]
+        for source_filename in self.manifest.find_by_hash(content_hash):
+            if source_filename == filename:
+                continue
+            chunks_added = self.vector_store.copy_document(source_filename, filename)
+            if chunks_added:
+                self.manifest.record(filename, content_hash, chunks_added)
+                self._on_document_changed(filename)
+                return {
+                    "filename": filename,
+                    "status": "success",
+                    "chunks_added": chunks_added,
+                    "message": f"{filename} is already indexed as {source_filename}, reused its embeddings"
+                }
+        return None
+    
+    def ingest_pdfs(self, files: List[Tuple[bytes, str]]) -> Dict[str, Any]:
+        """Ingest a packet of PDFs together.
+        
+        Text layers of all files are extracted in parallel, and the chunks of
+        every file are streamed into shared large embedding batches and writes
+        instead of one small write per file. A file that fails to extract is
+        reported as an error and keeps its previously stored chunks. Returns
+        per-file results and aggregate throughput.
+        """
+        self.logger.info(f"Starting bulk ingestion of {len(files)} PDFs")
+        start_time = time.time()
+        results: Dict[str, Dict[str, Any]] = {}
+        
+        # Duplicate names in one request would overwrite each other; keep the last
+        pending: Dict[str, Tuple[bytes, str]] = {}
+        for file_bytes, filename in files:
+            try:
+                content_hash = self.manifest.content_hash(file_bytes)
+                reused = self._reuse_indexed(content_hash, filename)
+            except Exception as e:
+                self.logger.error(f"Error processing {filename}: {str(e)}")
+                reused = {
+                    "filename": filename,
+                    "status": "error",
+                    "message": f"Error processing {filename}: {str(e)}",
+                    "chunks_added": 0
+                }
+            if reused is not None:
+                results[filename] = reused
+            else:
+                pending[filename] = (file_bytes, content_hash)
+        
+        page_counts: Dict[str, int] = {}
+        chunks_total = 0
+        if pending:
+            filenames = list(pending)
+            page_iterators = self.document_processor.iter_pages_batch([pending[name][0] for name in filenames])
+            page_counts = dict.fromkeys(filenames, 0)
+            
+            def counted_pages(filename, pages):
+                for page in pages:
+                    page_counts[filename] += 1
+                    yield page
+            
+            # Each file streams pages -> chunks -> shared embedding batches, extraction running ahead in a bounded queue
+            documents = {
+                filename: self.document_processor.iter_chunks(
+                    bounded_prefetch(counted_pages(filename, pages), maxsize=self.settings.ingest_queue_pages)
+                )
+                for filename, pages in zip(filenames, page_iterators)
+            }
+            try:
+                file_stats = self.vector_store.add_documents_bulk(documents)
+            except Exception as e:
+                self.logger.error(f"Error in bulk vector store update: {str(e)}")
+                file_stats = {
+                    filename: {"error": str(e)} for filename in filenames
+                }
+            
+            for filename, stats in file_stats.items():
+                if "error" in stats:
+                    results[filename] = {
+                        "filename": filename,
+                        "status": "error",
+                        "message": f"Error processing {filename}: {stats['error']}",
+                        "chunks_added": 0
+                    }
+                elif not stats["chunks_total"]:
+                    self.logger.warning(f"No text extracted from {filename}")
+                    results[filename] = {
+                        "filename": filename,
+                        "status": "error",
+                        "message": "No text could be extracted from the PDF",
+                        "chunks_added": 0
+                    }
+                else:
+                    chunks_total += stats["chunks_total"]
+                    self.manifest.record(filename, pending[filename][1], stats["chunks_total"])
+                    self._on_document_changed(filename)
+                    results[filename] = {
+                        "filename": filename,
+                        "status": "success",
+                        "chunks_added": stats["chunks_embedded"],
+                        "message": f"Successfully processed {filename} ({stats['chunks_embedded']} of {stats['chunks_total']} chunks embedded)"
+                    }
+        
+        pages_total = sum(page_counts.values())
+        total_time = time.time() - start_time
+        succeeded = sum(1 for result in results.values() if result["status"] == "success")
+        self.logger.info(f"Bulk ingestion of {len(files)} PDFs completed in {total_time:.2f} seconds, {succeeded} succeeded")
+        return {
+            "status": "success" if succeeded == len(results) else ("partial" if succeeded else "error"),
+            "files": [results[filename] for filename in dict.fromkeys(filename for _, filename in files)],
+            "files_total": len(results),
+            "files_succeeded": succeeded,
+            "pages_extracted": pages_total,
+            "chunks_total": chunks_total,
+            "chunks_embedded": sum(result["chunks_added"] for result in results.values()),
+            "elapsed_seconds": round(total_time, 3),
+            "files_per_second": round(len(results) / total_time, 2) if total_time else None,
+            "pages_per_second": round(pages_total / total_time, 2) if total_time else None,
+            "chunks_per_second": round(chunks_total / total_time, 2) if total_time else None,
+        }
+    
+    def _on_document_changed(self, filename: str):
+        """Drop cached answers that may depend on a file whose chunks changed.
+        
+        The invalidation is recorded in the shared generation counters, so
+        other API worker processes drop their copies on their next lookup.
+        Retrievers query the live index, so cached retrievers and the shared
+        chain stay valid and other sessions keep their cached state.
+        """
+        self.answer_cache.invalidate_filename(filename)
+    
+    def _get_cached_retriever(self, filter_filenames: Optional[List[str]] = None):
+        """Get or create the retriever for a filename filter from a bounded LRU cache."""
+        cache_key = tuple(sorted(set(filter_filenames))) if filter_filenames else None
+        
+        with self._retriever_cache_lock:
+            retriever = self._retriever_cache.get(cache_key)
+            if retriever is not None:
+                self._retriever_cache.move_to_end(cache_key)
+                record_cache("retriever", hit=True)
+                return retriever
+        record_cache("retriever", hit=False)
+        
+        self.logger.info(f"Creating retriever for files: {filter_filenames}")
+        retriever = self._get_retriever(filter_filenames)
+        with self._retriever_cache_lock:
+            self._retriever_cache[cache_key] = retriever
+            while len(self._retriever_cache) > self.settings.retriever_cache_size:
+                self._retriever_cache.popitem(last=False)
+        return retriever
+    
+    @staticmethod
+    def _format_sources(source_docs) -> List[Dict[str, Any]]:
+        """Format retrieved documents as truncated source previews."""
+        sources = []
+        for doc in source_docs:
+            sources.append({
+                "content": doc.page_content[:500] + "..." if len(doc.page_content) > 500 else doc.page_content,
+                "metadata": doc.metadata,
+                "filename": doc.metadata.get("filename", "unknown")
+            })
+        return sources
     
     def query(self, question: str, filter_filenames: Optional[List[str]] = None) -> Dict[str, Any]:
         """Query the knowledge base with optional filename filtering."""
@@ -176,47 +444,44 @@ Answer concisely with specific details (policy numbers, amounts, codes) if avail
         start_time = time.time()
         
         try:
-            # Use cached filtered chain if filenames specified
-            if filter_filenames:
-                chain_start = time.time()
-                qa_chain = self._get_filtered_qa_chain(filter_filenames)
-                chain_time = time.time() - chain_start
-                self.logger.info(f"QA chain retrieval took {chain_time:.2f} seconds")
-                
-                invoke_start = time.time()
-                result = qa_chain.invoke({"query": question})
-                invoke_time = time.time() - invoke_start
-                self.logger.info(f"Filtered query invocation took {invoke_time:.2f} seconds")
-            else:
-                invoke_start = time.time()
-                result = self.qa_chain.invoke({"query": question})
-                invoke_time = time.time() - invoke_start
-                self.logger.info(f"Standard query invocation took {invoke_time:.2f} seconds")
+            generation = self.answer_cache.generation(filter_filenames)
+            cached = self.answer_cache.get(question, filter_filenames, self.settings.ollama_model, PROMPT_VERSION)
+            if cached is not None:
+                total_time = time.time() - start_time
+                self.logger.info(f"Answer cache hit, query served in {total_time:.2f} seconds")
+                return {**cached, "cached": True}
+            
+            retrieve_start = time.time()
+            source_docs = self._get_cached_retriever(filter_filenames).invoke(question)
+            retrieve_time = time.time() - retrieve_start
+            STAGE_DURATION.labels("retrieval").observe(retrieve_time)
+            self.logger.info(f"Retrieved {len(source_docs)} source documents in {retrieve_time:.2f} seconds")
+            source_docs = self._pack_context(question, source_docs)
+            
+            invoke_start = time.time()
+            result = self.qa_chain.invoke({"input_documents": source_docs, "question": question})
+            invoke_time = time.time() - invoke_start
+            STAGE_DURATION.labels("generation").observe(invoke_time)
+            self.logger.info(f"QA chain invocation took {invoke_time:.2f} seconds")
             
             # Format response
             format_start = time.time()
-            answer = result.get("result", "")
-            source_docs = result.get("source_documents", [])
-            self.logger.info(f"Retrieved {len(source_docs)} source documents")
-            
-            sources = []
-            for doc in source_docs:
-                sources.append({
-                    "content": doc.page_content[:500] + "..." if len(doc.page_content) > 500 else doc.page_content,
-                    "metadata": doc.metadata,
-                    "filename": doc.metadata.get("filename", "unknown")
-                })
+            answer = result.get("output_text", "")
+            sources = self._format_sources(source_docs)
             
             format_time = time.time() - format_start
             total_time = time.time() - start_time
             self.logger.info(f"Response formatting took {format_time:.2f} seconds")
             self.logger.info(f"Total query processing took {total_time:.2f} seconds")
             
-            return {
+            response = {
                 "answer": answer,
                 "sources": sources,
+                "source_ids": [doc.id for doc in source_docs if getattr(doc, "id", None)],
                 "status": "success"
             }
+            self.answer_cache.put(question, filter_filenames, self.settings.ollama_model, PROMPT_VERSION, response, generation)
+            return {**response, "cached": False}
             
         except Exception as e:
             self.logger.error(f"Error processing query: {str(e)}")
@@ -226,11 +491,319 @@ Answer concisely with specific details (policy numbers, amounts, codes) if avail
                 "status": "error"
             }
     
+    def _retrieval_k(self) -> Tuple[int, int]:
+        """Chunks to fetch from the index and chunks to keep after reranking."""
+        final_k = self.settings.context_candidates if self.context_packer else self.settings.top_k
+        return (self.settings.rerank_candidates if self.reranker else final_k), final_k
+    
+    def _get_retriever(self, filter_filenames: Optional[List[str]] = None):
+        """Get a retriever for all documents or only the given filenames.
+        
+        With reranking enabled, `rerank_candidates` chunks are fetched and only
+        the best are kept after cross-encoder scoring. That is `top_k`, or
+        `context_candidates` when context packing chooses how many reach the LLM.
+        """
+        k, final_k = self._retrieval_k()
+        if filter_filenames:
+            retriever = self.vector_store.get_filtered_retriever(filter_filenames, k=k)
+        else:
+            retriever = self.vector_store.get_retriever(k=k)
+        if self.reranker:
+            return RerankingRetriever(base_retriever=retriever, reranker=self.reranker, top_n=final_k)
+        return retriever
+    
+    def _pack_context(self, question: str, source_docs: List[Document]) -> List[Document]:
+        """Fit retrieved chunks to the prompt's token budget when context packing is enabled.
+        
+        The budget is what `num_ctx` leaves after the answer (`max_tokens`) and
+        the prompt around the context, capped at `context_max_tokens` because
+        CPU prefill time grows with every prompt token.
+        """
+        if self.context_packer is None:
+            return source_docs
+        with observe_stage("context_packing"):
+            return self.context_packer.pack(question, source_docs, self._context_budget(question))
+    
+    def _context_budget(self, question: str) -> int:
+        prompt_tokens = self.context_packer.estimate_tokens(self._build_prompt(question, []))
+        budget = min(
+            self.settings.context_max_tokens,
+            self.settings.num_ctx - self.settings.max_tokens - prompt_tokens
+        )
+        return max(budget, 1)
+    
+    def _build_prompt(self, question: str, source_docs) -> str:
+        """Build the same prompt the "stuff" chain sends to the LLM."""
+        return self.prompt_template.format(
+            context="\n\n".join(doc.page_content for doc in source_docs),
+            question=question
+        )
+    
+    async def aquery(self, question: str, filter_filenames: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Query the knowledge base without blocking the event loop.
+        
+        Generation uses the async LLM interface, so concurrent queries wait on
+        Ollama over HTTP instead of holding executor threads. Cache lookups,
+        retrieval and packing embed text and read the indexes synchronously, so
+        they run in worker threads.
+        """
+        self.logger.info(f"Processing async query with {len(filter_filenames) if filter_filenames else 0} file filters")
+        start_time = time.time()
+        
+        try:
+            generation = self.answer_cache.generation(filter_filenames)
+            # Lookup may embed the question when semantic hits are enabled
+            cached = await asyncio.to_thread(
+                self.answer_cache.get, question, filter_filenames, self.settings.ollama_model, PROMPT_VERSION
+            )
+            if cached is not None:
+                total_time = time.time() - start_time
+                self.logger.info(f"Answer cache hit, query served in {total_time:.2f} seconds")
+                return {**cached, "cached": True}
+            
+            retrieve_start = time.time()
+            source_docs = await asyncio.to_thread(self._get_cached_retriever(filter_filenames).invoke, question)
+            retrieve_time = time.time() - retrieve_start
+            STAGE_DURATION.labels("retrieval").observe(retrieve_time)
+            self.logger.info(f"Retrieved {len(source_docs)} source documents in {retrieve_time:.2f} seconds")
+            # Packing embeds sentences, so keep it off the event loop
+            source_docs = await asyncio.to_thread(self._pack_context, question, source_docs)
+            
+            invoke_start = time.time()
+            message = await self.llm.ainvoke(self._build_prompt(question, source_docs))
+            invoke_time = time.time() - invoke_start
+            STAGE_DURATION.labels("generation").observe(invoke_time)
+            self.logger.info(f"Async LLM generation took {invoke_time:.2f} seconds")
+            
+            response = {
+                "answer": message.content,
+                "sources": self._format_sources(source_docs),
+                "source_ids": [doc.id for doc in source_docs if getattr(doc, "id", None)],
+                "status": "success"
+            }
+            # Storing may embed the question too
+            await asyncio.to_thread(
+                self.answer_cache.put,
+                question, filter_filenames, self.settings.ollama_model, PROMPT_VERSION, response, generation
+            )
+            
+            total_time = time.time() - start_time
+            self.logger.info(f"Total async query processing took {total_time:.2f} seconds")
+            return {**response, "cached": False}
+            
+        except Exception as e:
+            self.logger.error(f"Error processing query: {str(e)}")
+            return {
+                "answer": f"Error processing query: {str(e)}",
+                "sources": [],
+                "status": "error"
+            }
+    
+    def _retrieve_batch(
+        self,
+        questions: List[str],
+        filter_filenames: Optional[List[str]],
+    ) -> Tuple[List[List[Document]], int, int]:
+        """Retrieve and pack context for several questions against the same filter set.
+        
+        All questions are embedded in one batch, and each sentence retrieved for
+        more than one question is embedded once when packing. Returns the packed
+        documents per question plus the total and distinct number of chunks retrieved.
+        """
+        with observe_stage("retrieval"):
+            query_vectors = self.vector_store.embed_queries(questions)
+            k, final_k = self._retrieval_k()
+            retrieved = []
+            for question, query_vector in zip(questions, query_vectors):
+                docs = self.vector_store.search(question, k, filter_filenames, query_vector=query_vector)
+                if self.reranker:
+                    with observe_stage("rerank"):
+                        docs = self.reranker.rerank(question, docs, final_k)
+                retrieved.append(docs)
+        total_chunks = sum(len(docs) for docs in retrieved)
+        distinct_chunks = len({doc.id or doc.page_content for docs in retrieved for doc in docs})
+        
+        if self.context_packer is not None:
+            with observe_stage("context_packing"):
+                retrieved = self.context_packer.pack_many(
+                    questions, query_vectors, retrieved, [self._context_budget(question) for question in questions]
+                )
+        return retrieved, total_chunks, distinct_chunks
+    
+    async def aquery_batch(self, questions: List[str], filter_filenames: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Answer a checklist of questions against the same documents in one call.
+        
+        Cached answers are returned directly and repeated questions are answered
+        once. The rest share one embedding batch and their overlapping retrieved
+        context, then generate concurrently, at most `batch_query_parallelism`
+        at a time. Ollama only runs them in parallel up to its own
+        OLLAMA_NUM_PARALLEL. A failed question is reported in its result and does
+        not fail the others.
+        """
+        self.logger.info(
+            f"Processing batch of {len(questions)} questions with "
+            f"{len(filter_filenames) if filter_filenames else 0} file filters"
+        )
+        start_time = time.time()
+        results: List[Optional[Dict[str, Any]]] = [None] * len(questions)
+        
+        # Questions that normalize the same share one answer
+        groups: "OrderedDict[str, List[int]]" = OrderedDict()
+        for i, question in enumerate(questions):
+            groups.setdefault(AnswerCache.normalize_question(question), []).append(i)
+        
+        generation = self.answer_cache.generation(filter_filenames)
+        
+        def lookup_cached():
+            return {
+                key: self.answer_cache.get(questions[indices[0]], filter_filenames, self.settings.ollama_model, PROMPT_VERSION)
+                for key, indices in groups.items()
+            }
+        
+        cached = await asyncio.to_thread(lookup_cached)
+        pending = [key for key in groups if cached[key] is None]
+        for key, indices in groups.items():
+            if cached[key] is not None:
+                for i in indices:
+                    results[i] = {"question": questions[i], **cached[key], "cached": True}
+        
+        total_chunks = distinct_chunks = 0
+        if pending:
+            pending_questions = [questions[groups[key][0]] for key in pending]
+            retrieve_start = time.time()
+            try:
+                contexts, total_chunks, distinct_chunks = await asyncio.to_thread(
+                    self._retrieve_batch, pending_questions, filter_filenames
+                )
+            except Exception as e:
+                self.logger.error(f"Error retrieving context for batch: {str(e)}")
+                error = {"answer": f"Error processing query: {str(e)}", "sources": [], "status": "error", "cached": False}
+                for key in pending:
+                    for i in groups[key]:
+                        results[i] = {"question": questions[i], **error}
+                pending_questions, contexts = [], []
+            else:
+                retrieve_time = time.time() - retrieve_start
+                self.logger.info(
+                    f"Retrieved context for {len(pending_questions)} questions in {retrieve_time:.2f} seconds "
+                    f"({distinct_chunks} distinct of {total_chunks} chunks)"
+                )
+            
+            semaphore = asyncio.Semaphore(self.settings.batch_query_parallelism)
+            
+            async def answer(key: str, question: str, source_docs: List[Document]):
+                try:
+                    async with semaphore:
+                        generate_start = time.time()
+                        message = await self.llm.ainvoke(self._build_prompt(question, source_docs))
+                        STAGE_DURATION.labels("generation").observe(time.time() - generate_start)
+                    response = {
+                        "answer": message.content,
+                        "sources": self._format_sources(source_docs),
+                        "source_ids": [doc.id for doc in source_docs if getattr(doc, "id", None)],
+                        "status": "success"
+                    }
+                    await asyncio.to_thread(
+                        self.answer_cache.put,
+                        question, filter_filenames, self.settings.ollama_model, PROMPT_VERSION, response, generation
+                    )
+                    response = {**response, "cached": False}
+                except Exception as e:
+                    self.logger.error(f"Error answering batch question: {str(e)}")
+                    response = {"answer": f"Error processing query: {str(e)}", "sources": [], "status": "error", "cached": False}
+                for i in groups[key]:
+                    results[i] = {"question": questions[i], **response}
+            
+            await asyncio.gather(*(
+                answer(key, question, docs) for key, question, docs in zip(pending, pending_questions, contexts)
+            ))
+        
+        total_time = time.time() - start_time
+        failed = sum(1 for result in results if result["status"] != "success")
+        from_cache = sum(1 for result in results if result.get("cached"))
+        self.logger.info(
+            f"Batch of {len(questions)} questions answered in {total_time:.2f} seconds "
+            f"({from_cache} from cache, {failed} failed)"
+        )
+        return {
+            "results": results,
+            "status": "success" if not failed else ("error" if failed == len(questions) else "partial"),
+            "question_count": len(questions),
+            "generated_count": len(pending),
+            "retrieved_chunks": total_chunks,
+            "distinct_chunks": distinct_chunks,
+            "processing_time": round(total_time, 2)
+        }
+    
+    def stream_query(self, question: str, filter_filenames: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        """Query the knowledge base, yielding sources first and then answer tokens.
+        
+        Yields events of the form {"type": "sources" | "token" | "done" | "error", ...}.
+        """
+        self.logger.info(f"Processing streaming query with {len(filter_filenames) if filter_filenames else 0} file filters")
+        start_time = time.time()
+        
+        try:
+            generation = self.answer_cache.generation(filter_filenames)
+            cached = self.answer_cache.get(question, filter_filenames, self.settings.ollama_model, PROMPT_VERSION)
+            if cached is not None:
+                self.logger.info("Answer cache hit for streaming query")
+                yield {"type": "sources", "sources": cached["sources"]}
+                yield {"type": "token", "content": cached["answer"]}
+                yield {"type": "done", "cached": True}
+                return
+            
+            retrieve_start = time.time()
+            source_docs = self._get_cached_retriever(filter_filenames).invoke(question)
+            retrieve_time = time.time() - retrieve_start
+            STAGE_DURATION.labels("retrieval").observe(retrieve_time)
+            self.logger.info(f"Retrieved {len(source_docs)} source documents in {retrieve_time:.2f} seconds")
+            source_docs = self._pack_context(question, source_docs)
+            
+            sources = self._format_sources(source_docs)
+            yield {"type": "sources", "sources": sources}
+            
+            prompt = self._build_prompt(question, source_docs)
+            generate_start = time.time()
+            first_token_time = None
+            answer_parts = []
+            for chunk in self.llm.stream(prompt):
+                if not chunk.content:
+                    continue
+                if first_token_time is None:
+                    first_token_time = time.time() - start_time
+                    STAGE_DURATION.labels("time_to_first_token").observe(first_token_time)
+                    self.logger.info(f"First token after {first_token_time:.2f} seconds")
+                answer_parts.append(chunk.content)
+                yield {"type": "token", "content": chunk.content}
+            generate_time = time.time() - generate_start
+            STAGE_DURATION.labels("generation").observe(generate_time)
+            
+            total_time = time.time() - start_time
+            self.logger.info(f"Streaming generation took {generate_time:.2f} seconds, total {total_time:.2f} seconds")
+            
+            self.answer_cache.put(question, filter_filenames, self.settings.ollama_model, PROMPT_VERSION, {
+                "answer": "".join(answer_parts),
+                "sources": sources,
+                "source_ids": [doc.id for doc in source_docs if getattr(doc, "id", None)],
+                "status": "success"
+            }, generation)
+            yield {"type": "done", "cached": False}
+            
+        except Exception as e:
+            self.logger.error(f"Error processing streaming query: {str(e)}")
+            yield {"type": "error", "message": f"Error processing query: {str(e)}"}
+    
     def get_document_stats(self) -> Dict[str, Any]:
         """Get statistics about indexed documents."""
         self.logger.info("Retrieving document statistics")
         try:
             stats = self.vector_store.get_stats()
+            stats["answer_cache"] = self.answer_cache.get_stats()
+            if self.reranker:
+                stats["reranker"] = self.reranker.get_stats()
+            if self.context_packer:
+                stats["context_packing"] = self.context_packer.get_stats()
             self.logger.info(f"Document stats retrieved: {stats}")
             return {
                 "status": "success",
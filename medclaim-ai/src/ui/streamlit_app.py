@@ -87,23 +87,23 @@ if uploaded_files and st.button("🔄 Process Documents", type="primary"):
     if "uploaded_filenames" not in st.session_state:
         st.session_state.uploaded_filenames = set()
     
-    results = []
-    for i, file in enumerate(uploaded_files):
-        with status_container:
-            st.write(f"Processing: {file.name}")
-        
-        # Process the file
-        result = service.ingest_pdf(file.getvalue(), file.name)
-        results.append(result)
-        
+    with status_container:
+        st.write(f"Processing {len(uploaded_files)} file(s) together...")
+    
+    # Ingest the whole packet at once so extraction and embedding are batched
+    batch_result = service.ingest_pdfs([(file.getvalue(), file.name) for file in uploaded_files])
+    results = batch_result["files"]
+    for result in results:
         if result["status"] == "success":
-            st.session_state.uploaded_filenames.add(file.name)
-        
-        # Update progress
-        progress_bar.progress((i + 1) / len(uploaded_files))
+            st.session_state.uploaded_filenames.add(result["filename"])
+    progress_bar.progress(1.0)
     
     # Show results
     st.header("📊 Processing Results")
+    st.caption(
+        f"⏱️ {batch_result['files_total']} file(s), {batch_result['pages_extracted']} pages, "
+        f"{batch_result['chunks_total']} chunks in {batch_result['elapsed_seconds']:.1f}s"
+    )
     for result in results:
         if result["status"] == "success":
             st.success(f"✅ {result['filename']}: {result['chunks_added']} chunks processed")
@@ -0,0 +1,197 @@
+from typing import List, Dict, Any, Optional, Callable, Tuple
+from collections import OrderedDict
+from pathlib import Path
+import logging
+import re
+import sqlite3
+import threading
+from utils.metrics import record_cache
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class AnswerCache:
+    """Bounded LRU cache of query answers with per-document invalidation.
+
+    Entries are keyed by normalized question, filter filename set, model and
+    prompt version. Re-ingesting a file only drops entries whose filter set
+    contains it, plus unfiltered entries since those search every document.
+    When a similarity threshold and an embedding function are given, a miss
+    falls back to the most similar cached question with the same filters.
+
+    Callers take a `generation` token before retrieving and pass it to `put`.
+    Every invalidation bumps a global counter and one per file, so an answer
+    computed from chunks that were replaced in the meantime is not stored.
+    With `generation_path`, the counters live in SQLite and entries remember
+    the token they were stored with, so an ingest in one API worker process
+    also retires the answers cached by the others on their next lookup.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        similarity_threshold: float = 0.0,
+        embed_query: Optional[Callable[[str], List[float]]] = None,
+        generation_path: Optional[str] = None,
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.embed_query = embed_query if similarity_threshold > 0 else None
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.stale_puts = 0
+        self._entries: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+        self._generation = 0
+        self._file_generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._conn = None
+        if generation_path:
+            Path(generation_path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(generation_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS generations (key TEXT PRIMARY KEY, value INTEGER NOT NULL) WITHOUT ROWID"
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def normalize_question(question: str) -> str:
+        """Lowercase, collapse whitespace and drop trailing punctuation."""
+        return _WHITESPACE.sub(" ", question.lower()).strip().rstrip("?.! ")
+
+    @staticmethod
+    def _scope(filter_filenames: Optional[List[str]], model: str, prompt_version: str) -> Tuple:
+        filters = tuple(sorted(set(filter_filenames))) if filter_filenames else None
+        return (filters, model, prompt_version)
+
+    def generation(self, filter_filenames: Optional[List[str]]) -> Tuple:
+        """Token for the documents an answer with these filters can depend on; take it before retrieving."""
+        with self._lock:
+            return self._current_generation(filter_filenames)
+
+    def _current_generation(self, filter_filenames: Optional[List[str]]) -> Tuple:
+        """Caller must hold the lock."""
+        if self._conn is not None:
+            # "*" counts every invalidation; file names count their own
+            keys = sorted(set(filter_filenames)) if filter_filenames else ["*"]
+            counters = dict(self._conn.execute(
+                f"SELECT key, value FROM generations WHERE key IN ({','.join('?' * len(keys))})", keys
+            ).fetchall())
+            return tuple(counters.get(key, 0) for key in keys)
+        if not filter_filenames:
+            return (self._generation,)
+        return tuple(self._file_generations.get(filename, 0) for filename in sorted(set(filter_filenames)))
+
+    def get(
+        self,
+        question: str,
+        filter_filenames: Optional[List[str]],
+        model: str,
+        prompt_version: str,
+    ) -> Optional[Dict[str, Any]]:
+        """Return a cached result for the question, or None on a miss."""
+        scope = self._scope(filter_filenames, model, prompt_version)
+        key = (self.normalize_question(question),) + scope
+        with self._lock:
+            entry = self._entries.get(key)
+            stale = self._conn is not None and entry is not None and (
+                entry["generation"] != self._current_generation(filter_filenames)
+            )
+            if stale:
+                # Invalidated by another process since it was stored
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                record_cache("answer", hit=True)
+                return entry["result"]
+
+        if self.embed_query is not None:
+            vector = self.embed_query(question)
+            with self._lock:
+                best_key, best_score = None, self.similarity_threshold
+                # Every candidate shares the scope's filters, so one generation read covers them
+                current = self._current_generation(filter_filenames) if self._conn is not None else None
+                for candidate_key, candidate in list(self._entries.items()):
+                    if candidate_key[1:] != scope or candidate.get("vector") is None:
+                        continue
+                    if current is not None and candidate["generation"] != current:
+                        del self._entries[candidate_key]
+                        continue
+                    # Embeddings are normalized, so the dot product is the cosine similarity
+                    score = sum(a * b for a, b in zip(vector, candidate["vector"]))
+                    if score >= best_score:
+                        best_key, best_score = candidate_key, score
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self.semantic_hits += 1
+                    record_cache("answer", hit=True)
+                    self.logger.info(f"Semantic answer cache hit (similarity={best_score:.3f})")
+                    return self._entries[best_key]["result"]
+
+        with self._lock:
+            self.misses += 1
+        record_cache("answer", hit=False)
+        return None
+
+    def put(
+        self,
+        question: str,
+        filter_filenames: Optional[List[str]],
+        model: str,
+        prompt_version: str,
+        result: Dict[str, Any],
+        generation: Tuple,
+    ):
+        """Cache a successful result, unless its documents were invalidated after `generation` was taken."""
+        scope = self._scope(filter_filenames, model, prompt_version)
+        key = (self.normalize_question(question),) + scope
+        vector = self.embed_query(question) if self.embed_query is not None else None
+        with self._lock:
+            if self._current_generation(filter_filenames) != generation:
+                self.stale_puts += 1
+                self.logger.info("Not caching an answer computed before its documents changed")
+                return
+            self._entries[key] = {"result": result, "vector": vector, "generation": generation}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_filename(self, filename: str) -> int:
+        """Drop entries that could include chunks of the given file."""
+        with self._lock:
+            if self._conn is None:
+                self._generation += 1
+                self._file_generations[filename] = self._file_generations.get(filename, 0) + 1
+            else:
+                self._conn.executemany(
+                    "INSERT INTO generations (key, value) VALUES (?, 1) "
+                    "ON CONFLICT (key) DO UPDATE SET value = value + 1",
+                    [("*",), (filename,)]
+                )
+                self._conn.commit()
+            stale = [
+                key for key in self._entries
+                if key[1] is None or filename in key[1]
+            ]
+            for key in stale:
+                del self._entries[key]
+        if stale:
+            self.logger.info(f"Invalidated {len(stale)} cached answers for {filename}")
+        return len(stale)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache size and hit statistics."""
+        lookups = self.hits + self.semantic_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "stale_puts": self.stale_puts,
+            "hit_ratio": round((self.hits + self.semantic_hits) / lookups, 4) if lookups else None,
+        }
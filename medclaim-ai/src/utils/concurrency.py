@@ -0,0 +1,68 @@
+from contextlib import asynccontextmanager
+from typing import Dict, Any
+import asyncio
+import logging
+
+
+class OverloadedError(Exception):
+    """Raised when a request cannot get a concurrency slot within its budget."""
+
+
+class ConcurrencyLimiter:
+    """Async concurrency limit with a bounded wait queue and a wait-time budget.
+    
+    At most `max_concurrency` holders run at once, at most `max_waiting` callers
+    wait for a slot, and each waits no longer than `wait_timeout` seconds.
+    Callers that cannot be admitted get an OverloadedError instead of queueing
+    without bound.
+    """
+    
+    def __init__(self, name: str, max_concurrency: int, max_waiting: int, wait_timeout: float):
+        self.logger = logging.getLogger(__name__)
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+    
+    async def acquire(self):
+        """Wait for a slot or raise OverloadedError."""
+        if self._semaphore.locked() and self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise OverloadedError(f"{self.name}: {self.waiting} requests already waiting")
+        
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.wait_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise OverloadedError(f"{self.name}: no slot free within {self.wait_timeout:.1f} seconds")
+        finally:
+            self.waiting -= 1
+        self.active += 1
+    
+    def release(self):
+        """Release a slot taken with acquire()."""
+        self.active -= 1
+        self._semaphore.release()
+    
+    @asynccontextmanager
+    async def slot(self):
+        """Hold a slot for the duration of the block."""
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get current load and rejection counts."""
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+            "max_concurrency": self.max_concurrency,
+        }
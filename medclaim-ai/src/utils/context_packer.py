@@ -0,0 +1,233 @@
+from typing import List, Dict, Any, Optional
+from collections import OrderedDict
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+import logging
+import math
+import re
+import threading
+
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?;:])\s+|\n+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split chunk text into sentences and lines (table rows and form fields end at newlines)."""
+    return [sentence.strip() for sentence in _SENTENCE_BREAK.split(text) if sentence.strip()]
+
+
+def _normalize(text: str) -> str:
+    return _WHITESPACE.sub(" ", text.lower()).strip()
+
+
+class ContextPacker:
+    """Chooses and trims retrieved chunks to fit a prompt token budget.
+
+    Chunks are taken in retrieval order until the budget is spent, so the
+    number of chunks adapts to how long they are after trimming rather than
+    being fixed by `top_k`. Along the way:
+
+    - Sentences already in the context are dropped. Neighbouring chunks share
+      `chunk_overlap` characters, so they often repeat each other's edges. A
+      chunk with too little new text is skipped entirely.
+    - Chunks whose best sentence is much less similar to the question than the
+      best sentence overall are skipped. The first chunk is always kept.
+    - Each chunk is trimmed to its sentences that are closest to the question
+      in embedding space, in their original order.
+
+    Tokens are estimated from character counts, which is close enough to
+    size a budget without loading the LLM's tokenizer.
+
+    Sentences are embedded with `embeddings`, which should be the uncached
+    model: sentence vectors are kept in a small in-memory LRU of their own
+    rather than in the persistent chunk-embedding cache. The question is
+    embedded with `query_embeddings` (default `embeddings`), so a cached
+    query vector from retrieval can be reused.
+    """
+
+    MIN_DEDUP_CHARS = 20
+
+    def __init__(
+        self,
+        embeddings: Optional[Embeddings] = None,
+        chars_per_token: float = 4.0,
+        relevance_margin: float = 0.15,
+        trim_sentences: bool = True,
+        sentence_margin: float = 0.1,
+        min_new_fraction: float = 0.3,
+        query_embeddings: Optional[Embeddings] = None,
+        sentence_cache_size: int = 4096,
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.embeddings = embeddings
+        self.query_embeddings = query_embeddings or embeddings
+        self.sentence_cache_size = sentence_cache_size
+        self.chars_per_token = chars_per_token
+        self.relevance_margin = relevance_margin
+        self.trim_sentences = trim_sentences
+        self.sentence_margin = sentence_margin
+        self.min_new_fraction = min_new_fraction
+        self.packed = 0
+        self.chunks_in = 0
+        self.chunks_out = 0
+        self.duplicates_dropped = 0
+        self.irrelevant_dropped = 0
+        self.over_budget_dropped = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.sentences_embedded = 0
+        self.sentence_cache_hits = 0
+        self._sentence_cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def estimate_tokens(self, text: str) -> int:
+        """Approximate token count of a text."""
+        return math.ceil(len(text) / self.chars_per_token)
+
+    @property
+    def scores_sentences(self) -> bool:
+        return self.embeddings is not None and (self.trim_sentences or self.relevance_margin > 0)
+
+    def _sentence_vectors(self, docs: List[Document]) -> Dict[str, List[float]]:
+        """Embed each distinct sentence of the chunks once (embeddings are normalized)."""
+        unique = list(dict.fromkeys(
+            sentence for doc in docs for sentence in split_sentences(doc.page_content)
+        ))
+        vectors = {}
+        with self._lock:
+            for sentence in unique:
+                vector = self._sentence_cache.get(sentence)
+                if vector is not None:
+                    self._sentence_cache.move_to_end(sentence)
+                    vectors[sentence] = vector
+        missing = [sentence for sentence in unique if sentence not in vectors]
+        if missing:
+            vectors.update(zip(missing, self.embeddings.embed_documents(missing)))
+        with self._lock:
+            self.sentence_cache_hits += len(unique) - len(missing)
+            self.sentences_embedded += len(missing)
+            for sentence in missing:
+                self._sentence_cache[sentence] = vectors[sentence]
+            while len(self._sentence_cache) > self.sentence_cache_size:
+                self._sentence_cache.popitem(last=False)
+        return vectors
+
+    @staticmethod
+    def _similarities(query_vector: List[float], sentence_vectors: Dict[str, List[float]]) -> Dict[str, float]:
+        return {
+            sentence: sum(a * b for a, b in zip(query_vector, vector))
+            for sentence, vector in sentence_vectors.items()
+        }
+
+    def pack_many(
+        self,
+        questions: List[str],
+        query_vectors: List[List[float]],
+        docs_per_question: List[List[Document]],
+        token_budgets: List[int],
+    ) -> List[List[Document]]:
+        """Pack context for several questions, embedding each sentence shared between them once."""
+        sentence_vectors = {}
+        if self.scores_sentences:
+            sentence_vectors = self._sentence_vectors([doc for docs in docs_per_question for doc in docs])
+        return [
+            self.pack(
+                question, docs, budget,
+                similarities=self._similarities(query_vector, sentence_vectors) if self.scores_sentences else None
+            )
+            for question, query_vector, docs, budget in zip(questions, query_vectors, docs_per_question, token_budgets)
+        ]
+
+    def pack(
+        self,
+        question: str,
+        docs: List[Document],
+        token_budget: int,
+        similarities: Optional[Dict[str, float]] = None,
+    ) -> List[Document]:
+        """Return trimmed copies of the chunks that fit in `token_budget` tokens, in retrieval order.
+
+        `similarities` maps sentences to their similarity with the question; it is
+        computed here when not given.
+        """
+        if not docs:
+            return []
+        doc_sentences = [split_sentences(doc.page_content) for doc in docs]
+        scored = self.scores_sentences
+        if scored and similarities is None:
+            similarities = self._similarities(self.query_embeddings.embed_query(question), self._sentence_vectors(docs))
+        similarities = similarities or {}
+        best_overall = max(
+            (similarities[sentence] for sentences in doc_sentences for sentence in sentences if sentence in similarities),
+            default=0.0
+        )
+
+        packed: List[Document] = []
+        included = ""
+        used = 0
+        duplicates = irrelevant = over_budget = 0
+        for doc, sentences in zip(docs, doc_sentences):
+            # Short lines ("Yes", "Total:") are too generic to call duplicates by substring
+            new_sentences = [
+                sentence for sentence in sentences
+                if len(sentence) < self.MIN_DEDUP_CHARS or _normalize(sentence) not in included
+            ]
+            new_chars = sum(len(sentence) for sentence in new_sentences)
+            if not new_sentences or new_chars < self.min_new_fraction * len(doc.page_content):
+                duplicates += 1
+                continue
+
+            if scored:
+                relevance = max(similarities[sentence] for sentence in new_sentences)
+                if packed and self.relevance_margin > 0 and relevance < best_overall - self.relevance_margin:
+                    irrelevant += 1
+                    continue
+                if self.trim_sentences:
+                    new_sentences = [
+                        sentence for sentence in new_sentences
+                        if similarities[sentence] >= relevance - self.sentence_margin
+                    ]
+
+            text = "\n".join(new_sentences) if "\n" in doc.page_content else " ".join(new_sentences)
+            tokens = self.estimate_tokens(text)
+            if used + tokens > token_budget:
+                if packed:
+                    over_budget += 1
+                    continue
+                # Never send an empty context: cut the best chunk down to the budget instead
+                text = text[:int(token_budget * self.chars_per_token)]
+                tokens = self.estimate_tokens(text)
+            packed.append(Document(page_content=text, metadata=doc.metadata, id=doc.id))
+            included += " " + _normalize(text)
+            used += tokens
+
+        tokens_in = sum(self.estimate_tokens(doc.page_content) for doc in docs)
+        with self._lock:
+            self.packed += 1
+            self.chunks_in += len(docs)
+            self.chunks_out += len(packed)
+            self.duplicates_dropped += duplicates
+            self.irrelevant_dropped += irrelevant
+            self.over_budget_dropped += over_budget
+            self.tokens_in += tokens_in
+            self.tokens_out += used
+        self.logger.info(
+            f"Packed {len(packed)} of {len(docs)} chunks into ~{used} of {token_budget} context tokens "
+            f"(from ~{tokens_in}; dropped {duplicates} duplicate, {irrelevant} low-relevance, {over_budget} over budget)"
+        )
+        return packed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get packing statistics."""
+        return {
+            "queries": self.packed,
+            "mean_chunks_in": round(self.chunks_in / self.packed, 2) if self.packed else None,
+            "mean_chunks_out": round(self.chunks_out / self.packed, 2) if self.packed else None,
+            "duplicates_dropped": self.duplicates_dropped,
+            "irrelevant_dropped": self.irrelevant_dropped,
+            "over_budget_dropped": self.over_budget_dropped,
+            "mean_tokens_in": round(self.tokens_in / self.packed, 1) if self.packed else None,
+            "mean_tokens_out": round(self.tokens_out / self.packed, 1) if self.packed else None,
+            "sentences_embedded": self.sentences_embedded,
+            "sentence_cache_hits": self.sentence_cache_hits,
+        }
@@ -1,58 +1,272 @@
 from __future__ import annotations
-from typing import List
+from typing import List, Tuple, Optional, Iterator, Iterable
 from tempfile import NamedTemporaryFile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+import time
 import fitz  # PyMuPDF
-from docling.document_converter import DocumentConverter
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from utils.pdf_pages import get_page_count, extract_page_range, iter_page_text
+from utils.metrics import PAGES_EXTRACTED, STAGE_DURATION, observe_stage, record_cache
+
+# Shared across DocumentProcessor instances; created on first parallel extraction
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+# Docling converter is expensive to build, so one instance is reused per process
+_docling_converter = None
+_docling_lock = threading.Lock()
+_docling_convert_lock = threading.Lock()
+
+
+def _get_process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Get the process pool used for page-parallel extraction."""
+    global _process_pool
+    if _process_pool is None:
+        with _process_pool_lock:
+            if _process_pool is None:
+                # spawn avoids forking a parent that already runs torch and executor threads
+                _process_pool = ProcessPoolExecutor(
+                    max_workers=max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+    return _process_pool
+
+
+def shutdown_process_pool():
+    """Stop the extraction worker processes; a later parallel extraction starts a new pool."""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=True)
+            _process_pool = None
+
+
+def _get_docling_converter():
+    """Get the process-wide Docling converter, importing Docling on first use."""
+    global _docling_converter
+    if _docling_converter is None:
+        with _docling_lock:
+            if _docling_converter is None:
+                from docling.document_converter import DocumentConverter
+                _docling_converter = DocumentConverter()
+    return _docling_converter
+
+
+def _raise_on_iteration(error: Exception) -> Iterator[Tuple[int, str]]:
+    """Page iterator for a file that could not be opened."""
+    raise error
+    yield
 
 
 class DocumentProcessor:
     """Handles PDF extraction and text chunking with PyMuPDF and Docling fallback."""
     
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+    def __init__(
+        self,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        extraction_workers: int = 1,
+        parallel_min_pages: int = 50,
+        min_page_chars: int = 50,
+        fallback_cache_dir: Optional[str] = None,
+        fallback_cache_max_entries: int = 10000,
+    ):
+        self.logger = logging.getLogger(__name__)
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.extraction_workers = extraction_workers
+        self.parallel_min_pages = parallel_min_pages
+        self.min_page_chars = min_page_chars
+        self.fallback_cache_dir = Path(fallback_cache_dir) if fallback_cache_dir else None
+        self.fallback_cache_max_entries = fallback_cache_max_entries
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap
         )
     
-    def extract_text_from_pdf(self, file_bytes: bytes) -> str:
-        """Extract text from PDF using PyMuPDF first, then Docling fallback if needed."""
-        # Try PyMuPDF first (fast)
-        text_content = ""
+    def _submit_text_layer(self, pool: ProcessPoolExecutor, file_bytes: bytes, page_count: int) -> List:
+        """Submit text-layer extraction of one PDF to the pool, split into page ranges if large."""
+        if page_count < self.parallel_min_pages:
+            return [pool.submit(extract_page_range, file_bytes, 0, page_count)]
+        range_size = -(-page_count // self.extraction_workers)
+        return [
+            pool.submit(extract_page_range, file_bytes, start, start + range_size)
+            for start in range(0, page_count, range_size)
+        ]
+    
+    def _iter_text_layer(self, file_bytes: bytes) -> Iterator[Tuple[int, str]]:
+        """Yield the PyMuPDF text layer as (page number, text) pairs in page order.
+        
+        Documents with at least `parallel_min_pages` pages are split into page ranges
+        that are extracted in a process pool; smaller ones are read in-process.
+        """
+        if self.extraction_workers <= 1:
+            yield from iter_page_text(file_bytes)
+            return
+        page_count = get_page_count(file_bytes)
+        if page_count < self.parallel_min_pages:
+            yield from iter_page_text(file_bytes)
+            return
+        
+        pool = _get_process_pool(self.extraction_workers)
+        for future in self._submit_text_layer(pool, file_bytes, page_count):
+            yield from future.result()
+    
+    def iter_pages(
+        self,
+        file_bytes: bytes,
+        text_layer: Optional[Iterable[Tuple[int, str]]] = None,
+    ) -> Iterator[Tuple[int, str]]:
+        """Yield (page number, text) pairs using PyMuPDF, with Docling for thin pages.
+        
+        Only pages whose text layer has fewer than `min_page_chars` characters,
+        such as scanned bills inside a digital claim packet, are sent to Docling.
+        An already extracted `text_layer` can be passed in to skip PyMuPDF.
+        Extraction errors are raised, so a failed file is never mistaken for a
+        shorter one.
+        """
+        doc = None
         try:
-            with fitz.open(stream=file_bytes, filetype="pdf") as doc:
-                for page in doc:
-                    text_content += page.get_text() + "\n\n"
-        except Exception:
-            text_content = ""
+            if text_layer is None:
+                text_layer = self._iter_text_layer(file_bytes)
+            # Per-page extraction time excludes time spent by the consumer between pages
+            page_start = time.perf_counter()
+            for page_number, text in text_layer:
+                if len(text.strip()) < self.min_page_chars:
+                    if doc is None:
+                        doc = fitz.open(stream=file_bytes, filetype="pdf")
+                    fallback_text = self._convert_page_with_docling(doc, page_number - 1)
+                    if fallback_text and len(fallback_text) > len(text.strip()):
+                        text = fallback_text
+                STAGE_DURATION.labels("extraction").observe(time.perf_counter() - page_start)
+                PAGES_EXTRACTED.inc()
+                yield page_number, text
+                page_start = time.perf_counter()
+        except Exception as e:
+            self.logger.error(f"PDF extraction failed: {str(e)}")
+            raise
+        finally:
+            if doc is not None:
+                doc.close()
+    
+    def extract_pages_from_pdf(self, file_bytes: bytes) -> List[Tuple[int, str]]:
+        """Extract all pages as (page number, text) pairs."""
+        return list(self.iter_pages(file_bytes))
+    
+    def iter_pages_batch(self, files: List[bytes]) -> List[Iterator[Tuple[int, str]]]:
+        """Return a page iterator per PDF, with all text layers extracted in parallel.
         
-        # If we got substantial text, return it
-        if text_content and len(text_content.strip()) >= 500:
-            return text_content.strip()
+        Every file's text layer is submitted to the process pool up front, so a
+        packet of small PDFs is extracted concurrently rather than one by one.
+        Docling fallbacks run as each iterator is consumed, and iterating a file
+        that fails to extract raises its error.
+        """
+        if self.extraction_workers <= 1 or len(files) <= 1:
+            return [self.iter_pages(file_bytes) for file_bytes in files]
         
-        # Fallback to Docling for better extraction
+        pool = _get_process_pool(self.extraction_workers)
+        iterators = []
+        for file_bytes in files:
+            try:
+                futures = self._submit_text_layer(pool, file_bytes, get_page_count(file_bytes))
+            except Exception as e:
+                self.logger.error(f"PDF extraction failed: {str(e)}")
+                iterators.append(_raise_on_iteration(e))
+                continue
+            text_layer = (page for future in futures for page in future.result())
+            iterators.append(self.iter_pages(file_bytes, text_layer=text_layer))
+        return iterators
+    
+    def _convert_page_with_docling(self, doc, page_index: int) -> str:
+        """Convert a single page with Docling, using the page-image hash cache."""
         try:
-            converter = DocumentConverter()
+            pixmap = doc[page_index].get_pixmap(dpi=72)
+            image_hash = hashlib.sha256(pixmap.samples).hexdigest()
+        except Exception as e:
+            self.logger.error(f"Error rendering page {page_index + 1}: {str(e)}")
+            return ""
+        
+        cache_path = self.fallback_cache_dir / f"{image_hash}.md" if self.fallback_cache_dir else None
+        if cache_path and cache_path.exists():
+            try:
+                markdown_content = cache_path.read_text(encoding="utf-8")
+                # The modification time orders entries for pruning
+                os.utime(cache_path)
+                record_cache("docling", hit=True)
+                return markdown_content
+            except FileNotFoundError:
+                # Pruned by another worker since the check
+                pass
+        record_cache("docling", hit=False)
+        
+        fallback_start = time.perf_counter()
+        try:
+            with fitz.open() as page_doc:
+                page_doc.insert_pdf(doc, from_page=page_index, to_page=page_index)
+                page_bytes = page_doc.tobytes()
             with NamedTemporaryFile(suffix=".pdf", delete=True) as tmp:
-                tmp.write(file_bytes)
+                tmp.write(page_bytes)
                 tmp.flush()
-                dl_doc = converter.convert(source=tmp.name).document
-                markdown_content = dl_doc.export_to_markdown()
-                if markdown_content and markdown_content.strip():
-                    return markdown_content.strip()
-        except Exception:
-            pass
+                converter = _get_docling_converter()
+                # The shared converter is not documented as thread-safe
+                with _docling_convert_lock:
+                    dl_doc = converter.convert(source=tmp.name).document
+                markdown_content = (dl_doc.export_to_markdown() or "").strip()
+        except Exception as e:
+            self.logger.error(f"Docling fallback failed for page {page_index + 1}: {str(e)}")
+            return ""
+        finally:
+            STAGE_DURATION.labels("docling_fallback").observe(time.perf_counter() - fallback_start)
+        
+        if cache_path:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_text(markdown_content, encoding="utf-8")
+            os.replace(tmp_path, cache_path)
+            self._prune_fallback_cache()
+        return markdown_content
+    
+    def _prune_fallback_cache(self):
+        """Delete the least recently used cached pages beyond `fallback_cache_max_entries`.
         
-        # Return whatever we got from PyMuPDF (may be empty)
-        return text_content.strip()
+        Only runs after a Docling conversion, which takes far longer than listing the directory.
+        """
+        entries = []
+        for path in self.fallback_cache_dir.glob("*.md"):
+            try:
+                entries.append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                continue
+        excess = len(entries) - self.fallback_cache_max_entries
+        if excess <= 0:
+            return
+        for _, path in sorted(entries)[:excess]:
+            path.unlink(missing_ok=True)
+        self.logger.info(f"Pruned {excess} pages from the Docling fallback cache")
+    
+    def extract_text_from_pdf(self, file_bytes: bytes) -> str:
+        """Extract text from PDF using PyMuPDF first, then Docling fallback for thin pages."""
+        pages = self.extract_pages_from_pdf(file_bytes)
+        return "\n\n".join(text for _, text in pages).strip()
     
     def chunk_text(self, text: str) -> List[str]:
         """Split text into chunks using RecursiveCharacterTextSplitter."""
         if not text:
             return []
-        return self.text_splitter.split_text(text)
+        with observe_stage("chunking"):
+            return self.text_splitter.split_text(text)
+    
+    def iter_chunks(self, pages: Iterable[Tuple[int, str]]) -> Iterator[Tuple[int, str]]:
+        """Split streamed pages into (page number, chunk text) pairs one page at a time."""
+        for page_number, text in pages:
+            for chunk in self.chunk_text(text.strip()):
+                yield page_number, chunk
     
     def process_pdf(self, file_bytes: bytes) -> List[str]:
         """Complete pipeline: extract text from PDF and chunk it."""
@@ -0,0 +1,148 @@
+from typing import List, Dict, Any
+from array import array
+from pathlib import Path
+from langchain_core.embeddings import Embeddings
+from utils.metrics import record_cache
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper with a persistent, size-bounded LRU cache in SQLite.
+
+    Entries are keyed by (model name, embedding kind, hash of whitespace-normalized
+    text), so repeated boilerplate clauses and repeated questions are only
+    embedded once across uploads and process restarts.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str, path: str, max_entries: int = 100000):
+        self.logger = logging.getLogger(__name__)
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self.logger.info(f"Embedding cache opened at {path} with {self._count} entries")
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Collapse whitespace so layout-only differences share a cache entry."""
+        return _WHITESPACE.sub(" ", text).strip()
+
+    def _key(self, text: str, kind: str) -> str:
+        digest = hashlib.sha256(self.normalize(text).encode("utf-8")).hexdigest()
+        return f"{self.model_name}:{kind}:{digest}"
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        now = time.time()
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+        return found
+
+    def _store(self, entries: Dict[str, List[float]]):
+        now = time.time()
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, array("f", vector).tobytes(), now) for key, vector in entries.items()]
+            )
+            self._count += self._conn.total_changes - before
+            if self._count > self.max_entries:
+                # Evict least recently used entries down to 90% so eviction is not run on every insert
+                excess = self._count - int(self.max_entries * 0.9)
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                    (excess,)
+                )
+                self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                self.logger.info(f"Evicted {excess} least recently used embeddings")
+            self._conn.commit()
+
+    def _embed(self, texts: List[str], kind: str) -> List[List[float]]:
+        keys = [self._key(text, kind) for text in texts]
+        cached = self._lookup(keys)
+
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        record_cache(f"embedding_{kind}", hit=True, count=len(texts) - len(missing))
+        record_cache(f"embedding_{kind}", hit=False, count=len(missing))
+
+        if missing:
+            embed_queries = getattr(self.embeddings, "embed_queries", None)
+            if kind == "query" and embed_queries is not None and len(missing) > 1:
+                vectors = embed_queries(list(missing.values()))
+            elif kind == "query":
+                vectors = [self.embeddings.embed_query(text) for text in missing.values()]
+            else:
+                vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self._store(computed)
+            cached.update(computed)
+        return [cached[key] for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents, computing only texts that are not cached."""
+        if not texts:
+            return []
+        return self._embed(texts, "document")
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query through the same cache."""
+        return self._embed([text], "query")[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed several queries at once, computing only the uncached ones."""
+        if not texts:
+            return []
+        return self._embed(texts, "query")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache size and hit statistics."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._count,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
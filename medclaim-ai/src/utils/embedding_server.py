@@ -0,0 +1,328 @@
+from typing import List, Dict, Any, Tuple
+from array import array
+from pathlib import Path
+from langchain_core.embeddings import Embeddings
+import fcntl
+import json
+import logging
+import os
+import socket
+import socketserver
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+_HEADER = struct.Struct(">I")
+
+
+def _send_frame(sock: socket.socket, header: Dict[str, Any], payload: bytes = b""):
+    """Send a length-prefixed JSON header followed by an optional binary payload."""
+    encoded = json.dumps(header).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(encoded)) + encoded + payload)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(size - len(buffer))
+        if not chunk:
+            raise ConnectionError("Embedding server connection closed")
+        buffer.extend(chunk)
+    return bytes(buffer)
+
+
+def _recv_header(sock: socket.socket) -> Dict[str, Any]:
+    (length,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return json.loads(_recv_exact(sock, length).decode("utf-8"))
+
+
+class _SerializedEmbeddings(Embeddings):
+    """Runs one forward pass at a time so the model's threads never compete with each other."""
+
+    def __init__(self, embeddings: Embeddings):
+        self.embeddings = embeddings
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        with self._lock:
+            return self.embeddings.embed_query(text)
+
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serves one embedding model to many API worker processes over a Unix socket.
+
+    Each client connection gets a handler thread. Queries from all workers
+    (single or several per request) go through one
+    `MicroBatchingEmbeddings`, so concurrent questions from different
+    processes share a forward pass; document batches run directly.
+    Forward passes are serialized so the model's thread pool owns the cores.
+    """
+
+    daemon_threads = True
+    # Every worker thread holds its own connection, so allow a burst of connects
+    request_queue_size = 256
+
+    def __init__(self, socket_path: str, embeddings: Embeddings, batch_window_ms: float = 5.0,
+                 max_batch_size: int = 32):
+        from utils.query_batcher import MicroBatchingEmbeddings
+
+        self.logger = logging.getLogger(__name__)
+        self.socket_path = socket_path
+        self.embeddings = _SerializedEmbeddings(embeddings)
+        self.batcher = MicroBatchingEmbeddings(self.embeddings, window_ms=batch_window_ms, max_batch_size=max_batch_size)
+        self.requests = 0
+        self.documents = 0
+        self.clients = 0
+        self._stats_lock = threading.Lock()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        Path(socket_path).parent.mkdir(parents=True, exist_ok=True)
+        super().__init__(socket_path, _EmbeddingRequestHandler)
+
+    def count(self, clients: int = 0, requests: int = 0, documents: int = 0):
+        """Update the counters; handler threads call this concurrently."""
+        with self._stats_lock:
+            self.clients += clients
+            self.requests += requests
+            self.documents += documents
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            clients, requests, documents = self.clients, self.requests, self.documents
+        return {
+            "pid": os.getpid(),
+            "clients": clients,
+            "requests": requests,
+            "documents_embedded": documents,
+            "query_batching": self.batcher.get_stats(),
+        }
+
+
+class _EmbeddingRequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        server: EmbeddingServer = self.server
+        server.count(clients=1)
+        try:
+            while True:
+                try:
+                    request = _recv_header(self.request)
+                except ConnectionError:
+                    return
+                server.count(requests=1)
+                try:
+                    op = request["op"]
+                    if op == "stats":
+                        _send_frame(self.request, {"ok": True, "stats": server.get_stats()})
+                        continue
+                    if op == "query":
+                        vectors = [server.batcher.embed_query(request["texts"][0])]
+                    elif op == "queries":
+                        vectors = server.batcher.embed_queries(request["texts"])
+                    elif op == "documents":
+                        vectors = server.embeddings.embed_documents(request["texts"])
+                        server.count(documents=len(vectors))
+                    else:
+                        raise ValueError(f"Unknown embedding server op: {op}")
+                except Exception as e:
+                    server.logger.error(f"Embedding request failed: {str(e)}")
+                    _send_frame(self.request, {"ok": False, "error": str(e)})
+                    continue
+                dim = len(vectors[0]) if vectors else 0
+                payload = array("f", (value for vector in vectors for value in vector)).tobytes()
+                _send_frame(self.request, {"ok": True, "count": len(vectors), "dim": dim}, payload)
+        finally:
+            server.count(clients=-1)
+
+
+class RemoteEmbeddings(Embeddings):
+    """Embeddings client for a shared `EmbeddingServer`.
+
+    Keeps one connection per thread. A request is sent again once if the
+    connection was reset or closed, since the server died with it, and with
+    `autostart` a refused connection starts a new server first. Timeouts are
+    raised without resending, because the server may still be working on the
+    request.
+    """
+
+    def __init__(self, socket_path: str, timeout: float = 60.0, autostart: bool = False,
+                 start_timeout: float = 300.0):
+        self.logger = logging.getLogger(__name__)
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.autostart = autostart
+        self.start_timeout = start_timeout
+        self._local = threading.local()
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                sock.close()
+                raise
+            self._local.sock = sock
+        return sock
+
+    def _reset(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+        self._local.sock = None
+
+    def _call(self, request: Dict[str, Any], autostart: bool = True) -> Tuple[Dict[str, Any], bytes]:
+        restarted = resent = False
+        while True:
+            try:
+                sock = self._connection()
+                _send_frame(sock, request)
+                header = _recv_header(sock)
+                payload = _recv_exact(sock, header["count"] * header["dim"] * 4) if header.get("count") else b""
+                break
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Nothing is listening: the server exited or crashed
+                self._reset()
+                if not (autostart and self.autostart) or restarted:
+                    raise
+                restarted = True
+                self.start_server()
+            except ConnectionError:
+                # Reset or closed mid-request, so the request died with the server
+                self._reset()
+                if resent:
+                    raise
+                resent = True
+            except OSError:
+                # A timeout leaves the reply pending on this connection; drop it but don't resend
+                self._reset()
+                raise
+        if not header["ok"]:
+            raise RuntimeError(f"Embedding server error: {header['error']}")
+        return header, payload
+
+    def _vectors(self, request: Dict[str, Any]) -> List[List[float]]:
+        header, payload = self._call(request)
+        values = array("f", payload)
+        dim = header["dim"]
+        return [values[i * dim:(i + 1) * dim].tolist() for i in range(header["count"])]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents in the server process."""
+        if not texts:
+            return []
+        return self._vectors({"op": "documents", "texts": texts})
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query as part of the server's shared micro-batch."""
+        return self._vectors({"op": "query", "texts": [text]})[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed several queries in one request; they share the server's micro-batches."""
+        if not texts:
+            return []
+        return self._vectors({"op": "queries", "texts": texts})
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the server's request and batching statistics."""
+        header, _ = self._call({"op": "stats"})
+        return header["stats"]
+
+    def ping(self) -> bool:
+        """Check whether a server is accepting connections."""
+        try:
+            self._call({"op": "stats"}, autostart=False)
+            return True
+        except Exception:
+            return False
+
+    def start_server(self):
+        """Start the server unless one is accepting connections, and wait until it does.
+
+        A file lock next to the socket makes sure only one of several workers
+        spawns the server; the others wait for it to accept connections.
+        """
+        Path(self.socket_path).parent.mkdir(parents=True, exist_ok=True)
+        with open(f"{self.socket_path}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if self.ping():
+                    return
+                self.logger.info(f"Starting shared embedding server at {self.socket_path}")
+                src_dir = str(Path(__file__).parent.parent)
+                env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [src_dir, os.environ.get("PYTHONPATH")]))}
+                subprocess.Popen(
+                    [sys.executable, str(Path(__file__).resolve()), "--socket", self.socket_path],
+                    env=env,
+                    start_new_session=True
+                )
+                deadline = time.monotonic() + self.start_timeout
+                while not self.ping():
+                    if time.monotonic() > deadline:
+                        raise RuntimeError(f"Embedding server did not start within {self.start_timeout:.0f} seconds")
+                    time.sleep(0.5)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def connect_embedding_server(socket_path: str, autostart: bool = True, start_timeout: float = 300.0) -> RemoteEmbeddings:
+    """Connect to the shared embedding server, starting it if no worker has yet.
+
+    With `autostart`, the client also starts a new server if the running one
+    goes away.
+    """
+    logger = logging.getLogger(__name__)
+    client = RemoteEmbeddings(socket_path, autostart=autostart, start_timeout=start_timeout)
+    if not client.ping():
+        if not autostart:
+            raise RuntimeError(f"No embedding server listening on {socket_path}")
+        client.start_server()
+    logger.info(f"Using shared embedding server at {socket_path}")
+    return client
+
+
+def main():
+    import argparse
+
+    sys.path.append(str(Path(__file__).parent.parent))
+    from config.settings import get_settings
+    from utils.embeddings import create_embeddings
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Serve the embedding model to API workers over a Unix socket.")
+    parser.add_argument("--socket", default=settings.embedding_server_socket)
+    args = parser.parse_args()
+    if not args.socket:
+        parser.error("Set EMBEDDING_SERVER_SOCKET or pass --socket")
+
+    logger = logging.getLogger(__name__)
+    load_start = time.time()
+    embeddings = create_embeddings(settings)
+    load_time = time.time() - load_start
+    logger.info(f"Embedding model loaded in {load_time:.2f} seconds")
+
+    server = EmbeddingServer(
+        args.socket,
+        embeddings,
+        batch_window_ms=settings.query_batch_window_ms,
+        max_batch_size=settings.query_batch_max_size
+    )
+    logger.info(f"Embedding server listening on {args.socket} (pid {os.getpid()})")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
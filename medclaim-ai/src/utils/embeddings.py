@@ -0,0 +1,67 @@
+from typing import Optional
+from config.settings import Settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BACKENDS = ("huggingface", "onnx", "fastembed")
+
+
+def create_embeddings(settings: Settings, backend: Optional[str] = None):
+    """Create the LangChain embedding function for the configured backend.
+
+    All backends load `settings.embedding_model` and return L2-normalized vectors,
+    so they are interchangeable for an existing collection:
+    - huggingface: sentence-transformers on PyTorch CPU
+    - onnx: sentence-transformers on ONNX Runtime, optionally an int8 export
+      selected with `embedding_onnx_file` (needs sentence-transformers>=3.2 and optimum[onnxruntime])
+    - fastembed: Qdrant fastembed ONNX models (needs fastembed)
+    """
+    backend = backend or settings.embedding_backend
+    batch_size = settings.embedding_encode_batch_size
+    threads = settings.embedding_threads
+    logger.info(f"Creating {backend} embeddings for {settings.embedding_model} (batch_size={batch_size}, threads={threads})")
+
+    if backend == "huggingface":
+        import torch
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        torch.set_num_threads(threads)
+        return HuggingFaceEmbeddings(
+            model_name=settings.embedding_model,
+            model_kwargs={'device': 'cpu'},
+            encode_kwargs={'normalize_embeddings': True, 'batch_size': batch_size}
+        )
+
+    if backend == "onnx":
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise ValueError("The onnx embedding backend requires optimum[onnxruntime]") from e
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        session_options = onnxruntime.SessionOptions()
+        session_options.intra_op_num_threads = threads
+        onnx_kwargs = {"session_options": session_options, "provider": "CPUExecutionProvider"}
+        if settings.embedding_onnx_file:
+            onnx_kwargs["file_name"] = settings.embedding_onnx_file
+        return HuggingFaceEmbeddings(
+            model_name=settings.embedding_model,
+            model_kwargs={'device': 'cpu', 'backend': 'onnx', 'model_kwargs': onnx_kwargs},
+            encode_kwargs={'normalize_embeddings': True, 'batch_size': batch_size}
+        )
+
+    if backend == "fastembed":
+        try:
+            from langchain_community.embeddings.fastembed import FastEmbedEmbeddings
+        except ImportError as e:
+            raise ValueError("The fastembed embedding backend requires fastembed") from e
+
+        # fastembed normalizes BGE outputs itself
+        return FastEmbedEmbeddings(
+            model_name=settings.embedding_model,
+            batch_size=batch_size,
+            threads=threads
+        )
+
+    raise ValueError(f"Unknown embedding backend '{backend}', expected one of {EMBEDDING_BACKENDS}")
@@ -0,0 +1,30 @@
+from typing import List, Any, Optional
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+
+class HybridRetriever(BaseRetriever):
+    """Retriever that fuses BM25 and vector results via VectorStoreManager.hybrid_search."""
+
+    store: Any
+    k: int
+    filenames: Optional[List[str]] = None
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self.store.hybrid_search(query, k=self.k, filenames=self.filenames)
+
+
+class VectorRetriever(BaseRetriever):
+    """Retriever over VectorStoreManager.vector_search for any vector backend."""
+
+    store: Any
+    k: int
+    filenames: Optional[List[str]] = None
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self.store.vector_search(query, k=self.k, filenames=self.filenames)
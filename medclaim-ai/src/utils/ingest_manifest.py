@@ -0,0 +1,94 @@
+from typing import Dict, Any, Optional, List
+from pathlib import Path
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+
+class IngestManifest:
+    """Persistent record of ingested files keyed by filename and content hash."""
+
+    def __init__(self, path: str):
+        self.logger = logging.getLogger(__name__)
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._documents: Dict[str, Dict[str, Any]] = {}
+        self._by_hash: Dict[str, List[str]] = {}
+        self._load()
+
+    @staticmethod
+    def content_hash(file_bytes: bytes) -> str:
+        """Return the SHA-256 hex digest of the raw file bytes."""
+        return hashlib.sha256(file_bytes).hexdigest()
+
+    def _load(self):
+        """Load the manifest from disk, starting empty if it is missing or unreadable."""
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._documents = data.get("documents", {})
+        except Exception as e:
+            self.logger.error(f"Error loading ingest manifest {self.path}: {str(e)}")
+            self._documents = {}
+
+        for filename, entry in self._documents.items():
+            self._by_hash.setdefault(entry["content_hash"], []).append(filename)
+        self.logger.info(f"Loaded ingest manifest with {len(self._documents)} documents")
+
+    def _save(self):
+        """Atomically write the manifest to disk. Caller must hold the lock."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"documents": self._documents}, f)
+        os.replace(tmp_path, self.path)
+
+    def get(self, filename: str) -> Optional[Dict[str, Any]]:
+        """Get the manifest entry for a filename."""
+        with self._lock:
+            entry = self._documents.get(filename)
+            return dict(entry) if entry else None
+
+    def is_indexed(self, filename: str, content_hash: str) -> bool:
+        """Check whether this exact content is already indexed under this filename."""
+        entry = self.get(filename)
+        return entry is not None and entry["content_hash"] == content_hash
+
+    def find_by_hash(self, content_hash: str) -> List[str]:
+        """Get all filenames indexed with the given content hash."""
+        with self._lock:
+            return list(self._by_hash.get(content_hash, []))
+
+    def record(self, filename: str, content_hash: str, chunk_count: int):
+        """Record that a file has been indexed with the given content."""
+        with self._lock:
+            previous = self._documents.get(filename)
+            if previous:
+                self._unlink_hash(previous["content_hash"], filename)
+            self._documents[filename] = {
+                "content_hash": content_hash,
+                "chunk_count": chunk_count,
+                "indexed_at": time.time(),
+            }
+            self._by_hash.setdefault(content_hash, []).append(filename)
+            self._save()
+
+    def remove(self, filename: str):
+        """Forget a file, e.g. after its chunks were deleted from the vector store."""
+        with self._lock:
+            previous = self._documents.pop(filename, None)
+            if previous:
+                self._unlink_hash(previous["content_hash"], filename)
+                self._save()
+
+    def _unlink_hash(self, content_hash: str, filename: str):
+        filenames = self._by_hash.get(content_hash, [])
+        if filename in filenames:
+            filenames.remove(filename)
+        if not filenames:
+            self._by_hash.pop(content_hash, None)
@@ -0,0 +1,206 @@
+from typing import List, Dict, Any, Optional, Tuple, Iterable
+from collections import Counter
+from pathlib import Path
+import logging
+import math
+import re
+import sqlite3
+import threading
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[\-/\.][a-z0-9]+)*")
+_PART_SEPARATOR = re.compile(r"[\-/\.]")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were "
+    "what when where which who whom why how with does do did any there their".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens that keep identifiers like POL-123456, E11.9 or 12/05/2023 intact.
+
+    Compound identifiers also emit their parts so "123456" matches "POL-123456".
+    """
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if token in _STOPWORDS:
+            continue
+        tokens.append(token)
+        if _PART_SEPARATOR.search(token):
+            tokens.extend(part for part in _PART_SEPARATOR.split(token) if part and part not in _STOPWORDS)
+    return tokens
+
+
+def is_identifier_query(query: str, max_tokens: int = 3) -> bool:
+    """Check whether a query is just a few tokens with at least one code-like token.
+
+    Such queries (a policy number, an ICD/CPT code, a claim ID) are answered well
+    by exact lexical matches alone, so they can skip the embedding call.
+    """
+    words = [w for w in _TOKEN.findall(query.lower()) if w not in _STOPWORDS]
+    return 0 < len(words) <= max_tokens and any(any(c.isdigit() for c in w) for w in words)
+
+
+class LexicalIndex:
+    """BM25 inverted index over stored chunks, persisted in SQLite.
+
+    Postings are added and removed incrementally by chunk ID alongside the
+    vector store, and searches can be restricted to a set of filenames. The
+    chunk count, total length and per-term document frequencies are kept in
+    the database next to the postings, so every process sharing the file
+    scores with current statistics. A search reads at most
+    `max_postings_per_term` postings per term, those with the highest term
+    frequency, so common terms cost the same as rare ones.
+    """
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75, max_postings_per_term: int = 2000):
+        self.logger = logging.getLogger(__name__)
+        self.k1 = k1
+        self.b = b
+        self.max_postings_per_term = max_postings_per_term
+        self._lock = threading.Lock()
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                chunk_id TEXT PRIMARY KEY, filename TEXT NOT NULL, length INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_chunks_filename ON chunks (filename);
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL, chunk_id TEXT NOT NULL, tf INTEGER NOT NULL,
+                PRIMARY KEY (term, chunk_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_postings_chunk ON postings (chunk_id);
+            CREATE INDEX IF NOT EXISTS idx_postings_term_tf ON postings (term, tf DESC);
+            CREATE TABLE IF NOT EXISTS terms (term TEXT PRIMARY KEY, df INTEGER NOT NULL) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS stats (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            """
+        )
+        if self._conn.execute("SELECT COUNT(*) FROM stats").fetchone()[0] == 0:
+            # First open, or an index written before the statistics were stored
+            self._conn.execute(
+                "INSERT INTO stats (key, value) SELECT 'chunks', COUNT(*) FROM chunks "
+                "UNION ALL SELECT 'total_length', COALESCE(SUM(length), 0) FROM chunks"
+            )
+            self._conn.execute("DELETE FROM terms")
+            self._conn.execute("INSERT INTO terms (term, df) SELECT term, COUNT(*) FROM postings GROUP BY term")
+        self._conn.commit()
+        self.logger.info(f"Lexical index opened at {path} with {self.chunk_count} chunks")
+
+    def _stats(self) -> Tuple[int, int]:
+        stats = dict(self._conn.execute("SELECT key, value FROM stats").fetchall())
+        return stats.get("chunks", 0), stats.get("total_length", 0)
+
+    @property
+    def chunk_count(self) -> int:
+        with self._lock:
+            return self._stats()[0]
+
+    def add(self, entries: Iterable[Tuple[str, str, str]]):
+        """Index (chunk ID, filename, text) entries, replacing existing IDs."""
+        entries = list(entries)
+        if not entries:
+            return
+        with self._lock:
+            self._remove_locked([chunk_id for chunk_id, _, _ in entries])
+            added_length = 0
+            doc_freqs: Counter = Counter()
+            for chunk_id, filename, text in entries:
+                counts = Counter(tokenize(text))
+                length = sum(counts.values())
+                self._conn.execute(
+                    "INSERT INTO chunks (chunk_id, filename, length) VALUES (?, ?, ?)",
+                    (chunk_id, filename, length)
+                )
+                self._conn.executemany(
+                    "INSERT INTO postings (term, chunk_id, tf) VALUES (?, ?, ?)",
+                    [(term, chunk_id, tf) for term, tf in counts.items()]
+                )
+                added_length += length
+                doc_freqs.update(counts.keys())
+            self._add_stats(len(entries), added_length, doc_freqs)
+            self._conn.commit()
+
+    def remove(self, chunk_ids: List[str]):
+        """Remove chunks from the index."""
+        if not chunk_ids:
+            return
+        with self._lock:
+            self._remove_locked(chunk_ids)
+            self._conn.commit()
+
+    def _remove_locked(self, chunk_ids: List[str]):
+        for start in range(0, len(chunk_ids), 500):
+            batch = chunk_ids[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            removed_count, removed_length = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(length), 0) FROM chunks WHERE chunk_id IN ({placeholders})", batch
+            ).fetchone()
+            if not removed_count:
+                continue
+            doc_freqs = Counter(dict(self._conn.execute(
+                f"SELECT term, COUNT(*) FROM postings WHERE chunk_id IN ({placeholders}) GROUP BY term", batch
+            ).fetchall()))
+            self._conn.execute(f"DELETE FROM postings WHERE chunk_id IN ({placeholders})", batch)
+            self._conn.execute(f"DELETE FROM chunks WHERE chunk_id IN ({placeholders})", batch)
+            self._add_stats(-removed_count, -removed_length, Counter({term: -df for term, df in doc_freqs.items()}))
+
+    def _add_stats(self, chunks: int, length: int, doc_freqs: Counter):
+        """Apply chunk, length and document frequency deltas. Caller must hold the lock."""
+        self._conn.executemany(
+            "UPDATE stats SET value = value + ? WHERE key = ?", [(chunks, "chunks"), (length, "total_length")]
+        )
+        self._conn.executemany(
+            "INSERT INTO terms (term, df) VALUES (?, ?) ON CONFLICT (term) DO UPDATE SET df = df + excluded.df",
+            doc_freqs.items()
+        )
+        emptied = [term for term, delta in doc_freqs.items() if delta < 0]
+        for start in range(0, len(emptied), 500):
+            batch = emptied[start:start + 500]
+            self._conn.execute(f"DELETE FROM terms WHERE df <= 0 AND term IN ({','.join('?' * len(batch))})", batch)
+
+    def search(self, query: str, k: int, filenames: Optional[List[str]] = None) -> List[Tuple[str, float]]:
+        """Return up to k (chunk ID, BM25 score) pairs, best first."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        with self._lock:
+            chunk_count, total_length = self._stats()
+            if not chunk_count:
+                return []
+            doc_freqs = dict(self._conn.execute(
+                f"SELECT term, df FROM terms WHERE term IN ({','.join('?' * len(terms))})", terms
+            ).fetchall())
+            sql = (
+                "SELECT p.chunk_id, p.tf, c.length FROM postings p "
+                "JOIN chunks c ON c.chunk_id = p.chunk_id WHERE p.term = ?"
+            )
+            if filenames:
+                sql += f" AND c.filename IN ({','.join('?' * len(filenames))})"
+            sql += " ORDER BY p.tf DESC LIMIT ?"
+            postings = {
+                term: self._conn.execute(sql, [term, *(filenames or []), self.max_postings_per_term]).fetchall()
+                for term in terms if term in doc_freqs
+            }
+        avg_length = total_length / chunk_count
+
+        scores: Dict[str, float] = {}
+        for term, rows in postings.items():
+            df = doc_freqs[term]
+            idf = math.log(1 + (chunk_count - df + 0.5) / (df + 0.5))
+            for chunk_id, tf, length in rows:
+                norm = tf + self.k1 * (1 - self.b + self.b * length / max(avg_length, 1e-9))
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get index size statistics."""
+        with self._lock:
+            chunk_count, total_length = self._stats()
+        return {
+            "chunks": chunk_count,
+            "avg_chunk_tokens": round(total_length / chunk_count, 1) if chunk_count else None,
+        }
@@ -0,0 +1,84 @@
+from contextlib import contextmanager
+from prometheus_client import Counter, Gauge, Histogram
+import time
+
+# Stage latencies: extraction, docling_fallback, chunking, embedding, upsert,
+# retrieval, rerank, generation, time_to_first_token
+STAGE_DURATION = Histogram(
+    "medclaim_stage_duration_seconds",
+    "Duration of ingestion and query pipeline stages",
+    ["stage"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+
+REQUEST_DURATION = Histogram(
+    "medclaim_request_duration_seconds",
+    "HTTP request latency by endpoint",
+    ["endpoint", "method", "status"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+
+IN_FLIGHT_REQUESTS = Gauge(
+    "medclaim_in_flight_requests",
+    "HTTP requests currently being served",
+    ["endpoint"],
+    multiprocess_mode="livesum",
+)
+
+EXECUTOR_QUEUE_WAIT = Histogram(
+    "medclaim_executor_queue_wait_seconds",
+    "Time blocking work waited for a free executor thread",
+    ["executor"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+CACHE_REQUESTS = Counter(
+    "medclaim_cache_requests_total",
+    "Cache lookups by cache and result (hit, miss)",
+    ["cache", "result"],
+)
+
+CHUNKS_PROCESSED = Counter(
+    "medclaim_chunks_total",
+    "Chunks processed during ingestion by outcome (embedded, reused, deleted)",
+    ["outcome"],
+)
+
+PAGES_EXTRACTED = Counter(
+    "medclaim_pages_extracted_total",
+    "PDF pages extracted",
+)
+
+QUERY_EMBED_BATCH_SIZE = Histogram(
+    "medclaim_query_embedding_batch_size",
+    "Queries embedded per micro-batch",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+
+QUERY_EMBED_BATCH_WINDOW = Gauge(
+    "medclaim_query_embedding_batch_window_seconds",
+    "Configured micro-batch wait window",
+    multiprocess_mode="max",
+)
+
+QUERY_EMBED_BATCH_MAX = Gauge(
+    "medclaim_query_embedding_batch_max_size",
+    "Configured micro-batch size limit",
+    multiprocess_mode="max",
+)
+
+
+@contextmanager
+def observe_stage(stage: str):
+    """Record the duration of the enclosed block under the given stage."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_DURATION.labels(stage).observe(time.perf_counter() - start)
+
+
+def record_cache(cache: str, hit: bool, count: int = 1):
+    """Count cache hits or misses."""
+    if count:
+        CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc(count)
@@ -0,0 +1,522 @@
+from typing import List, Dict, Any, Optional, Tuple
+from pathlib import Path
+from langchain_core.documents import Document
+from utils.vector_backends import VectorBackend
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+
+
+class MmapVectorBackend(VectorBackend):
+    """Vector index stored as a memory-mapped float32 matrix plus a SQLite sidecar.
+
+    `vectors.f32` holds one row per chunk and is mapped, not read, so every
+    process that opens the index shares the same page-cache copy of the vectors.
+    `meta.sqlite3` maps chunk IDs to rows and holds the text, filename and
+    metadata. Replacing or deleting a chunk only drops its sidecar row; the
+    vector row is left unused until dead rows make up `COMPACT_FRACTION` of
+    the file, when the live rows are copied to a new vector file and renumbered.
+    Searches are exact (one matrix-vector product over the mapping) unless FAISS
+    is installed and the index has at least `ann_min_rows` rows, in which case
+    an HNSW graph over the live rows at build time is combined with an exact
+    scan of rows added since. The graph is rebuilt once `REBUILD_FRACTION` of
+    the rows were added or deleted after it was built. Filtered searches are
+    always exact over the rows of the named files.
+
+    A single process should write; any number of processes can open the same
+    directory with `read_only=True` and pick up new rows as they are committed.
+    Vectors are expected to be L2-normalized, and distance is 1 - cosine.
+    """
+
+    name = "mmap"
+    # Grow the vector file in steps of at least this many rows
+    GROWTH_ROWS = 4096
+    # Rewrite the vector file once this fraction of its rows is dead
+    COMPACT_FRACTION = 0.25
+    # Rebuild the ANN graph once this fraction of rows was added or deleted since the last build
+    REBUILD_FRACTION = 0.1
+
+    def __init__(
+        self,
+        path: str,
+        read_only: bool = False,
+        ann_enabled: bool = True,
+        ann_min_rows: int = 50000,
+        hnsw_m: int = 16,
+        ef_construction: int = 100,
+        ef_search: int = 64,
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.path = Path(path)
+        self.read_only = read_only
+        self.ann_enabled = ann_enabled
+        self.ann_min_rows = ann_min_rows
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self._lock = threading.RLock()
+
+        db_path = self.path / "meta.sqlite3"
+        if read_only:
+            self._conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS chunks (
+                    id TEXT PRIMARY KEY, row INTEGER NOT NULL UNIQUE, filename TEXT NOT NULL,
+                    document TEXT NOT NULL, metadata TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_chunks_filename ON chunks (filename);
+                CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+                INSERT OR IGNORE INTO state (key, value) VALUES
+                    ('rows', 0), ('generation', 0), ('epoch', 0), ('ann_rows', 0), ('ann_indexed', 0);
+                """
+            )
+            self._conn.commit()
+
+        self._dim = self._state("dim")
+        self._set_epoch(self._state("epoch") or 0)
+        self._matrix = None
+        self._matrix_bytes = -1
+        self._generation = None
+        self._live = np.zeros(0, dtype=bool)
+        self._ann = None
+        self._ann_mtime = None
+        self._ann_rows = 0
+        self._ann_building = False
+        self.logger.info(
+            f"Memory-mapped vector index opened at {self.path} ({'read-only' if read_only else 'read-write'}, "
+            f"{self.count()} chunks)"
+        )
+
+    def _state(self, key: str) -> Optional[int]:
+        row = self._conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_state(self, key: str, value: int):
+        self._conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (key, value))
+
+    def _set_epoch(self, epoch: int):
+        """Point at the vector and ANN files of a compaction epoch; epoch 0 keeps the original names."""
+        suffix = f".{epoch}" if epoch else ""
+        self._epoch = epoch
+        self._vectors_path = self.path / f"vectors{suffix}.f32"
+        self._ann_path = self.path / f"ann{suffix}.faiss"
+
+    def _map(self):
+        """(Re)map the vector file if it has grown since it was last mapped."""
+        size = self._vectors_path.stat().st_size if self._vectors_path.exists() else 0
+        if size != self._matrix_bytes and self._dim:
+            rows = size // (4 * self._dim)
+            self._matrix = np.memmap(
+                self._vectors_path, dtype=np.float32, mode="r" if self.read_only else "r+", shape=(rows, self._dim)
+            ) if rows else None
+            self._matrix_bytes = size
+
+    def _refresh(self):
+        """Pick up rows committed by this or another process since the last call.
+
+        The sidecar state and rows are read in one snapshot and the vector file
+        is mapped afterwards. Vectors are flushed before their rows commit, so
+        the mapping covers every row of the snapshot unless a compaction removed
+        the file in between, in which case the next snapshot names the new one.
+        """
+        for _ in range(3):
+            self._conn.execute("BEGIN")
+            try:
+                generation = self._state("generation")
+                if generation == self._generation:
+                    return
+                dim = self._state("dim")
+                epoch = self._state("epoch") or 0
+                total = self._state("rows") or 0
+                ann_rows = self._state("ann_rows") or 0
+                rows = np.fromiter((row for (row,) in self._conn.execute("SELECT row FROM chunks")), dtype=np.int64)
+            finally:
+                self._conn.commit()
+            if self._dim is None:
+                self._dim = dim
+            if epoch != self._epoch:
+                # Compacted: rows were renumbered into a new vector file and the old graph no longer applies
+                self._set_epoch(epoch)
+                self._matrix = None
+                self._matrix_bytes = -1
+                self._ann = None
+                self._ann_mtime = None
+            self._map()
+            if total > (self._matrix.shape[0] if self._matrix is not None else 0):
+                continue
+            live = np.zeros(total, dtype=bool)
+            live[rows] = True
+            self._live = live
+            self._generation = generation
+            self._ann_rows = ann_rows
+            self._load_ann()
+            return
+        raise RuntimeError(f"Vector file {self._vectors_path} is shorter than its sidecar in {self.path}")
+
+    def _load_ann(self):
+        if not self.ann_enabled or not self._ann_path.exists():
+            return
+        mtime = self._ann_path.stat().st_mtime
+        if mtime == self._ann_mtime:
+            return
+        try:
+            import faiss
+        except ImportError:
+            return
+        try:
+            # Map the index file where the FAISS build supports it instead of reading it into the heap
+            index = faiss.read_index(str(self._ann_path), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except Exception:
+            index = faiss.read_index(str(self._ann_path))
+        self._ann = index
+        self._ann_mtime = mtime
+        self.logger.info(f"Loaded ANN index over {index.ntotal} rows")
+
+    def _ensure_capacity(self, rows: int):
+        capacity = self._matrix.shape[0] if self._matrix is not None else 0
+        if rows <= capacity:
+            return
+        new_capacity = max(rows, capacity * 2, self.GROWTH_ROWS)
+        with open(self._vectors_path, "ab") as f:
+            f.truncate(new_capacity * self._dim * 4)
+        self._map()
+
+    def _writable(self):
+        if self.read_only:
+            raise RuntimeError(f"Vector index at {self.path} is open read-only")
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def get(self, ids=None, filenames=None, include_embeddings=False, limit=None, offset=0) -> Dict[str, list]:
+        sql = "SELECT id, row, document, metadata FROM chunks"
+        conditions, params = [], []
+        if ids is not None:
+            if not ids:
+                return {"ids": [], "documents": [], "metadatas": [], **({"embeddings": []} if include_embeddings else {})}
+            conditions.append(f"id IN ({','.join('?' * len(ids))})")
+            params.extend(ids)
+        if filenames:
+            conditions.append(f"filename IN ({','.join('?' * len(filenames))})")
+            params.extend(filenames)
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY row"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([limit, offset])
+        with self._lock:
+            self._refresh()
+            rows = self._conn.execute(sql, params).fetchall()
+            matrix = self._matrix
+        result = {
+            "ids": [chunk_id for chunk_id, _, _, _ in rows],
+            "documents": [document for _, _, document, _ in rows],
+            "metadatas": [json.loads(metadata) for _, _, _, metadata in rows],
+        }
+        if include_embeddings:
+            result["embeddings"] = [matrix[row].tolist() for _, row, _, _ in rows]
+        return result
+
+    def stored_files(self, page_size: int = 1000) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT filename, COUNT(*) FROM chunks GROUP BY filename").fetchall())
+
+    def get_ids(self, filename: str) -> List[str]:
+        with self._lock:
+            return [chunk_id for (chunk_id,) in self._conn.execute("SELECT id FROM chunks WHERE filename = ?", (filename,))]
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self._writable()
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        with self._lock:
+            try:
+                if self._dim is None:
+                    self._dim = int(vectors.shape[1])
+                    self._set_state("dim", self._dim)
+                start = self._state("rows")
+                end = start + len(ids)
+                self._ensure_capacity(end)
+                # Vectors are flushed before the sidecar commit, so readers never see a row without its vector
+                self._matrix[start:end] = vectors
+                self._matrix.flush()
+                self._conn.execute(f"DELETE FROM chunks WHERE id IN ({','.join('?' * len(ids))})", ids)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO chunks (id, row, filename, document, metadata) VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (chunk_id, start + i, metadata.get("filename", ""), document, json.dumps(metadata))
+                        for i, (chunk_id, document, metadata) in enumerate(zip(ids, documents, metadatas))
+                    ]
+                )
+                self._set_state("rows", end)
+                self._bump_generation()
+            except BaseException:
+                # Rows past the committed count are reused by the next upsert
+                self._conn.rollback()
+                self._dim = self._state("dim")
+                raise
+        self._maybe_compact()
+        self._maybe_rebuild_ann()
+
+    def update(self, ids, metadatas):
+        self._writable()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE chunks SET filename = ?, metadata = ? WHERE id = ?",
+                [(metadata.get("filename", ""), json.dumps(metadata), chunk_id) for chunk_id, metadata in zip(ids, metadatas)]
+            )
+            self._bump_generation()
+
+    def delete(self, ids):
+        self._writable()
+        with self._lock:
+            try:
+                for start in range(0, len(ids), 500):
+                    batch = ids[start:start + 500]
+                    self._conn.execute(f"DELETE FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch)
+                self._bump_generation()
+            except BaseException:
+                self._conn.rollback()
+                raise
+        self._maybe_compact()
+        self._maybe_rebuild_ann()
+
+    def _bump_generation(self):
+        self._conn.execute("UPDATE state SET value = value + 1 WHERE key = 'generation'")
+        self._conn.commit()
+
+    def search(self, vector, k, filenames=None) -> List[Tuple[Document, float]]:
+        query = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            self._refresh()
+            matrix, live, ann, ann_rows, epoch = self._matrix, self._live, self._ann, self._ann_rows, self._epoch
+            if matrix is None or not live.any():
+                return []
+            if filenames:
+                candidates = np.fromiter(
+                    (row for (row,) in self._conn.execute(
+                        f"SELECT row FROM chunks WHERE filename IN ({','.join('?' * len(filenames))})", filenames
+                    )),
+                    dtype=np.int64
+                )
+
+        total = len(live)
+        if filenames:
+            scores = matrix[candidates] @ query if len(candidates) else np.zeros(0, dtype=np.float32)
+            rows, scores = self._top_k(candidates, scores, k)
+        elif ann is not None:
+            rows, scores = self._search_ann(ann, ann_rows, matrix, live, query, k)
+        else:
+            scores = matrix[:total] @ query
+            scores[~live] = -np.inf
+            rows, scores = self._top_k(np.arange(total), scores, k)
+            keep = np.isfinite(scores)
+            rows, scores = rows[keep], scores[keep]
+        results = self._documents(rows, scores, epoch)
+        if results is None:
+            # The index was compacted by another process mid-search, so the rows were renumbered
+            return self.search(vector, k, filenames)
+        return results
+
+    @staticmethod
+    def _top_k(rows: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        if len(scores) > k:
+            best = np.argpartition(-scores, k)[:k]
+            rows, scores = rows[best], scores[best]
+        order = np.argsort(-scores)
+        return rows[order], scores[order]
+
+    def _search_ann(self, ann, ann_rows, matrix, live, query, k) -> Tuple[np.ndarray, np.ndarray]:
+        """HNSW over the rows below `ann_rows` plus an exact scan of rows added after the graph was built."""
+        import faiss
+
+        ann_rows = min(ann_rows, len(live))
+        # Rows below ann_rows that were live at build time are in the graph; those deleted since are filtered out
+        dead = max(0, ann.ntotal - int(live[:ann_rows].sum()))
+        fetch = min(ann.ntotal, k + dead + max(k, 16))
+        rows = np.zeros(0, dtype=np.int64)
+        scores = np.zeros(0, dtype=np.float32)
+        if fetch:
+            params = faiss.SearchParametersHNSW(efSearch=max(self.ef_search, fetch))
+            ann_scores, ann_ids = ann.search(query.reshape(1, -1), fetch, params=params)
+            ann_ids, ann_scores = ann_ids[0], ann_scores[0]
+            keep = (ann_ids >= 0) & (ann_ids < ann_rows)
+            keep[keep] &= live[ann_ids[keep]]
+            rows, scores = ann_ids[keep].astype(np.int64), ann_scores[keep]
+        tail = np.arange(ann_rows, len(live))[live[ann_rows:]]
+        if len(tail):
+            rows = np.concatenate([rows, tail])
+            scores = np.concatenate([scores, matrix[tail] @ query])
+        return self._top_k(rows, scores, k)
+
+    def _documents(self, rows: np.ndarray, scores: np.ndarray, epoch: int) -> Optional[List[Tuple[Document, float]]]:
+        """Look up the chunks of scored rows, or None if the rows belong to an older compaction epoch."""
+        if not len(rows):
+            return []
+        row_list = [int(row) for row in rows]
+        with self._lock:
+            # One statement reads the epoch and the rows from the same snapshot
+            found = {}
+            for row_epoch, row, chunk_id, document, metadata in self._conn.execute(
+                f"SELECT current.epoch, chunks.row, chunks.id, chunks.document, chunks.metadata "
+                f"FROM (SELECT COALESCE((SELECT value FROM state WHERE key = 'epoch'), 0) AS epoch) AS current "
+                f"LEFT JOIN chunks ON chunks.row IN ({','.join('?' * len(row_list))})",
+                row_list
+            ):
+                if row_epoch != epoch:
+                    return None
+                if row is not None:
+                    found[row] = (chunk_id, document, metadata)
+        results = []
+        for row, score in zip(row_list, scores):
+            if row in found:
+                chunk_id, document, metadata = found[row]
+                results.append((Document(page_content=document, metadata=json.loads(metadata), id=chunk_id), 1.0 - float(score)))
+        return results
+
+    def _maybe_compact(self):
+        """Compact once dead rows make up `COMPACT_FRACTION` of the vector file."""
+        with self._lock:
+            total = self._state("rows") or 0
+            live_count = self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+        if total >= self.GROWTH_ROWS and total - live_count >= self.COMPACT_FRACTION * total:
+            self.compact()
+
+    def compact(self):
+        """Copy the live rows into a new vector file, renumber them and drop the old file and graph.
+
+        The new file belongs to the next epoch; readers switch to it when they see the
+        epoch change, and a search that read rows of the old epoch is retried.
+        """
+        self._writable()
+        with self._lock:
+            self._refresh()
+            start_time = time.time()
+            rows = np.fromiter(
+                (row for (row,) in self._conn.execute("SELECT row FROM chunks ORDER BY row")), dtype=np.int64
+            )
+            old_vectors_path, old_ann_path, total = self._vectors_path, self._ann_path, len(self._live)
+            epoch = self._epoch + 1
+            self._set_epoch(epoch)
+            capacity = max(len(rows), self.GROWTH_ROWS)
+            with open(self._vectors_path, "wb") as f:
+                f.truncate(capacity * self._dim * 4)
+            compacted = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self._dim))
+            for offset in range(0, len(rows), self.GROWTH_ROWS):
+                compacted[offset:offset + self.GROWTH_ROWS] = self._matrix[rows[offset:offset + self.GROWTH_ROWS]]
+            compacted.flush()
+            del compacted
+            # Rows only move down and are renumbered in ascending order, so the UNIQUE row index never collides
+            self._conn.executemany(
+                "UPDATE chunks SET row = ? WHERE row = ?", ((new, int(old)) for new, old in enumerate(rows))
+            )
+            self._set_state("rows", len(rows))
+            self._set_state("epoch", epoch)
+            self._set_state("ann_rows", 0)
+            self._set_state("ann_indexed", 0)
+            self._bump_generation()
+            self._matrix = None
+            self._matrix_bytes = -1
+            self._ann = None
+            self._ann_mtime = None
+            self._refresh()
+            # Readers that still map the old file keep their mapping until they switch epochs
+            for path in (old_vectors_path, old_ann_path):
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+            compact_time = time.time() - start_time
+            self.logger.info(f"Compacted vector index from {total} to {len(rows)} rows in {compact_time:.2f} seconds")
+
+    def _maybe_rebuild_ann(self):
+        """Rebuild the HNSW graph in the background once enough rows were added or deleted since the last build."""
+        if not self.ann_enabled or self._ann_building:
+            return
+        try:
+            import faiss  # noqa: F401
+        except ImportError:
+            return
+        with self._lock:
+            total = self._state("rows")
+            ann_rows = self._state("ann_rows") or 0
+            ann_indexed = self._state("ann_indexed") or 0
+            live_count = self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+            still_indexed = self._conn.execute("SELECT COUNT(*) FROM chunks WHERE row < ?", (ann_rows,)).fetchone()[0]
+        if live_count < self.ann_min_rows:
+            return
+        added = total - ann_rows
+        deleted = ann_indexed - still_indexed
+        if added + deleted < self.REBUILD_FRACTION * live_count:
+            return
+        self._ann_building = True
+        threading.Thread(target=self.build_ann, name="mmap-ann-builder", daemon=True).start()
+
+    def build_ann(self):
+        """Build an HNSW graph over the current live rows and publish it atomically."""
+        import faiss
+
+        stale = False
+        try:
+            with self._lock:
+                self._refresh()
+                total = len(self._live)
+                matrix, epoch, ann_path = self._matrix, self._epoch, self._ann_path
+                rows = np.flatnonzero(self._live).astype(np.int64)
+            start_time = time.time()
+            index = faiss.IndexIDMap(faiss.IndexHNSWFlat(self._dim, self.hnsw_m, faiss.METRIC_INNER_PRODUCT))
+            faiss.downcast_index(index.index).hnsw.efConstruction = self.ef_construction
+            for offset in range(0, len(rows), self.GROWTH_ROWS):
+                batch = rows[offset:offset + self.GROWTH_ROWS]
+                index.add_with_ids(np.ascontiguousarray(matrix[batch]), batch)
+            tmp_path = ann_path.with_suffix(f".{os.getpid()}.tmp")
+            faiss.write_index(index, str(tmp_path))
+            with self._lock:
+                if self._epoch != epoch:
+                    # Compacted while building; the row numbers in this graph are stale
+                    tmp_path.unlink()
+                    self.logger.info("Discarded ANN index built before a compaction")
+                    stale = True
+                    return
+                os.replace(tmp_path, ann_path)
+                # Publish the graph's coverage after the file, so readers never trust rows it lacks
+                self._set_state("ann_rows", total)
+                self._set_state("ann_indexed", len(rows))
+                self._bump_generation()
+                self._ann = index
+                self._ann_mtime = ann_path.stat().st_mtime
+                self._ann_rows = total
+            build_time = time.time() - start_time
+            self.logger.info(f"Built ANN index over {len(rows)} live rows of {total} in {build_time:.2f} seconds")
+        except Exception as e:
+            self.logger.error(f"ANN index build failed: {str(e)}")
+        finally:
+            self._ann_building = False
+            if stale:
+                self._maybe_rebuild_ann()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refresh()
+            live_count = int(self._live.sum())
+            return {
+                "backend": self.name,
+                "path": str(self.path),
+                "read_only": self.read_only,
+                "chunks": live_count,
+                "rows_allocated": len(self._live),
+                "dead_rows": len(self._live) - live_count,
+                "vector_file_mb": round(self._matrix_bytes / (1024 * 1024), 2) if self._matrix_bytes > 0 else 0.0,
+                "ann_rows": self._ann.ntotal if self._ann is not None else None,
+                "epoch": self._epoch,
+            }
@@ -0,0 +1,332 @@
+from typing import List, Dict, Any, Optional, Tuple
+from collections import OrderedDict
+from pathlib import Path
+from langchain_core.documents import Document
+from utils.vector_backends import VectorBackend
+from utils.metrics import record_cache
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+
+
+class PartitionedBackend(VectorBackend):
+    """Adds one small vector partition per document to another backend.
+
+    Every write goes to the wrapped backend, which still answers unfiltered
+    searches and holds the text and metadata. Each file's vectors are also
+    appended to a partition file of its own. A search limited to some files
+    reads only those files' partitions and scans them exactly, so its cost
+    depends on the size of the claim packet, not the corpus, and recall does
+    not suffer from filtering inside a global ANN graph. A few hundred chunks
+    per file are cheaper to scan than to graph-search, so partitions have no
+    ANN index.
+
+    Partitions live in `<path>/<key>-<epoch>.f32` with a SQLite sidecar that
+    maps chunk IDs to rows. Deleting a chunk only drops its sidecar row; once a
+    partition is mostly dead rows it is rewritten under a new epoch. Loaded
+    partitions are kept in an LRU cache of `cache_size` files and reloaded when
+    their version changes, so read-only processes see new writes.
+    Partitions are keyed by the filename given at upsert time.
+    """
+
+    name = "partitioned"
+    # Rewrite a partition once it has at least this many dead rows and more dead than live
+    COMPACT_MIN_DEAD = 64
+
+    def __init__(self, inner: VectorBackend, path: str, cache_size: int = 256, read_only: bool = False):
+        self.logger = logging.getLogger(__name__)
+        self.inner = inner
+        # Filtered results are mixed with the inner backend's, so report its kind of distance
+        self.space = inner.space
+        self.path = Path(path)
+        self.cache_size = cache_size
+        self.read_only = read_only
+        self._lock = threading.RLock()
+        self._cache: "OrderedDict[str, Tuple[int, np.ndarray, np.ndarray]]" = OrderedDict()
+
+        db_path = self.path / "partitions.sqlite3"
+        if read_only:
+            self._conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS partitions (
+                    filename TEXT PRIMARY KEY, key TEXT NOT NULL, epoch INTEGER NOT NULL DEFAULT 0,
+                    version INTEGER NOT NULL DEFAULT 0, rows INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS partition_chunks (
+                    id TEXT PRIMARY KEY, filename TEXT NOT NULL, row INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_partition_chunks_filename ON partition_chunks (filename);
+                CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+                """
+            )
+            self._conn.commit()
+        row = self._conn.execute("SELECT value FROM state WHERE key = 'dim'").fetchone()
+        self._dim = row[0] if row else None
+        self.logger.info(f"Partitioned index opened at {self.path} ({self.partition_count} partitions)")
+
+    @property
+    def partition_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM partitions").fetchone()[0]
+
+    def _file(self, key: str, epoch: int) -> Path:
+        return self.path / f"{key}-{epoch}.f32"
+
+    def _writable(self):
+        if self.read_only:
+            raise RuntimeError(f"Partitioned index at {self.path} is open read-only")
+
+    # Reads and writes of text and metadata are answered by the wrapped backend
+
+    def count(self) -> int:
+        return self.inner.count()
+
+    def get(self, ids=None, filenames=None, include_embeddings=False, limit=None, offset=0) -> Dict[str, list]:
+        return self.inner.get(ids=ids, filenames=filenames, include_embeddings=include_embeddings,
+                              limit=limit, offset=offset)
+
+    def get_ids(self, filename: str) -> List[str]:
+        return self.inner.get_ids(filename)
+
+    def stored_files(self, page_size: int = 1000) -> Dict[str, int]:
+        return self.inner.stored_files(page_size)
+
+    def update(self, ids, metadatas):
+        self.inner.update(ids, metadatas)
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self._writable()
+        self.inner.upsert(ids, embeddings, documents, metadatas)
+        self._add_to_partitions(ids, embeddings, [metadata.get("filename", "") for metadata in metadatas])
+
+    def delete(self, ids):
+        self._writable()
+        self.inner.delete(ids)
+        with self._lock:
+            touched = self._remove_from_partitions(ids)
+            self._conn.commit()
+            self._compact(touched)
+
+    def _add_to_partitions(self, ids: List[str], embeddings, filenames: List[str]):
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        by_file: Dict[str, List[int]] = {}
+        for i, filename in enumerate(filenames):
+            by_file.setdefault(filename, []).append(i)
+        with self._lock:
+            if self._dim is None:
+                self._dim = int(vectors.shape[1])
+                self._conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('dim', ?)", (self._dim,))
+            touched = self._remove_from_partitions(ids)
+            for filename, positions in by_file.items():
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO partitions (filename, key) VALUES (?, ?)",
+                    (filename, hashlib.sha256(filename.encode("utf-8")).hexdigest()[:24])
+                )
+                key, epoch, start = self._conn.execute(
+                    "SELECT key, epoch, rows FROM partitions WHERE filename = ?", (filename,)
+                ).fetchone()
+                # Vectors are on disk before the sidecar commit, so readers never see a row without its vector.
+                # Truncating first drops any tail left by a write that crashed before its commit.
+                with open(self._file(key, epoch), "ab") as f:
+                    f.truncate(start * self._dim * 4)
+                    f.write(np.ascontiguousarray(vectors[positions]).tobytes())
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO partition_chunks (id, filename, row) VALUES (?, ?, ?)",
+                    [(ids[position], filename, start + i) for i, position in enumerate(positions)]
+                )
+                self._conn.execute(
+                    "UPDATE partitions SET rows = rows + ?, version = version + 1 WHERE filename = ?",
+                    (len(positions), filename)
+                )
+            self._conn.commit()
+            self._compact(touched)
+
+    def _remove_from_partitions(self, ids: List[str]) -> set:
+        """Drop sidecar rows for the IDs and return the filenames they belonged to."""
+        touched = set()
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            touched.update(
+                filename for (filename,) in self._conn.execute(
+                    f"SELECT DISTINCT filename FROM partition_chunks WHERE id IN ({placeholders})", batch
+                )
+            )
+            self._conn.execute(f"DELETE FROM partition_chunks WHERE id IN ({placeholders})", batch)
+        if touched:
+            self._conn.executemany(
+                "UPDATE partitions SET version = version + 1 WHERE filename = ?", [(filename,) for filename in touched]
+            )
+        return touched
+
+    def _compact(self, filenames):
+        """Rewrite partitions that are mostly dead rows, or drop them when empty."""
+        for filename in filenames:
+            key, epoch, rows = self._conn.execute(
+                "SELECT key, epoch, rows FROM partitions WHERE filename = ?", (filename,)
+            ).fetchone()
+            live = self._conn.execute(
+                "SELECT id, row FROM partition_chunks WHERE filename = ? ORDER BY row", (filename,)
+            ).fetchall()
+            dead = rows - len(live)
+            if live and (dead < self.COMPACT_MIN_DEAD or dead <= len(live)):
+                continue
+            old_file = self._file(key, epoch)
+            if live:
+                matrix = np.fromfile(old_file, dtype=np.float32).reshape(-1, self._dim)
+                self._file(key, epoch + 1).write_bytes(
+                    np.ascontiguousarray(matrix[[row for _, row in live]]).tobytes()
+                )
+                self._conn.executemany(
+                    "UPDATE partition_chunks SET row = ? WHERE id = ?",
+                    [(i, chunk_id) for i, (chunk_id, _) in enumerate(live)]
+                )
+                self._conn.execute(
+                    "UPDATE partitions SET epoch = epoch + 1, rows = ?, version = version + 1 WHERE filename = ?",
+                    (len(live), filename)
+                )
+            else:
+                self._conn.execute("DELETE FROM partitions WHERE filename = ?", (filename,))
+            self._conn.commit()
+            if old_file.exists():
+                os.unlink(old_file)
+
+    def _load(self, filename: str, version: int, key: str, epoch: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Read a partition's live rows into a contiguous matrix, retrying if it is compacted meanwhile."""
+        for _ in range(3):
+            with self._lock:
+                live = self._conn.execute(
+                    "SELECT id, row FROM partition_chunks WHERE filename = ? ORDER BY row", (filename,)
+                ).fetchall()
+            try:
+                matrix = np.fromfile(self._file(key, epoch), dtype=np.float32).reshape(-1, self._dim)
+                ids = np.array([chunk_id for chunk_id, _ in live], dtype=object)
+                return ids, np.ascontiguousarray(matrix[[row for _, row in live]])
+            except (FileNotFoundError, IndexError, ValueError):
+                with self._lock:
+                    state = self._conn.execute(
+                        "SELECT version, key, epoch FROM partitions WHERE filename = ?", (filename,)
+                    ).fetchone()
+                if state is None:
+                    return None
+                version, key, epoch = state
+        self.logger.warning(f"Partition for {filename} kept changing while loading")
+        return None
+
+    def _partitions(self, filenames: List[str]) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Cached (ids, vectors) for the named files, reloading any that changed."""
+        placeholders = ",".join("?" * len(filenames))
+        with self._lock:
+            if self._dim is None:
+                row = self._conn.execute("SELECT value FROM state WHERE key = 'dim'").fetchone()
+                self._dim = row[0] if row else None
+            states = self._conn.execute(
+                f"SELECT filename, version, key, epoch FROM partitions WHERE filename IN ({placeholders})", filenames
+            ).fetchall()
+        partitions = []
+        for filename, version, key, epoch in states:
+            with self._lock:
+                cached = self._cache.get(filename)
+                if cached is not None and cached[0] == version:
+                    self._cache.move_to_end(filename)
+            hit = cached is not None and cached[0] == version
+            record_cache("partition", hit)
+            if hit:
+                partitions.append(cached[1:])
+                continue
+            loaded = self._load(filename, version, key, epoch)
+            if loaded is None:
+                continue
+            with self._lock:
+                self._cache[filename] = (version,) + loaded
+                self._cache.move_to_end(filename)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            partitions.append(loaded)
+        return partitions
+
+    def search(self, vector, k, filenames=None) -> List[Tuple[Document, float]]:
+        if not filenames:
+            return self.inner.search(vector, k)
+        query = np.asarray(vector, dtype=np.float32)
+        partitions = [(ids, matrix) for ids, matrix in self._partitions(list(filenames)) if len(ids)]
+        if not partitions:
+            return []
+        ids = np.concatenate([ids for ids, _ in partitions])
+        scores = np.concatenate([matrix @ query for _, matrix in partitions])
+        if len(scores) > k:
+            best = np.argpartition(-scores, k)[:k]
+            ids, scores = ids[best], scores[best]
+        order = np.argsort(-scores)
+        ranked_ids = [str(chunk_id) for chunk_id in ids[order]]
+        distances = dict(zip(ranked_ids, (self.inner.distance(float(score)) for score in scores[order])))
+
+        result = self.inner.get(ids=ranked_ids)
+        docs = {
+            chunk_id: Document(page_content=text, metadata=metadata or {}, id=chunk_id)
+            for chunk_id, text, metadata in zip(result["ids"], result["documents"], result["metadatas"])
+        }
+        return [(docs[chunk_id], distances[chunk_id]) for chunk_id in ranked_ids if chunk_id in docs]
+
+    def backfill(self):
+        """Rebuild the partitions of files whose partitioned chunk count differs from the stored one.
+
+        Runs on every start, so files stored before partitioning was enabled, and
+        files left behind by an interrupted backfill or write, are caught up, and
+        partitions of files that are no longer stored are dropped. Each file is
+        rebuilt in one commit.
+        """
+        stored = self.inner.stored_files()
+        with self._lock:
+            partitioned = dict(self._conn.execute(
+                "SELECT filename, COUNT(*) FROM partition_chunks GROUP BY filename"
+            ).fetchall())
+        missing = [
+            filename for filename in {**stored, **partitioned} if partitioned.get(filename) != stored.get(filename)
+        ]
+        if not missing:
+            return
+        self.logger.info(f"Rebuilding document partitions for {len(missing)} of {len(stored)} stored files")
+        start_time = time.time()
+        for filename in missing:
+            chunks = self.inner.get(filenames=[filename], include_embeddings=True)
+            with self._lock:
+                touched = self._remove_from_partitions([
+                    chunk_id for (chunk_id,) in self._conn.execute(
+                        "SELECT id FROM partition_chunks WHERE filename = ?", (filename,)
+                    )
+                ])
+                if chunks["ids"]:
+                    self._add_to_partitions(chunks["ids"], chunks["embeddings"], [filename] * len(chunks["ids"]))
+                else:
+                    self._conn.commit()
+                self._compact(touched)
+        backfill_time = time.time() - start_time
+        self.logger.info(f"Partitions built in {backfill_time:.2f} seconds")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            partitions, rows = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(rows), 0) FROM partitions").fetchone()
+            live = self._conn.execute("SELECT COUNT(*) FROM partition_chunks").fetchone()[0]
+            cached = len(self._cache)
+        return {
+            **self.inner.get_stats(),
+            "partitions": {
+                "path": str(self.path),
+                "read_only": self.read_only,
+                "partitions": partitions,
+                "chunks": live,
+                "dead_rows": rows - live,
+                "mean_chunks_per_partition": round(live / partitions, 1) if partitions else None,
+                "cached_partitions": cached,
+            },
+        }
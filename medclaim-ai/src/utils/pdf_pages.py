@@ -0,0 +1,24 @@
+from __future__ import annotations
+from typing import List, Tuple, Iterator
+import fitz  # PyMuPDF
+
+# Kept free of heavy imports: this module is loaded by extraction worker processes.
+
+
+def get_page_count(file_bytes: bytes) -> int:
+    """Return the number of pages in a PDF."""
+    with fitz.open(stream=file_bytes, filetype="pdf") as doc:
+        return doc.page_count
+
+
+def extract_page_range(file_bytes: bytes, start: int, end: int) -> List[Tuple[int, str]]:
+    """Extract the text layer of pages [start, end) as (1-based page number, text) pairs."""
+    with fitz.open(stream=file_bytes, filetype="pdf") as doc:
+        return [(i + 1, doc[i].get_text()) for i in range(start, min(end, doc.page_count))]
+
+
+def iter_page_text(file_bytes: bytes) -> Iterator[Tuple[int, str]]:
+    """Yield the text layer of each page as (1-based page number, text) pairs."""
+    with fitz.open(stream=file_bytes, filetype="pdf") as doc:
+        for i in range(doc.page_count):
+            yield i + 1, doc[i].get_text()
@@ -0,0 +1,51 @@
+from typing import Iterable, Iterator, TypeVar
+import queue
+import threading
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+def bounded_prefetch(items: Iterable[T], maxsize: int) -> Iterator[T]:
+    """Produce items from a background thread through a bounded queue.
+    
+    The producer runs at most `maxsize` items ahead of the consumer, so a slow
+    consumer (e.g. embedding) overlaps with a fast producer (e.g. extraction)
+    without buffering the whole stream. Producer exceptions are re-raised to
+    the consumer.
+    """
+    buffer: "queue.Queue" = queue.Queue(maxsize=max(1, maxsize))
+    stop = threading.Event()
+    
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def produce():
+        try:
+            for item in items:
+                if not put(item):
+                    return
+            put(_DONE)
+        except BaseException as e:
+            put(e)
+    
+    producer = threading.Thread(target=produce, name="bounded-prefetch", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # Unblock the producer if the consumer stops early
+        stop.set()
@@ -0,0 +1,92 @@
+from typing import List, Dict, Any
+from concurrent.futures import Future
+from langchain_core.embeddings import Embeddings
+from utils.metrics import QUERY_EMBED_BATCH_SIZE, QUERY_EMBED_BATCH_WINDOW, QUERY_EMBED_BATCH_MAX
+import logging
+import queue
+import threading
+import time
+
+
+class MicroBatchingEmbeddings(Embeddings):
+    """Coalesces concurrent embed_query calls into batched forward passes.
+
+    Each query waits at most `window_ms` for other queries to arrive, then up to
+    `max_batch_size` queries are embedded with one embed_documents call on a
+    background thread. This relies on the backend embedding queries and
+    documents identically, which holds for the sentence-transformers and
+    fastembed BGE backends. Document embedding is passed straight through since
+    ingestion already embeds in batches.
+    """
+
+    def __init__(self, embeddings: Embeddings, window_ms: float = 5.0, max_batch_size: int = 32):
+        self.logger = logging.getLogger(__name__)
+        self.embeddings = embeddings
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.batches = 0
+        self.queries = 0
+        self.largest_batch = 0
+        QUERY_EMBED_BATCH_WINDOW.set(self.window)
+        QUERY_EMBED_BATCH_MAX.set(max_batch_size)
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="query-embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents directly with the wrapped backend."""
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query as part of the next micro-batch and wait for its vector."""
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future.result()
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Queue several queries together so they share the next batches."""
+        futures = []
+        for text in texts:
+            future: Future = Future()
+            self._queue.put((text, future))
+            futures.append(future)
+        return [future.result() for future in futures]
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                vectors = self.embeddings.embed_documents([text for text, _ in batch])
+            except Exception as e:
+                self.logger.error(f"Query embedding batch of {len(batch)} failed: {str(e)}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+            self.batches += 1
+            self.queries += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+            QUERY_EMBED_BATCH_SIZE.observe(len(batch))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get batching configuration and observed batch sizes."""
+        return {
+            "window_ms": self.window * 1000.0,
+            "max_batch_size": self.max_batch_size,
+            "batches": self.batches,
+            "queries": self.queries,
+            "largest_batch": self.largest_batch,
+            "mean_batch_size": round(self.queries / self.batches, 2) if self.batches else None,
+        }
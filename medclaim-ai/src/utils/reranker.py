@@ -0,0 +1,117 @@
+from typing import List, Any, Dict
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from utils.metrics import observe_stage
+import logging
+import threading
+import time
+
+
+class BudgetedReranker:
+    """Cross-encoder reranker with a per-query latency budget.
+
+    Candidates are scored in batches on CPU. Each batch's cost is estimated
+    from a moving average of the time per candidate in earlier batches, and if
+    it would not finish within the budget, reranking is abandoned and the
+    incoming (vector) order is kept. The budget is best-effort and may be
+    overshot by one batch: the first batch after startup has no estimate
+    (warm-up runs it), a batch can run slower than estimated, and a query that
+    falls back before scoring anything halves the estimate, so a reranker that
+    has recovered from a slow spell is tried again.
+    """
+
+    # Weight of the latest batch in the per-candidate time estimate
+    EWMA_ALPHA = 0.3
+
+    _models: Dict[str, Any] = {}
+    _lock = threading.Lock()
+
+    def __init__(self, model_name: str, batch_size: int = 16, budget_ms: float = 300.0):
+        self.logger = logging.getLogger(__name__)
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.budget = budget_ms / 1000.0
+        self.reranked = 0
+        self.fallbacks = 0
+        self._seconds_per_candidate = None
+        self._estimate_lock = threading.Lock()
+
+    def _get_model(self):
+        """Get the shared cross-encoder instance, loading it on first use."""
+        if self.model_name not in BudgetedReranker._models:
+            with BudgetedReranker._lock:
+                if self.model_name not in BudgetedReranker._models:
+                    from sentence_transformers import CrossEncoder
+
+                    self.logger.info(f"Loading cross-encoder: {self.model_name}")
+                    load_start = time.time()
+                    BudgetedReranker._models[self.model_name] = CrossEncoder(self.model_name, device="cpu")
+                    load_time = time.time() - load_start
+                    self.logger.info(f"Cross-encoder loaded in {load_time:.2f} seconds")
+        return BudgetedReranker._models[self.model_name]
+
+    def rerank(self, query: str, docs: List[Document], top_n: int) -> List[Document]:
+        """Return the top_n documents by cross-encoder score, or in input order if over budget."""
+        if len(docs) <= 1:
+            return docs[:top_n]
+
+        model = self._get_model()
+        start_time = time.time()
+        scores: List[float] = []
+        for start in range(0, len(docs), self.batch_size):
+            batch = docs[start:start + self.batch_size]
+            elapsed = time.time() - start_time
+            with self._estimate_lock:
+                per_candidate = self._seconds_per_candidate
+                over_budget = per_candidate is not None and elapsed + per_candidate * len(batch) > self.budget
+                if over_budget and not scores:
+                    self._seconds_per_candidate = per_candidate / 2
+            if over_budget:
+                self.fallbacks += 1
+                self.logger.warning(
+                    f"Rerank budget of {self.budget * 1000:.0f}ms exhausted after {len(scores)}/{len(docs)} "
+                    f"candidates, keeping vector order"
+                )
+                return docs[:top_n]
+            batch_start = time.time()
+            scores.extend(model.predict([(query, doc.page_content) for doc in batch], batch_size=self.batch_size))
+            batch_time = (time.time() - batch_start) / len(batch)
+            with self._estimate_lock:
+                previous = self._seconds_per_candidate
+                self._seconds_per_candidate = batch_time if previous is None else (
+                    self.EWMA_ALPHA * batch_time + (1 - self.EWMA_ALPHA) * previous
+                )
+
+        self.reranked += 1
+        order = sorted(range(len(docs)), key=lambda i: scores[i], reverse=True)
+        rerank_time = time.time() - start_time
+        self.logger.info(f"Reranked {len(docs)} candidates in {rerank_time * 1000:.0f}ms")
+        return [docs[i] for i in order[:top_n]]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get rerank and fallback counts."""
+        return {
+            "model": self.model_name,
+            "budget_ms": self.budget * 1000.0,
+            "estimated_ms_per_candidate": (
+                round(self._seconds_per_candidate * 1000.0, 3) if self._seconds_per_candidate is not None else None
+            ),
+            "reranked": self.reranked,
+            "fallbacks": self.fallbacks,
+        }
+
+
+class RerankingRetriever(BaseRetriever):
+    """Over-fetches candidates from a base retriever and keeps the best top_n after reranking."""
+
+    base_retriever: BaseRetriever
+    reranker: Any
+    top_n: int
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        candidates = self.base_retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        with observe_stage("rerank"):
+            return self.reranker.rerank(query, candidates, self.top_n)
@@ -0,0 +1,195 @@
+from typing import List, Dict, Any, Optional, Tuple
+from abc import ABC, abstractmethod
+from collections import Counter
+from langchain_core.documents import Document
+from config.settings import Settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+VECTOR_BACKENDS = ("chroma", "mmap")
+
+
+class VectorBackend(ABC):
+    """Storage and nearest-neighbour search for chunk vectors, documents and metadata.
+
+    Method names and keyword arguments follow Chroma's collection API so the
+    `BatchingWriter` can drive any backend. Vectors are always supplied by the
+    caller; backends never embed text themselves. Search distances follow
+    Chroma's definition for `space` ("l2" is squared Euclidean distance,
+    "cosine" and "ip" are 1 - similarity).
+    """
+
+    name = "base"
+    space = "cosine"
+
+    @abstractmethod
+    def count(self) -> int:
+        """Number of stored chunks."""
+
+    @abstractmethod
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        filenames: Optional[List[str]] = None,
+        include_embeddings: bool = False,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Dict[str, list]:
+        """Load chunks by ID or filename as {"ids", "documents", "metadatas"[, "embeddings"]}."""
+
+    @abstractmethod
+    def get_ids(self, filename: str) -> List[str]:
+        """IDs of all chunks stored for a filename."""
+
+    @abstractmethod
+    def upsert(self, ids: List[str], embeddings: List[List[float]], documents: List[str],
+               metadatas: List[Dict[str, Any]]):
+        """Insert or replace chunks."""
+
+    @abstractmethod
+    def update(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        """Replace the metadata of stored chunks."""
+
+    @abstractmethod
+    def delete(self, ids: List[str]):
+        """Remove chunks."""
+
+    @abstractmethod
+    def search(self, vector: List[float], k: int, filenames: Optional[List[str]] = None) -> List[Tuple[Document, float]]:
+        """Return up to k (document, distance) pairs, nearest first."""
+
+    def distance(self, similarity: float) -> float:
+        """Distance this backend reports between unit vectors with the given inner product."""
+        return 2.0 - 2.0 * similarity if self.space == "l2" else 1.0 - similarity
+
+    def stored_files(self, page_size: int = 1000) -> Dict[str, int]:
+        """Chunk count per stored filename."""
+        counts: Counter = Counter()
+        for offset in range(0, self.count(), page_size):
+            page = self.get(limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            counts.update((metadata or {}).get("filename", "") for metadata in page["metadatas"])
+        return dict(counts)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Backend-specific statistics."""
+        return {"backend": self.name}
+
+
+class ChromaBackend(VectorBackend):
+    """Persistent Chroma collection."""
+
+    name = "chroma"
+
+    def __init__(self, settings: Settings, embeddings):
+        from langchain_chroma import Chroma
+
+        self.vectorstore = Chroma(
+            persist_directory=settings.chroma_persist_dir,
+            embedding_function=embeddings,
+            collection_name=settings.collection_name,
+            collection_metadata={
+                "hnsw:space": settings.hnsw_space,
+                "hnsw:M": settings.hnsw_m,
+                "hnsw:construction_ef": settings.hnsw_construction_ef,
+                "hnsw:search_ef": settings.hnsw_search_ef,
+                # Larger HNSW batches and rarer syncs suit the coalesced writes of BatchingWriter
+                "hnsw:batch_size": settings.hnsw_batch_size,
+                "hnsw:sync_threshold": settings.hnsw_sync_threshold,
+            },
+        )
+        self.collection = self.vectorstore._collection
+        # The space is fixed when the collection is created, so an existing collection may differ from settings
+        self.space = (self.collection.metadata or {}).get("hnsw:space", "l2")
+
+    @staticmethod
+    def _where(filenames: Optional[List[str]]) -> Optional[Dict[str, Any]]:
+        return {"filename": {"$in": filenames}} if filenames else None
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def get(self, ids=None, filenames=None, include_embeddings=False, limit=None, offset=0) -> Dict[str, list]:
+        include = ["documents", "metadatas"] + (["embeddings"] if include_embeddings else [])
+        kwargs: Dict[str, Any] = {"include": include}
+        if ids is not None:
+            kwargs["ids"] = ids
+        if filenames:
+            kwargs["where"] = self._where(filenames)
+        if limit is not None:
+            kwargs.update(limit=limit, offset=offset)
+        return self.collection.get(**kwargs)
+
+    def get_ids(self, filename: str) -> List[str]:
+        return self.collection.get(where={"filename": filename}, include=[]).get("ids", [])
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def update(self, ids, metadatas):
+        self.collection.update(ids=ids, metadatas=metadatas)
+
+    def delete(self, ids):
+        self.collection.delete(ids=ids)
+
+    def search(self, vector, k, filenames=None) -> List[Tuple[Document, float]]:
+        if not self.collection.count():
+            return []
+        result = self.collection.query(
+            query_embeddings=[vector],
+            n_results=k,
+            where=self._where(filenames),
+            include=["documents", "metadatas", "distances"]
+        )
+        return [
+            (Document(page_content=text, metadata=metadata or {}, id=chunk_id), distance)
+            for chunk_id, text, metadata, distance in zip(
+                result["ids"][0], result["documents"][0], result["metadatas"][0], result["distances"][0]
+            )
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "chunks": self.collection.count()}
+
+
+def create_vector_backend(settings: Settings, embeddings, backend: Optional[str] = None) -> VectorBackend:
+    """Create the vector backend selected by `settings.vector_backend`.
+
+    - chroma: persistent Chroma collection with HNSW (default)
+    - mmap: memory-mapped float32 vectors with a SQLite metadata sidecar and an
+      optional FAISS HNSW index; several processes can open it read-only
+
+    With `settings.vector_partitions`, either one is wrapped in a
+    `PartitionedBackend` that answers filename-filtered searches from
+    per-document partitions.
+    """
+    backend = backend or settings.vector_backend
+    logger.info(f"Creating {backend} vector backend")
+    if backend == "chroma":
+        store = ChromaBackend(settings, embeddings)
+    elif backend == "mmap":
+        from utils.mmap_index import MmapVectorBackend
+
+        store = MmapVectorBackend(
+            settings.mmap_index_dir,
+            read_only=settings.mmap_read_only,
+            ann_enabled=settings.mmap_ann_enabled,
+            ann_min_rows=settings.mmap_ann_min_rows,
+            hnsw_m=settings.hnsw_m,
+            ef_construction=settings.hnsw_construction_ef,
+            ef_search=settings.hnsw_search_ef
+        )
+    else:
+        raise ValueError(f"Unknown vector backend: {backend} (expected one of {', '.join(VECTOR_BACKENDS)})")
+    if settings.vector_partitions:
+        from utils.partitioned_index import PartitionedBackend
+
+        store = PartitionedBackend(
+            store,
+            settings.partition_index_dir,
+            cache_size=settings.partition_cache_size,
+            read_only=settings.mmap_read_only
+        )
+    return store
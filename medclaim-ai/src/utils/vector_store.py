@@ -1,16 +1,30 @@
-from typing import List, Dict, Any, Optional
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
+from typing import List, Dict, Any, Optional, Iterable, Tuple, Callable, Container
+from langchain_core.documents import Document
 from config.settings import get_settings
+from utils.embeddings import create_embeddings
+from utils.embedding_cache import CachedEmbeddings
+from utils.query_batcher import MicroBatchingEmbeddings
+from utils.embedding_server import RemoteEmbeddings, connect_embedding_server
+from utils.lexical_index import LexicalIndex, is_identifier_query
+from utils.hybrid_retriever import HybridRetriever, VectorRetriever
+from utils.vector_backends import create_vector_backend
+from utils.partitioned_index import PartitionedBackend
+from utils.vector_writer import BatchingWriter, wait_for_writes
+from utils.metrics import CHUNKS_PROCESSED, STAGE_DURATION, observe_stage
+from collections import deque
+import hashlib
+import os
 import threading
 import logging
 import time
 
 
 class VectorStoreManager:
-    """Manages Chroma vector database operations for document embeddings."""
+    """Manages vector database operations for document embeddings."""
     
     _embeddings = None
+    _base_embeddings = None
+    _query_batcher = None
     _lock = threading.Lock()
     
     def __init__(self):
@@ -22,19 +36,36 @@ class VectorStoreManager:
         
         embed_start = time.time()
         self.embeddings = self._get_embeddings()
+        # The model (or embedding server) without the persistent cache, for texts not worth storing
+        self.base_embeddings = VectorStoreManager._base_embeddings
         embed_time = time.time() - embed_start
         self.logger.info(f"Embeddings initialized in {embed_time:.2f} seconds")
         
-        chroma_start = time.time()
-        self.vectorstore = Chroma(
-            persist_directory=self.settings.chroma_persist_dir,
-            embedding_function=self.embeddings,
-            collection_name=self.settings.collection_name,
+        backend_start = time.time()
+        self.backend = create_vector_backend(self.settings, self.embeddings)
+        backend_time = time.time() - backend_start
+        
+        if isinstance(self.backend, PartitionedBackend) and not self.backend.read_only:
+            self.backend.backfill()
+        
+        self.lexical_index = None
+        if self.settings.hybrid_retrieval:
+            self.lexical_index = LexicalIndex(
+                os.path.join(self.settings.chroma_persist_dir, self.settings.lexical_index_filename)
+            )
+            if not self.lexical_index.chunk_count:
+                self._backfill_lexical_index()
+        
+        # All writes go through one thread so concurrent ingestions share large batches
+        self.writer = BatchingWriter(
+            self.backend,
+            self.lexical_index,
+            flush_interval_ms=self.settings.vector_write_flush_ms,
+            max_batch_size=self.settings.vector_write_max_batch
         )
-        chroma_time = time.time() - chroma_start
         
         total_time = time.time() - start_time
-        self.logger.info(f"Chroma vector store initialized in {chroma_time:.2f} seconds")
+        self.logger.info(f"{self.backend.name} vector backend initialized in {backend_time:.2f} seconds")
         self.logger.info(f"VectorStoreManager fully initialized in {total_time:.2f} seconds")
     
     def _get_embeddings(self):
@@ -42,64 +73,437 @@ class VectorStoreManager:
         if VectorStoreManager._embeddings is None:
             with VectorStoreManager._lock:
                 if VectorStoreManager._embeddings is None:
-                    self.logger.info(f"Loading embedding model: {self.settings.embedding_model}")
+                    self.logger.info(f"Loading embedding model: {self.settings.embedding_model} ({self.settings.embedding_backend} backend)")
                     model_start = time.time()
-                    VectorStoreManager._embeddings = HuggingFaceEmbeddings(
-                        model_name=self.settings.embedding_model,
-                        model_kwargs={'device': 'cpu'},
-                        encode_kwargs={'normalize_embeddings': True}
-                    )
+                    if self.settings.embedding_server_socket:
+                        # One server process holds the model and batches queries from every worker
+                        embeddings = connect_embedding_server(
+                            self.settings.embedding_server_socket,
+                            autostart=self.settings.embedding_server_autostart
+                        )
+                    else:
+                        embeddings = create_embeddings(self.settings)
+                    VectorStoreManager._base_embeddings = embeddings
+                    if self.settings.query_batching_enabled and not isinstance(embeddings, RemoteEmbeddings):
+                        # Batch cache misses only; cached queries never wait for a batch window
+                        embeddings = MicroBatchingEmbeddings(
+                            embeddings,
+                            window_ms=self.settings.query_batch_window_ms,
+                            max_batch_size=self.settings.query_batch_max_size
+                        )
+                        VectorStoreManager._query_batcher = embeddings
+                    if self.settings.embedding_cache_enabled:
+                        embeddings = CachedEmbeddings(
+                            embeddings,
+                            model_name=self.settings.embedding_model,
+                            path=self.settings.embedding_cache_path,
+                            max_entries=self.settings.embedding_cache_max_entries
+                        )
+                    VectorStoreManager._embeddings = embeddings
                     model_time = time.time() - model_start
                     self.logger.info(f"Embedding model loaded in {model_time:.2f} seconds")
         else:
             self.logger.info("Using cached embedding model")
         return VectorStoreManager._embeddings
     
+    def warm_up(self):
+        """Run one uncached embedding and one search so the first request skips lazy setup."""
+        vector = VectorStoreManager._base_embeddings.embed_query("warm up")
+        if self.backend.count():
+            self.backend.search(vector, 1)
+        if self.lexical_index is not None:
+            self.lexical_index.search("warm up", 1)
+    
+    @staticmethod
+    def _chunk_id(chunk: str, filename: str, seen: Dict[str, int]) -> str:
+        """Build a deterministic ID from the filename and chunk text.
+        
+        Repeated identical chunks within a file get an occurrence suffix so IDs stay unique.
+        """
+        digest = hashlib.sha256(f"{filename}\x00{chunk}".encode("utf-8")).hexdigest()[:32]
+        occurrence = seen.get(digest, 0)
+        seen[digest] = occurrence + 1
+        return digest if occurrence == 0 else f"{digest}-{occurrence}"
+    
+    @staticmethod
+    def make_chunk_ids(chunks: List[str], filename: str) -> List[str]:
+        """Build deterministic chunk IDs for all chunks of a file."""
+        seen: Dict[str, int] = {}
+        return [VectorStoreManager._chunk_id(chunk, filename, seen) for chunk in chunks]
+    
+    def get_document_ids(self, filename: str) -> List[str]:
+        """Get the IDs of all chunks stored for a filename."""
+        return self.backend.get_ids(filename)
+    
     def add_documents(self, chunks: List[str], filename: str) -> int:
-        """Add text chunks to the vector store with metadata."""
+        """Add text chunks to the vector store with metadata.
+        
+        Returns the number of chunks that were embedded.
+        """
         if not chunks:
             self.logger.warning("No chunks provided for document addition")
             return 0
+        stats = self.add_document_stream(((None, chunk) for chunk in chunks), filename)
+        return stats["chunks_embedded"]
+    
+    def add_document_stream(
+        self,
+        chunks: Iterable[Tuple[Optional[int], str]],
+        filename: str,
+        batch_size: Optional[int] = None,
+        progress_callback: Optional[Callable[[Dict[str, int]], None]] = None,
+    ) -> Dict[str, int]:
+        """Embed and upsert (page number, chunk text) pairs in fixed-size batches.
+        
+        Chunks already stored for this filename are kept as-is and chunks no longer
+        present are deleted once the stream is exhausted, so only new or changed
+        text is embedded. Each batch is written as soon as it is full, which keeps
+        memory bounded by the batch size rather than the document size.
+        `progress_callback`, if given, receives the running stats after each batch.
+        """
+        items = ((filename, page_number, chunk) for page_number, chunk in chunks)
+        def callback(file_stats, totals):
+            progress_callback({**file_stats[filename], "batches": totals["batches"]})
+        file_stats, totals = self._upsert_chunk_stream(
+            items, [filename], batch_size, callback if progress_callback else None
+        )
+        return {**file_stats[filename], "batches": totals["batches"]}
+    
+    def add_documents_bulk(
+        self,
+        documents: Dict[str, Iterable[Tuple[Optional[int], str]]],
+        batch_size: Optional[int] = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        """Embed and upsert the chunks of many files in shared large batches.
+        
+        `documents` maps filename to an iterable of (page number, chunk text) pairs,
+        consumed one file after another. Chunks from different files are coalesced
+        into the same embedding batches and writes. Returns per-file stats; a file
+        whose iterable raises keeps its stored chunks and gets an "error" entry.
+        """
+        failed: Dict[str, Exception] = {}
+        
+        def items():
+            for filename, chunks in documents.items():
+                try:
+                    for page_number, chunk in chunks:
+                        yield filename, page_number, chunk
+                except Exception as e:
+                    self.logger.error(f"Error reading chunks of {filename}: {str(e)}")
+                    failed[filename] = e
         
-        self.logger.info(f"Adding {len(chunks)} chunks for {filename} to vector store")
+        file_stats, _ = self._upsert_chunk_stream(
+            items(), list(documents), batch_size or self.settings.bulk_embed_batch_size, failed=failed
+        )
+        for filename, error in failed.items():
+            file_stats[filename]["error"] = str(error)
+        return file_stats
+    
+    def _upsert_chunk_stream(
+        self,
+        items: Iterable[Tuple[str, Optional[int], str]],
+        filenames: List[str],
+        batch_size: Optional[int] = None,
+        progress_callback: Optional[Callable[[Dict[str, Dict[str, int]], Dict[str, int]], None]] = None,
+        failed: Container[str] = (),
+    ) -> Tuple[Dict[str, Dict[str, int]], Dict[str, int]]:
+        """Upsert (filename, page number, chunk text) items, embedding only new chunk IDs.
+        
+        Returns per-file stats and totals. Stale chunks of a file are deleted at the end
+        unless the file produced no chunks at all. Embedded batches are handed to the
+        shared writer and the next batch is embedded while the write is pending; at
+        most two writes are outstanding, and all are acknowledged before returning.
+        If `items` raises, the chunks written so far are removed again and stored
+        chunks keep their metadata, so a failed stream leaves the index as it was.
+        Files named in `failed` once the stream ends are rolled back the same way.
+        """
+        batch_size = batch_size or self.settings.embed_batch_size
+        self.logger.info(f"Streaming chunks for {len(filenames)} file(s) to vector store in batches of {batch_size}")
         start_time = time.time()
         
-        # Create metadata for each chunk
-        metadata_start = time.time()
+        existing_ids = {filename: set(self.get_document_ids(filename)) for filename in filenames}
+        seen_ids = {filename: set() for filename in filenames}
+        id_counts: Dict[str, Dict[str, int]] = {filename: {} for filename in filenames}
+        file_stats = {
+            filename: {"chunks_total": 0, "chunks_embedded": 0, "chunks_reused": 0, "chunks_deleted": 0}
+            for filename in filenames
+        }
+        totals = {"batches": 0, "chunks_embedded": 0}
+        pending_texts, pending_metadatas, pending_ids = [], [], []
+        kept_ids, kept_metadatas = [], []
+        embed_time = 0.0
+        write_wait_time = 0.0
+        writes = deque()
+        
+        def wait_writes(keep: int = 0):
+            nonlocal write_wait_time
+            wait_start = time.time()
+            wait_for_writes(writes, keep)
+            write_wait_time += time.time() - wait_start
+        
+        def flush(final: bool = False):
+            nonlocal embed_time
+            if pending_ids:
+                embed_start = time.time()
+                vectors = self.embeddings.embed_documents(pending_texts)
+                batch_embed_time = time.time() - embed_start
+                embed_time += batch_embed_time
+                STAGE_DURATION.labels("embedding").observe(batch_embed_time)
+                writes.append(self.writer.upsert(
+                    list(pending_ids), vectors, list(pending_texts), list(pending_metadatas)
+                ))
+                CHUNKS_PROCESSED.labels("embedded").inc(len(pending_ids))
+                for metadata in pending_metadatas:
+                    file_stats[metadata["filename"]]["chunks_embedded"] += 1
+                totals["batches"] += 1
+                totals["chunks_embedded"] += len(pending_ids)
+                self.logger.info(f"Queued batch {totals['batches']}: {totals['chunks_embedded']} chunks embedded so far")
+                pending_texts.clear()
+                pending_metadatas.clear()
+                pending_ids.clear()
+            if final:
+                # Chunk positions may shift when a document changes; refresh metadata without re-embedding.
+                # Only once the stream is complete, so a failed stream leaves stored chunks untouched.
+                updates = [
+                    (chunk_id, metadata) for chunk_id, metadata in zip(kept_ids, kept_metadatas)
+                    if metadata["filename"] not in failed
+                ]
+                for offset in range(0, len(updates), batch_size):
+                    batch = updates[offset:offset + batch_size]
+                    writes.append(self.writer.update_metadata(
+                        [chunk_id for chunk_id, _ in batch], [metadata for _, metadata in batch]
+                    ))
+                CHUNKS_PROCESSED.labels("reused").inc(len(updates))
+                for _, metadata in updates:
+                    file_stats[metadata["filename"]]["chunks_reused"] += 1
+            wait_writes(keep=2)
+            if progress_callback:
+                progress_callback(file_stats, totals)
+        
+        try:
+            for filename, page_number, chunk in items:
+                stats = file_stats[filename]
+                chunk_id = self._chunk_id(chunk, filename, id_counts[filename])
+                metadata = {
+                    "filename": filename,
+                    "chunk_index": stats["chunks_total"],
+                    "source": filename
+                }
+                if page_number is not None:
+                    metadata["page"] = page_number
+                stats["chunks_total"] += 1
+                seen_ids[filename].add(chunk_id)
+                
+                if chunk_id in existing_ids[filename]:
+                    kept_ids.append(chunk_id)
+                    kept_metadatas.append(metadata)
+                else:
+                    pending_ids.append(chunk_id)
+                    pending_texts.append(chunk)
+                    pending_metadatas.append(metadata)
+                if len(pending_ids) >= batch_size:
+                    flush()
+            flush(final=True)
+            wait_writes()
+        except BaseException:
+            self._discard_partial_upsert(writes, existing_ids, seen_ids, filenames)
+            raise
+        
+        if failed:
+            self._discard_partial_upsert(writes, existing_ids, seen_ids, [name for name in filenames if name in failed])
+        for filename in filenames:
+            if filename in failed:
+                continue
+            # A file that produced no text keeps whatever was stored before
+            stale_ids = list(existing_ids[filename] - seen_ids[filename]) if file_stats[filename]["chunks_total"] else []
+            if stale_ids:
+                self.logger.info(f"Deleting {len(stale_ids)} stale chunks for {filename}")
+                self.writer.delete(stale_ids).result()
+                file_stats[filename]["chunks_deleted"] = len(stale_ids)
+                CHUNKS_PROCESSED.labels("deleted").inc(len(stale_ids))
+        
+        total_time = time.time() - start_time
+        self.logger.info(
+            f"Document addition completed for {len(filenames)} file(s): embedded={totals['chunks_embedded']}, "
+            f"batches={totals['batches']}, embedding={embed_time:.2f}s, write wait={write_wait_time:.2f}s, total={total_time:.2f}s"
+        )
+        return file_stats, totals
+    
+    def _discard_partial_upsert(self, writes, existing_ids: Dict[str, set], seen_ids: Dict[str, set],
+                                filenames: List[str]):
+        """Remove chunks of files whose stream failed part-way, leaving their stored chunks as they were."""
+        for write in writes:
+            try:
+                write.result()
+            except Exception:
+                pass
+        added_ids = [
+            chunk_id
+            for filename in filenames
+            for chunk_id in seen_ids[filename] - existing_ids[filename]
+        ]
+        if added_ids:
+            self.logger.info(f"Discarding {len(added_ids)} chunks written before the stream failed")
+            self.writer.delete(added_ids).result()
+    
+    def copy_document(self, source_filename: str, filename: str) -> int:
+        """Store another file's chunks under a new filename, reusing their embeddings."""
+        self.logger.info(f"Copying stored chunks from {source_filename} to {filename}")
+        start_time = time.time()
+        
+        source = self.backend.get(filenames=[source_filename], include_embeddings=True)
+        if not source.get("ids"):
+            return 0
+        
+        order = sorted(range(len(source["ids"])), key=lambda i: source["metadatas"][i].get("chunk_index", 0))
+        chunks = [source["documents"][i] for i in order]
+        embeddings = [source["embeddings"][i] for i in order]
         metadatas = [
-            {
-                "filename": filename,
-                "chunk_index": i,
-                "source": filename
-            }
-            for i in range(len(chunks))
+            {**source["metadatas"][i], "filename": filename, "source": filename}
+            for i in order
         ]
-        metadata_time = time.time() - metadata_start
         
-        # Add to vector store
-        embed_start = time.time()
-        self.vectorstore.add_texts(texts=chunks, metadatas=metadatas)
-        embed_time = time.time() - embed_start
+        ids = self.make_chunk_ids(chunks, filename)
+        stale_ids = self.get_document_ids(filename)
+        deleted = self.writer.delete(stale_ids)
+        written = self.writer.upsert(ids, embeddings, chunks, metadatas)
+        deleted.result()
+        written.result()
         
-        total_time = time.time() - start_time
-        self.logger.info(f"Document addition completed: metadata={metadata_time:.2f}s, embedding={embed_time:.2f}s, total={total_time:.2f}s")
+        copy_time = time.time() - start_time
+        self.logger.info(f"Copied {len(chunks)} chunks to {filename} in {copy_time:.2f} seconds")
         return len(chunks)
     
+    def _backfill_lexical_index(self, page_size: int = 1000):
+        """Index chunks that were stored before the lexical index existed."""
+        total = self.backend.count()
+        if not total:
+            return
+        self.logger.info(f"Building lexical index for {total} existing chunks")
+        start_time = time.time()
+        for offset in range(0, total, page_size):
+            page = self.backend.get(limit=page_size, offset=offset)
+            self.lexical_index.add(
+                (chunk_id, metadata.get("filename", ""), text)
+                for chunk_id, text, metadata in zip(page["ids"], page["documents"], page["metadatas"])
+            )
+        backfill_time = time.time() - start_time
+        self.logger.info(f"Lexical index built in {backfill_time:.2f} seconds")
+    
+    def _get_documents_by_ids(self, ids: List[str]) -> List[Document]:
+        """Load stored chunks by ID, preserving the requested order."""
+        if not ids:
+            return []
+        result = self.backend.get(ids=ids)
+        by_id = {
+            chunk_id: Document(page_content=text, metadata=metadata or {}, id=chunk_id)
+            for chunk_id, text, metadata in zip(result["ids"], result["documents"], result["metadatas"])
+        }
+        return [by_id[chunk_id] for chunk_id in ids if chunk_id in by_id]
+    
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed several queries together, in one batch where the embedding stack supports it."""
+        embed_queries = getattr(self.embeddings, "embed_queries", None)
+        if embed_queries is not None:
+            return embed_queries(queries)
+        return [self.embeddings.embed_query(query) for query in queries]
+    
+    def search(
+        self,
+        query: str,
+        k: Optional[int] = None,
+        filenames: Optional[List[str]] = None,
+        query_vector: Optional[List[float]] = None,
+    ) -> List[Document]:
+        """Search the way the retrievers do, optionally with a query vector embedded beforehand."""
+        if self.lexical_index is not None:
+            return self.hybrid_search(query, k, filenames, query_vector=query_vector)
+        return self.vector_search(query, k, filenames, query_vector=query_vector)
+    
+    def hybrid_search(
+        self,
+        query: str,
+        k: Optional[int] = None,
+        filenames: Optional[List[str]] = None,
+        query_vector: Optional[List[float]] = None,
+    ) -> List[Document]:
+        """Fuse BM25 and vector search results with reciprocal-rank fusion.
+        
+        Identifier-shaped queries (policy numbers, ICD/CPT codes, claim IDs) with
+        lexical hits are answered from the lexical index alone, skipping the
+        query embedding and vector search.
+        """
+        search_k = k or self.settings.top_k
+        fetch_k = max(self.settings.hybrid_fetch_k, search_k)
+        start_time = time.time()
+        
+        with observe_stage("lexical_search"):
+            lexical_hits = self.lexical_index.search(query, fetch_k, filenames)
+        if lexical_hits and is_identifier_query(query):
+            docs = self._get_documents_by_ids([chunk_id for chunk_id, _ in lexical_hits[:search_k]])
+            search_time = time.time() - start_time
+            self.logger.info(f"Lexical fast path returned {len(docs)} documents in {search_time:.3f} seconds")
+            return docs
+        
+        vector_docs = self.vector_search(query, fetch_k, filenames, query_vector=query_vector)
+        
+        rrf_k = self.settings.rrf_k
+        scores: Dict[str, float] = {}
+        docs_by_id: Dict[str, Document] = {}
+        for rank, doc in enumerate(vector_docs):
+            doc_id = doc.id or doc.page_content
+            docs_by_id[doc_id] = doc
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (rrf_k + rank + 1)
+        for rank, (chunk_id, _) in enumerate(lexical_hits):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (rrf_k + rank + 1)
+        
+        ranked_ids = sorted(scores, key=scores.get, reverse=True)[:search_k]
+        missing_ids = [doc_id for doc_id in ranked_ids if doc_id not in docs_by_id]
+        for doc in self._get_documents_by_ids(missing_ids):
+            docs_by_id[doc.id] = doc
+        docs = [docs_by_id[doc_id] for doc_id in ranked_ids if doc_id in docs_by_id]
+        
+        search_time = time.time() - start_time
+        self.logger.info(
+            f"Hybrid search fused {len(vector_docs)} vector and {len(lexical_hits)} lexical results "
+            f"into {len(docs)} documents in {search_time:.3f} seconds"
+        )
+        return docs
+    
+    def vector_search(
+        self,
+        query: str,
+        k: Optional[int] = None,
+        filenames: Optional[List[str]] = None,
+        query_vector: Optional[List[float]] = None,
+    ) -> List[Document]:
+        """Embed the query and return the k nearest chunks, optionally limited to some files."""
+        return [
+            doc for doc, _ in self._vector_search_with_distance(query, k or self.settings.top_k, filenames, query_vector)
+        ]
+    
+    def _vector_search_with_distance(
+        self, query: str, k: int, filenames: Optional[List[str]] = None, query_vector: Optional[List[float]] = None
+    ) -> List[Tuple[Document, float]]:
+        vector = query_vector if query_vector is not None else self.embeddings.embed_query(query)
+        with observe_stage("vector_search"):
+            return self.backend.search(vector, k, filenames)
+    
     def get_retriever(self, k: Optional[int] = None):
         """Get a retriever for the vector store."""
         search_k = k or self.settings.top_k
         self.logger.info(f"Creating retriever with k={search_k}")
-        return self.vectorstore.as_retriever(search_kwargs={"k": search_k})
+        if self.lexical_index is not None:
+            return HybridRetriever(store=self, k=search_k)
+        return VectorRetriever(store=self, k=search_k)
     
     def get_filtered_retriever(self, filenames: List[str], k: Optional[int] = None):
         """Get a retriever filtered to specific filenames."""
         search_k = k or self.settings.top_k
         self.logger.info(f"Creating filtered retriever for {filenames} with k={search_k}")
-        search_kwargs = {
-            "k": search_k,
-            "filter": {"filename": {"$in": filenames}}
-        }
-        return self.vectorstore.as_retriever(search_kwargs=search_kwargs)
+        if self.lexical_index is not None:
+            return HybridRetriever(store=self, k=search_k, filenames=filenames)
+        return VectorRetriever(store=self, k=search_k, filenames=filenames)
     
     def search_similar(self, query: str, k: Optional[int] = None) -> List[Dict[str, Any]]:
         """Search for similar documents and return with metadata."""
@@ -107,7 +511,7 @@ class VectorStoreManager:
         self.logger.info(f"Searching for similar documents with k={search_k}")
         start_time = time.time()
         
-        docs = self.vectorstore.similarity_search_with_score(query, k=search_k)
+        docs = self._vector_search_with_distance(query, search_k)
         search_time = time.time() - start_time
         
         results = []
@@ -124,13 +528,24 @@ class VectorStoreManager:
     def get_stats(self) -> Dict[str, Any]:
         """Get statistics about the vector store."""
         try:
-            collection = self.vectorstore._collection
-            count = collection.count()
-            return {
+            count = self.backend.count()
+            stats = {
                 "document_count": count,
+                "vector_backend": self.backend.get_stats(),
                 "collection_name": self.settings.collection_name,
-                "embedding_model": self.settings.embedding_model
+                "embedding_model": self.settings.embedding_model,
+                "embedding_backend": self.settings.embedding_backend
             }
+            if isinstance(self.embeddings, CachedEmbeddings):
+                stats["embedding_cache"] = self.embeddings.get_stats()
+            if self.lexical_index is not None:
+                stats["lexical_index"] = self.lexical_index.get_stats()
+            if VectorStoreManager._query_batcher is not None:
+                stats["query_batching"] = VectorStoreManager._query_batcher.get_stats()
+            stats["writer"] = self.writer.get_stats()
+            if isinstance(VectorStoreManager._base_embeddings, RemoteEmbeddings):
+                stats["embedding_server"] = VectorStoreManager._base_embeddings.get_stats()
+            return stats
         except Exception as e:
             self.logger.error(f"Error getting vector store stats: {str(e)}")
             return {"error": str(e)}
@@ -0,0 +1,155 @@
+from typing import List, Dict, Any
+from collections import deque
+from concurrent.futures import Future
+from utils.metrics import STAGE_DURATION
+import logging
+import queue
+import threading
+import time
+
+
+class _WriteOp:
+    __slots__ = ("kind", "ids", "embeddings", "documents", "metadatas", "future")
+
+    def __init__(self, kind: str, ids: List[str], embeddings=None, documents=None, metadatas=None):
+        self.kind = kind
+        self.ids = ids
+        self.embeddings = embeddings
+        self.documents = documents
+        self.metadatas = metadatas
+        self.future: Future = Future()
+
+
+class BatchingWriter:
+    """Single writer thread that coalesces vector store writes from all ingesting threads.
+
+    Callers embed on their own threads and hand finished batches to `upsert`,
+    `update_metadata` or `delete`, each of which returns a Future that resolves
+    once that batch is durably written. The writer collects operations for up to
+    `flush_interval_ms` or `max_batch_size` chunks, merges adjacent operations
+    of the same kind and applies them in submission order, together with the
+    matching lexical index changes. One writer means the SQLite and HNSW files
+    see one large write at a time instead of many competing small ones, and
+    readers only ever contend with that single writer.
+    """
+
+    def __init__(self, backend, lexical_index=None, flush_interval_ms: float = 50.0, max_batch_size: int = 1000):
+        self.logger = logging.getLogger(__name__)
+        self.backend = backend
+        self.lexical_index = lexical_index
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.writes = 0
+        self.operations = 0
+        self.chunks_written = 0
+        self.largest_write = 0
+        self._queue: "queue.Queue[_WriteOp]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="vector-store-writer", daemon=True)
+        self._thread.start()
+
+    def upsert(self, ids: List[str], embeddings: List[List[float]], documents: List[str],
+               metadatas: List[Dict[str, Any]]) -> Future:
+        """Queue chunks with precomputed embeddings for writing."""
+        return self._submit(_WriteOp("upsert", ids, embeddings, documents, metadatas))
+
+    def update_metadata(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> Future:
+        """Queue a metadata-only update of stored chunks."""
+        return self._submit(_WriteOp("update", ids, metadatas=metadatas))
+
+    def delete(self, ids: List[str]) -> Future:
+        """Queue removal of stored chunks."""
+        return self._submit(_WriteOp("delete", ids))
+
+    def _submit(self, op: _WriteOp) -> Future:
+        if not op.ids:
+            op.future.set_result(0)
+            return op.future
+        self._queue.put(op)
+        return op.future
+
+    def _run(self):
+        while True:
+            ops = [self._queue.get()]
+            size = len(ops[0].ids)
+            deadline = time.monotonic() + self.flush_interval
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    op = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                ops.append(op)
+                size += len(op.ids)
+
+            # Merge runs of the same kind, keeping submission order between kinds
+            group: List[_WriteOp] = []
+            for op in ops:
+                if group and (op.kind != group[0].kind or
+                              sum(len(g.ids) for g in group) + len(op.ids) > self.max_batch_size):
+                    self._apply(group)
+                    group = []
+                group.append(op)
+            self._apply(group)
+
+    def _apply(self, group: List[_WriteOp]):
+        kind = group[0].kind
+        ids = [chunk_id for op in group for chunk_id in op.ids]
+        start_time = time.perf_counter()
+        try:
+            if kind == "upsert":
+                metadatas = [metadata for op in group for metadata in op.metadatas]
+                documents = [document for op in group for document in op.documents]
+                self.backend.upsert(
+                    ids=ids,
+                    embeddings=[vector for op in group for vector in op.embeddings],
+                    documents=documents,
+                    metadatas=metadatas
+                )
+                if self.lexical_index is not None:
+                    self.lexical_index.add(
+                        (chunk_id, metadata["filename"], document)
+                        for chunk_id, metadata, document in zip(ids, metadatas, documents)
+                    )
+            elif kind == "update":
+                self.backend.update(ids=ids, metadatas=[metadata for op in group for metadata in op.metadatas])
+            else:
+                self.backend.delete(ids=ids)
+                if self.lexical_index is not None:
+                    self.lexical_index.remove(ids)
+        except Exception as e:
+            self.logger.error(f"Vector store {kind} of {len(ids)} chunks failed: {str(e)}")
+            for op in group:
+                op.future.set_exception(e)
+            return
+
+        write_time = time.perf_counter() - start_time
+        STAGE_DURATION.labels("upsert" if kind == "upsert" else f"write_{kind}").observe(write_time)
+        self.writes += 1
+        self.operations += len(group)
+        self.chunks_written += len(ids)
+        self.largest_write = max(self.largest_write, len(ids))
+        if len(group) > 1:
+            self.logger.info(f"Coalesced {len(group)} {kind} batches into one write of {len(ids)} chunks in {write_time:.2f}s")
+        for op in group:
+            op.future.set_result(len(op.ids))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get coalescing statistics."""
+        return {
+            "flush_interval_ms": self.flush_interval * 1000.0,
+            "max_batch_size": self.max_batch_size,
+            "pending": self._queue.qsize(),
+            "writes": self.writes,
+            "operations": self.operations,
+            "chunks_written": self.chunks_written,
+            "largest_write": self.largest_write,
+            "mean_operations_per_write": round(self.operations / self.writes, 2) if self.writes else None,
+        }
+
+
+def wait_for_writes(futures: "deque[Future]", keep: int = 0):
+    """Wait on the oldest acknowledgements until at most `keep` remain outstanding."""
+    while len(futures) > keep:
+        futures.popleft().result()
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Tests import the application modules the same way the app does
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
@@ -0,0 +1,47 @@
+"""Answers computed before a document changed must not be cached after its invalidation."""
+
+import pytest
+
+pytest.importorskip("prometheus_client")
+
+from utils.answer_cache import AnswerCache
+
+MODEL = "gemma:2b-instruct-q4_K_M"
+RESULT = {"answer": "The claim was approved.", "sources": [], "status": "success"}
+
+
+@pytest.mark.parametrize("filters", [None, ["claim.pdf"], ["bill.pdf", "claim.pdf"]])
+def test_put_after_invalidation_is_dropped(filters):
+    cache = AnswerCache()
+    generation = cache.generation(filters)
+    assert cache.get("Was the claim approved?", filters, MODEL, "1") is None
+
+    # claim.pdf is re-ingested while the answer is being generated from its old chunks
+    cache.invalidate_filename("claim.pdf")
+    cache.put("Was the claim approved?", filters, MODEL, "1", RESULT, generation)
+
+    assert cache.get("Was the claim approved?", filters, MODEL, "1") is None
+    assert cache.get_stats()["stale_puts"] == 1
+
+
+def test_invalidating_another_file_keeps_filtered_answers():
+    cache = AnswerCache()
+    generation = cache.generation(["claim.pdf"])
+    cache.invalidate_filename("bill.pdf")
+    cache.put("Was the claim approved?", ["claim.pdf"], MODEL, "1", RESULT, generation)
+
+    assert cache.get("was the claim approved", ["claim.pdf"], MODEL, "1") == RESULT
+
+
+@pytest.mark.parametrize("filters", [None, ["claim.pdf"]])
+def test_invalidation_in_another_process_retires_answers(tmp_path, filters):
+    path = str(tmp_path / "generations.sqlite3")
+    worker_a, worker_b = AnswerCache(generation_path=path), AnswerCache(generation_path=path)
+    worker_b.put("Was the claim approved?", filters, MODEL, "1", RESULT, worker_b.generation(filters))
+    assert worker_b.get("Was the claim approved?", filters, MODEL, "1") == RESULT
+
+    # claim.pdf is re-ingested by worker A
+    worker_a.invalidate_filename("claim.pdf")
+
+    assert worker_b.get("Was the claim approved?", filters, MODEL, "1") is None
+    assert worker_b.get_stats()["entries"] == 0
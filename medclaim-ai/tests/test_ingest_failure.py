@@ -0,0 +1,117 @@
+"""A PDF whose extraction fails part-way must leave the stored document untouched."""
+
+import hashlib
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("langchain_ollama")
+
+from services.rag_service import MedClaimRAGService
+from utils.answer_cache import AnswerCache
+from utils.document_processor import DocumentProcessor
+from utils.ingest_manifest import IngestManifest
+from utils.mmap_index import MmapVectorBackend
+from utils.vector_store import VectorStoreManager
+from utils.vector_writer import BatchingWriter
+
+PAGES = {
+    b"v1": ["Claim number CLM-001 for hospital stay.", "Room charges 4000.", "Pharmacy charges 1200."],
+    b"v2": ["Claim number CLM-001 for hospital stay.", "Room charges 4500.", "Pharmacy charges 1300."],
+    b"bill": ["Final bill for CLM-001.", "Amount due 5800."],
+}
+
+
+class HashEmbeddings:
+    """Deterministic unit vectors so the test needs no embedding model."""
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        digest = hashlib.sha256(text.encode("utf-8")).digest()[:8]
+        vector = [byte - 127.5 for byte in digest]
+        norm = sum(value * value for value in vector) ** 0.5
+        return [value / norm for value in vector]
+
+
+def text_layer(fail_after=None):
+    def iter_text_layer(file_bytes):
+        for number, text in enumerate(PAGES[file_bytes], start=1):
+            if fail_after is not None and number > fail_after:
+                raise RuntimeError("corrupt page object")
+            yield number, text
+    return iter_text_layer
+
+
+@pytest.fixture
+def service(tmp_path):
+    settings = SimpleNamespace(embed_batch_size=1, bulk_embed_batch_size=1, ingest_queue_pages=2)
+
+    vector_store = VectorStoreManager.__new__(VectorStoreManager)
+    vector_store.logger = logging.getLogger("test")
+    vector_store.settings = settings
+    vector_store.embeddings = HashEmbeddings()
+    vector_store.backend = MmapVectorBackend(str(tmp_path / "index"), ann_enabled=False)
+    vector_store.writer = BatchingWriter(vector_store.backend, flush_interval_ms=1)
+
+    rag = MedClaimRAGService.__new__(MedClaimRAGService)
+    rag.logger = logging.getLogger("test")
+    rag.settings = settings
+    rag.document_processor = DocumentProcessor(chunk_size=200, chunk_overlap=0, min_page_chars=0)
+    rag.vector_store = vector_store
+    rag.manifest = IngestManifest(str(tmp_path / "manifest.json"))
+    rag.answer_cache = AnswerCache(max_entries=10)
+    return rag
+
+
+def stored_chunks(rag, filename):
+    stored = rag.vector_store.backend.get(filenames=[filename])
+    return sorted(zip(stored["ids"], stored["documents"], (str(sorted(m.items())) for m in stored["metadatas"])))
+
+
+def test_extraction_failure_keeps_previous_version(service, monkeypatch):
+    monkeypatch.setattr(service.document_processor, "_iter_text_layer", text_layer())
+    assert service.ingest_pdf(b"v1", "claim.pdf")["status"] == "success"
+    chunks_before = stored_chunks(service, "claim.pdf")
+    manifest_before = service.manifest.get("claim.pdf")
+
+    # Page 1 is unchanged, page 2 is new and gets embedded, then page 3 fails to extract
+    monkeypatch.setattr(service.document_processor, "_iter_text_layer", text_layer(fail_after=2))
+    result = service.ingest_pdf(b"v2", "claim.pdf")
+
+    assert result["status"] == "error"
+    assert "corrupt page object" in result["message"]
+    assert stored_chunks(service, "claim.pdf") == chunks_before
+    assert service.manifest.get("claim.pdf") == manifest_before
+
+
+def test_failed_first_ingest_records_nothing(service, monkeypatch):
+    monkeypatch.setattr(service.document_processor, "_iter_text_layer", text_layer(fail_after=1))
+
+    assert service.ingest_pdf(b"v1", "claim.pdf")["status"] == "error"
+    assert service.vector_store.get_document_ids("claim.pdf") == []
+    assert service.manifest.get("claim.pdf") is None
+
+
+def test_bulk_ingest_fails_only_the_broken_file(service, monkeypatch):
+    monkeypatch.setattr(service.document_processor, "_iter_text_layer", text_layer())
+    assert service.ingest_pdf(b"v1", "claim.pdf")["status"] == "success"
+    chunks_before = stored_chunks(service, "claim.pdf")
+    manifest_before = service.manifest.get("claim.pdf")
+
+    def iter_text_layer(file_bytes):
+        # The updated claim breaks on its last page; the other file extracts cleanly
+        return text_layer(fail_after=2 if file_bytes == b"v2" else None)(file_bytes)
+
+    monkeypatch.setattr(service.document_processor, "_iter_text_layer", iter_text_layer)
+    result = service.ingest_pdfs([(b"v2", "claim.pdf"), (b"bill", "bill.pdf")])
+
+    statuses = {entry["filename"]: entry["status"] for entry in result["files"]}
+    assert statuses == {"claim.pdf": "error", "bill.pdf": "success"}
+    assert result["status"] == "partial"
+    assert stored_chunks(service, "claim.pdf") == chunks_before
+    assert service.manifest.get("claim.pdf") == manifest_before
+    assert len(service.vector_store.get_document_ids("bill.pdf")) == len(PAGES[b"bill"])
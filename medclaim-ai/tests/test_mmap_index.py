@@ -0,0 +1,61 @@
+"""Dead rows of the memory-mapped index are compacted away without changing search results."""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("langchain_core")
+
+from utils.mmap_index import MmapVectorBackend
+
+
+def unit_vectors(count, dim=16, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def upsert(backend, vectors, start, end):
+    backend.upsert(
+        [f"c{i}" for i in range(start, end)],
+        vectors[start:end].tolist(),
+        [f"text {i}" for i in range(start, end)],
+        [{"filename": f"f{i % 4}.pdf", "chunk_index": i} for i in range(start, end)],
+    )
+
+
+def test_replaced_rows_are_compacted(tmp_path):
+    backend = MmapVectorBackend(str(tmp_path), ann_enabled=False)
+    backend.GROWTH_ROWS = 16
+    reader = MmapVectorBackend(str(tmp_path), read_only=True, ann_enabled=False)
+    vectors = unit_vectors(64)
+    upsert(backend, vectors, 0, 64)
+    assert reader.get_stats()["epoch"] == 0
+
+    # Re-writing a quarter of the chunks leaves a fifth of the rows dead, deleting more crosses the threshold
+    upsert(backend, vectors, 0, 16)
+    assert backend.get_stats()["dead_rows"] == 16
+    backend.delete([f"c{i}" for i in range(16, 24)])
+
+    stats = reader.get_stats()
+    assert stats == {**stats, "epoch": 1, "chunks": 56, "dead_rows": 0, "rows_allocated": 56}
+    assert not (tmp_path / "vectors.f32").exists()
+    for i in (0, 30, 63):
+        hits = reader.search(vectors[i].tolist(), 3)
+        assert hits[0][0].id == f"c{i}"
+        assert hits[0][0].page_content == f"text {i}"
+        assert reader.search(vectors[i].tolist(), 1, [f"f{i % 4}.pdf"])[0][0].id == f"c{i}"
+    assert reader.get(ids=["c40"], include_embeddings=True)["embeddings"][0] == pytest.approx(vectors[40].tolist())
+    assert not any(doc.id in {f"c{i}" for i in range(16, 24)} for doc, _ in reader.search(vectors[20].tolist(), 10))
+
+
+def test_failed_upsert_is_rolled_back(tmp_path):
+    backend = MmapVectorBackend(str(tmp_path), ann_enabled=False)
+    vectors = unit_vectors(8)
+    upsert(backend, vectors, 0, 4)
+
+    with pytest.raises(TypeError):
+        # The metadata cannot be serialized, so the insert fails after the old rows were deleted
+        backend.upsert(["c0"], vectors[4:5].tolist(), ["replacement"], [{"filename": "f0.pdf", "bad": object()}])
+    upsert(backend, vectors, 4, 8)
+
+    assert backend.get(ids=["c0"])["documents"] == ["text 0"]
+    assert backend.count() == 8